@@ -0,0 +1,274 @@
+"""
+End-to-end benchmarks for PromptBuster's own overhead, run against the
+offline mock server:
+
+    python -m benchmarks.bench --sessions 20 --jobs 200 --json results.json
+    python -m benchmarks.bench --compare results.json
+
+Reports p50/p95/p99 step latency, batch throughput and memory. With
+``--compare`` every metric is printed next to its change from a saved run.
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from core.batch import BatchRunner
+from core.llm_providers import BaseLLMProvider, create_provider
+from core.models import BatchJob, BatchResult, Example, LLMConfig, LLMProvider
+from core.workflow import PromptBusterWorkflow
+
+from .mock_server import add_mock_arguments
+
+ROLES = ["technical writer", "customer support agent", "data analyst", "recipe developer", "legal reviewer"]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": percentile(seconds, 0.50) * 1000,
+        "p95_ms": percentile(seconds, 0.95) * 1000,
+        "p99_ms": percentile(seconds, 0.99) * 1000,
+        "count": len(seconds)
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def start_mock_server(port: int, mock_args: List[str]) -> subprocess.Popen:
+    """Run the mock in its own process so its CPU time doesn't count against the client"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_server", "--port", str(port)] + mock_args,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/v1/models", timeout=0.5)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Mock server did not start")
+
+
+def examples_for(index: int) -> List[Example]:
+    return [
+        Example(input_text=f"Request {index}-{i}: summarise the attached notes", expected_output=f"Summary {index}-{i}")
+        for i in range(3)
+    ]
+
+
+async def bench_steps(provider: BaseLLMProvider, config: LLMConfig, sessions: int) -> Dict[str, Dict[str, float]]:
+    """Run every step in order for each session, timing each call; also time to first streamed chunk"""
+    timings: Dict[str, List[float]] = {}
+    
+    def record(name: str, started: float):
+        timings.setdefault(name, []).append(time.perf_counter() - started)
+    
+    for index in range(sessions):
+        workflow = PromptBusterWorkflow(config, llm_provider=provider)
+        role = ROLES[index % len(ROLES)]
+        
+        started = time.perf_counter()
+        async for _ in workflow.stream_initial_prompt_guide(role):
+            record("stream_first_chunk", started)
+            break
+        
+        started = time.perf_counter()
+        guide = await workflow.generate_initial_prompt_guide(role)
+        record("initial_prompt", started)
+        
+        started = time.perf_counter()
+        prompt = await workflow.generate_prompt_from_examples(role, examples_for(index))
+        record("prompt_generation", started)
+        
+        started = time.perf_counter()
+        evaluation_guide = await workflow.generate_evaluation_guide(role)
+        record("evaluation_guide", started)
+        
+        started = time.perf_counter()
+        evaluation = await workflow.evaluate_prompt(prompt, evaluation_guide)
+        record("prompt_evaluation", started)
+        
+        started = time.perf_counter()
+        alternatives = await workflow.generate_improved_alternatives(prompt, evaluation)
+        record("improved_alternatives", started)
+        
+        started = time.perf_counter()
+        await workflow.score_candidates(alternatives or [guide], evaluation_guide)
+        record("final_selection", started)
+        
+        started = time.perf_counter()
+        await PromptBusterWorkflow(config, llm_provider=provider).run_all(role, examples_for(index))
+        record("run_all", started)
+    
+    return {name: latency_summary(values) for name, values in timings.items()}
+
+
+async def bench_batch(provider: BaseLLMProvider, config: LLMConfig, jobs: int, concurrency: int,
+                      stats_url: str) -> Dict[str, float]:
+    job_seconds: List[float] = []
+    statuses: Dict[str, int] = {}
+    
+    def on_result(result: BatchResult):
+        job_seconds.append(result.elapsed_seconds)
+        statuses[result.status] = statuses.get(result.status, 0) + 1
+    
+    batch_jobs = [BatchJob(id=str(i), role=ROLES[i % len(ROLES)], examples=examples_for(i)) for i in range(jobs)]
+    runner = BatchRunner(config, concurrency, llm_provider=provider, on_result=on_result)
+    
+    async with httpx.AsyncClient() as client:
+        before = (await client.get(stats_url)).json()
+        with tempfile.TemporaryDirectory() as directory:
+            started = time.perf_counter()
+            await runner.run(batch_jobs, Path(directory) / "results.jsonl", resume=False)
+            elapsed = time.perf_counter() - started
+        after = (await client.get(stats_url)).json()
+    
+    calls = after["requests"] - before["requests"]
+    summary = {
+        "jobs": jobs,
+        "ok": statuses.get("ok", 0),
+        "errors": statuses.get("error", 0),
+        "wall_seconds": elapsed,
+        "jobs_per_second": jobs / elapsed,
+        "calls_per_second": calls / elapsed,
+        "mock_max_in_flight": after["max_in_flight"],
+        "mock_rate_limited": after["rate_limited"] - before["rate_limited"],
+        "mock_errors": after["errors"] - before["errors"]
+    }
+    summary.update({f"job_{key}": value for key, value in latency_summary(job_seconds).items() if key != "count"})
+    return summary
+
+
+async def run_benchmarks(args: argparse.Namespace, base_url: str) -> dict:
+    provider_kind = LLMProvider(args.provider)
+    config = LLMConfig(
+        provider=provider_kind,
+        model="mock",
+        api_key="mock",
+        base_url=f"{base_url}/v1" if provider_kind == LLMProvider.OPENAI else base_url,
+        use_cache=False
+    )
+    http_client = httpx.AsyncClient(limits=httpx.Limits(max_connections=args.concurrency * 2,
+                                                        max_keepalive_connections=args.concurrency))
+    provider = create_provider(config, http_client)
+    results: dict = {"provider": args.provider}
+    try:
+        if args.sessions:
+            results["steps"] = await bench_steps(provider, config, args.sessions)
+        if args.jobs:
+            if args.trace_memory:
+                tracemalloc.start()
+            results["batch"] = await bench_batch(provider, config, args.jobs, args.concurrency, f"{base_url}/stats")
+            if args.trace_memory:
+                results["batch"]["traced_peak_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                tracemalloc.stop()
+    finally:
+        await provider.aclose()
+        await http_client.aclose()
+    
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def report(results: dict, baseline: Optional[dict] = None) -> str:
+    current = flatten(results)
+    previous = flatten(baseline) if baseline else {}
+    width = max(len(name) for name in current)
+    lines = [f"PromptBuster benchmark ({results['provider']} provider)"]
+    for name, value in current.items():
+        line = f"  {name:<{width}}  {value:>12.2f}"
+        if name in previous and previous[name]:
+            change = (value - previous[name]) / previous[name] * 100
+            line += f"  ({change:+.1f}% vs {previous[name]:.2f})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark PromptBuster against the offline mock server")
+    parser.add_argument("--provider", choices=[LLMProvider.LOCAL.value, LLMProvider.OPENAI.value],
+                        default=LLMProvider.LOCAL.value, help="Client protocol to exercise")
+    parser.add_argument("--sessions", type=int, default=10, help="Sessions for per-step latency; 0 skips")
+    parser.add_argument("--jobs", type=int, default=100, help="Jobs for the batch run; 0 skips")
+    parser.add_argument("-c", "--concurrency", type=int, default=16, help="Concurrent batch jobs")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also report tracemalloc peak for the batch run (slows it down)")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Show changes against results saved with --json")
+    add_mock_arguments(parser)
+    args = parser.parse_args(argv)
+    
+    mock_args = [
+        "--latency", args.latency, "--latency-ms", str(args.latency_ms),
+        "--latency-spread", str(args.latency_spread), "--tokens-per-second", str(args.tokens_per_second),
+        "--output-tokens", str(args.output_tokens), "--rate-limit-rate", str(args.rate_limit_rate),
+        "--error-rate", str(args.error_rate)
+    ] + (["--seed", str(args.seed)] if args.seed is not None else [])
+    port = free_port()
+    server = start_mock_server(port, mock_args)
+    try:
+        results = asyncio.run(run_benchmarks(args, f"http://127.0.0.1:{port}"))
+    finally:
+        server.terminate()
+        server.wait()
+    
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(report(results, baseline))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""
+Offline stand-in LLM server for load tests and benchmarks.
+
+Speaks the LocalProvider ``/generate`` protocol and the OpenAI
+``/v1/chat/completions`` API, both with optional streaming, and can
+inject latency, limited token throughput and 429/5xx errors:
+
+    python -m benchmarks.mock_server --port 9100 --latency lognormal --latency-ms 300 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from typing import List, Optional
+
+from aiohttp import web
+from pydantic import BaseModel
+
+WORDS = ("clear concise specific role context example format output tone audience constraint "
+         "step detail accurate helpful consistent structure criteria relevant quality").split()
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+class MockSettings(BaseModel):
+    # Time to first token
+    latency: str = "fixed"
+    latency_ms: float = 50.0
+    # Spread for uniform (+/-) and lognormal (sigma, as a fraction of the mean)
+    latency_spread: float = 0.5
+    # Streaming and generation speed; 0 returns the whole reply at once
+    tokens_per_second: float = 0.0
+    output_tokens: int = 120
+    rate_limit_rate: float = 0.0
+    error_rate: float = 0.0
+    retry_after_ms: int = 200
+    seed: Optional[int] = None
+
+
+class MockStats:
+    def __init__(self):
+        self.requests = 0
+        self.streamed = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.output_tokens = 0
+
+
+class MockLLM:
+    def __init__(self, settings: MockSettings):
+        self.settings = settings
+        self.random = random.Random(settings.seed)
+        self.stats = MockStats()
+    
+    def first_token_delay(self) -> float:
+        s = self.settings
+        mean = s.latency_ms / 1000
+        if s.latency == "uniform":
+            return max(0.0, self.random.uniform(mean * (1 - s.latency_spread), mean * (1 + s.latency_spread)))
+        if s.latency == "exponential":
+            return self.random.expovariate(1 / mean) if mean > 0 else 0.0
+        if s.latency == "lognormal":
+            # Parameterised so the distribution's mean is latency_ms, with a long right tail
+            sigma = max(s.latency_spread, 1e-6)
+            return self.random.lognormvariate(0, sigma) * mean / math.exp(sigma * sigma / 2)
+        return mean
+    
+    def reply_tokens(self, max_tokens: Optional[int]) -> List[str]:
+        """Words forming a reply every workflow parser accepts: numbered alternatives and a score"""
+        count = max(12, int(self.random.gauss(self.settings.output_tokens, self.settings.output_tokens * 0.2)))
+        if max_tokens:
+            count = min(count, max(12, max_tokens))
+        words = [self.random.choice(WORDS) for _ in range(count)]
+        third = max(1, (count - 4) // 3)
+        lines = [
+            "1. " + " ".join(words[:third]),
+            "2. " + " ".join(words[third:2 * third]),
+            "3. " + " ".join(words[2 * third:count - 4]),
+            f"SCORE: {self.random.randint(3, 9)}/10"
+        ]
+        tokens = []
+        for line in lines:
+            parts = line.split(" ")
+            tokens.extend(part + " " for part in parts[:-1])
+            tokens.append(parts[-1] + "\n")
+        return tokens
+    
+    def injected_failure(self) -> Optional[web.Response]:
+        roll = self.random.random()
+        if roll < self.settings.rate_limit_rate:
+            self.stats.rate_limited += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+                status=429,
+                headers={"retry-after-ms": str(self.settings.retry_after_ms)}
+            )
+        if roll < self.settings.rate_limit_rate + self.settings.error_rate:
+            self.stats.errors += 1
+            status = self.random.choice((500, 502, 503))
+            return web.json_response({"error": {"message": "Injected failure", "type": "server_error"}}, status=status)
+        return None
+    
+    async def pace(self, tokens: int):
+        if self.settings.tokens_per_second > 0:
+            await asyncio.sleep(tokens / self.settings.tokens_per_second)
+    
+    async def handle(self, request: web.Request, openai: bool) -> web.StreamResponse:
+        body = await request.json()
+        self.stats.requests += 1
+        self.stats.in_flight += 1
+        self.stats.max_in_flight = max(self.stats.max_in_flight, self.stats.in_flight)
+        try:
+            await asyncio.sleep(self.first_token_delay())
+            failure = self.injected_failure()
+            if failure is not None:
+                return failure
+            
+            tokens = self.reply_tokens(body.get("max_tokens"))
+            self.stats.output_tokens += len(tokens)
+            if body.get("stream"):
+                self.stats.streamed += 1
+                return await (self.stream_openai(request, body, tokens) if openai
+                              else self.stream_local(request, body, tokens))
+            
+            await self.pace(len(tokens))
+            text = "".join(tokens)
+            if not openai:
+                return web.json_response({"response": text, "done": True, "prompt_eval_count": self.prompt_tokens(body),
+                                          "eval_count": len(tokens)})
+            return web.json_response({
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": self.prompt_tokens(body), "completion_tokens": len(tokens),
+                          "total_tokens": self.prompt_tokens(body) + len(tokens)}
+            })
+        finally:
+            self.stats.in_flight -= 1
+    
+    @staticmethod
+    def prompt_tokens(body: dict) -> int:
+        text = json.dumps(body.get("messages") or body.get("prompt") or "")
+        return max(1, len(text) // 4)
+    
+    async def stream_local(self, request: web.Request, body: dict, tokens: List[str]) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for token in tokens:
+            await self.pace(1)
+            await response.write((json.dumps({"response": token, "done": False}) + "\n").encode())
+        final = {"response": "", "done": True, "prompt_eval_count": self.prompt_tokens(body), "eval_count": len(tokens)}
+        await response.write((json.dumps(final) + "\n").encode())
+        await response.write_eof()
+        return response
+    
+    async def stream_openai(self, request: web.Request, body: dict, tokens: List[str]) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        
+        def chunk(delta: dict, finish_reason: Optional[str] = None) -> bytes:
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                    "model": body.get("model", "mock"),
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            return f"data: {json.dumps(data)}\n\n".encode()
+        
+        await response.write(chunk({"role": "assistant", "content": ""}))
+        for token in tokens:
+            await self.pace(1)
+            await response.write(chunk({"content": token}))
+        await response.write(chunk({}, "stop"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+    
+    async def generate(self, request: web.Request) -> web.StreamResponse:
+        return await self.handle(request, openai=False)
+    
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        return await self.handle(request, openai=True)
+    
+    async def models(self, request: web.Request) -> web.Response:
+        return web.json_response({"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+    
+    async def stats_view(self, request: web.Request) -> web.Response:
+        return web.json_response(vars(self.stats))
+
+
+def create_mock_app(settings: MockSettings) -> web.Application:
+    mock = MockLLM(settings)
+    app = web.Application()
+    app.router.add_post("/generate", mock.generate)
+    app.router.add_post("/v1/chat/completions", mock.chat_completions)
+    app.router.add_get("/v1/models", mock.models)
+    app.router.add_get("/stats", mock.stats_view)
+    return app
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="fixed",
+                        help="Distribution of time to first token")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Mean time to first token")
+    parser.add_argument("--latency-spread", type=float, default=0.5,
+                        help="Relative spread for uniform, sigma for lognormal")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Generation speed; 0 is instant")
+    parser.add_argument("--output-tokens", type=int, default=120, help="Mean reply length")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 5xx")
+    parser.add_argument("--seed", type=int)
+
+
+def settings_from_args(args: argparse.Namespace) -> MockSettings:
+    return MockSettings(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        latency_spread=args.latency_spread,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        rate_limit_rate=args.rate_limit_rate,
+        error_rate=args.error_rate,
+        seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    web.run_app(create_mock_app(settings_from_args(args)), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Cold-start benchmark: wall time for a fresh interpreter to import each
+entry point, and the slowest modules from ``python -X importtime``:
+
+    python -m benchmarks.startup --runs 10 --json startup.json
+    python -m benchmarks.startup --compare startup.json
+
+Provider SDKs are imported on first use, so they are timed separately
+from the entry points that only build the UI or parse arguments.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .bench import flatten, percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+
+TARGETS = {
+    "python": "pass",
+    "gui": "import gui.main_window",
+    "cli": "import cli; cli.build_parser()",
+    "server": "import server",
+    "openai_sdk": "import openai",
+    "anthropic_sdk": "import anthropic",
+}
+
+
+def time_import(code: str, runs: int) -> Dict[str, float]:
+    seconds = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+        seconds.append(time.perf_counter() - started)
+    return {
+        "p50_ms": percentile(seconds, 0.50) * 1000,
+        "max_ms": max(seconds) * 1000
+    }
+
+
+def slowest_imports(code: str, limit: int) -> List[Tuple[str, float, float]]:
+    """(module, self ms, cumulative ms) for the modules with the most self time"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, check=True,
+                               capture_output=True, text=True)
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return sorted(modules, key=lambda module: -module[1])[:limit]
+
+
+def report(results: dict, profiles: Dict[str, List[Tuple[str, float, float]]],
+           baseline: Optional[dict] = None) -> str:
+    current = flatten(results)
+    previous = flatten(baseline) if baseline else {}
+    width = max(len(name) for name in current)
+    lines = [f"PromptBuster cold start (Python {sys.version.split()[0]})"]
+    for name, value in current.items():
+        line = f"  {name:<{width}}  {value:>10.1f}"
+        if name in previous and previous[name]:
+            change = (value - previous[name]) / previous[name] * 100
+            line += f"  ({change:+.1f}% vs {previous[name]:.1f})"
+        lines.append(line)
+    for target, modules in profiles.items():
+        lines.append(f"\nSlowest imports for {target} (self ms, cumulative ms):")
+        lines.extend(f"  {self_ms:>8.1f} {cumulative_ms:>9.1f}  {name}" for name, self_ms, cumulative_ms in modules)
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure PromptBuster's cold-start import time")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per target")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to list per entry point; 0 skips")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Show changes against results saved with --json")
+    args = parser.parse_args(argv)
+    
+    results = {target: time_import(TARGETS[target], args.runs) for target in args.targets}
+    profiles = {
+        target: slowest_imports(TARGETS[target], args.top)
+        for target in args.targets if args.top and target in ("gui", "cli", "server")
+    }
+    
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(report(results, profiles, baseline))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Session store benchmark: time to save a large store, then latency of
+listing and searching it, for a term every session matches and for a
+rare one:
+
+    python -m benchmarks.store --sessions 100000 --json store.json
+    python -m benchmarks.store --sessions 100000 --compare store.json
+
+The store is built in a temporary directory and removed afterwards.
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from config.session_store import SessionStore
+from core.models import PromptSession, ScoredCandidate
+
+from .bench import flatten, latency_summary
+
+
+def make_session(index: int) -> PromptSession:
+    # Every session mentions "billing"; one in a thousand mentions "chargebacks"
+    topic = "chargebacks" if index % 1000 == 0 else "refunds"
+    prompt = f"You are a billing assistant #{index}. Answer questions about invoices and {topic} briefly."
+    return PromptSession(
+        role=f"billing support agent {index}",
+        generated_prompt=prompt,
+        alternative_prompts=[prompt + " Cite the policy.", prompt + " Ask before escalating."],
+        scored_alternatives=[ScoredCandidate(prompt=prompt + " Cite the policy.", score=index % 10)]
+    )
+
+
+def time_calls(call: Callable[[], object], runs: int) -> Dict[str, float]:
+    seconds = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        call()
+        seconds.append(time.perf_counter() - started)
+    return latency_summary(seconds)
+
+
+def bench_store(path: Path, sessions: int, runs: int) -> dict:
+    store = SessionStore(path)
+    try:
+        started = time.perf_counter()
+        batch = 1000
+        for start in range(0, sessions, batch):
+            store.save_many((f"session-{index}", make_session(index), "gpt-4o")
+                            for index in range(start, min(start + batch, sessions)))
+        results = {"save_s": time.perf_counter() - started}
+        results["list"] = time_calls(lambda: store.list(limit=50), runs)
+        results["list_page_20"] = time_calls(lambda: store.list(limit=50, offset=1000), runs)
+        results["search_common"] = time_calls(lambda: store.search("billing", limit=50), runs)
+        results["search_common_page_20"] = time_calls(lambda: store.search("billing", limit=50, offset=1000), runs)
+        results["search_common_relevance"] = time_calls(
+            lambda: store.search("billing", limit=50, by_relevance=True), runs)
+        results["search_rare"] = time_calls(lambda: store.search("chargebacks", limit=50), runs)
+        return results
+    finally:
+        store.close()
+
+
+def report(results: dict, sessions: int, baseline: Optional[dict] = None) -> str:
+    current = flatten(results)
+    previous = flatten(baseline) if baseline else {}
+    width = max(len(name) for name in current)
+    lines = [f"PromptBuster session store ({sessions} sessions)"]
+    for name, value in current.items():
+        line = f"  {name:<{width}}  {value:>10.1f}"
+        if name in previous and previous[name]:
+            change = (value - previous[name]) / previous[name] * 100
+            line += f"  ({change:+.1f}% vs {previous[name]:.1f})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure listing and search latency of a large session store")
+    parser.add_argument("--sessions", type=int, default=100000, help="Sessions to save before timing")
+    parser.add_argument("--runs", type=int, default=20, help="Calls per timed query")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Show changes against results saved with --json")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = bench_store(Path(directory) / "sessions.db", args.sessions, args.runs)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(report(results, args.sessions, baseline))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
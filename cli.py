@@ -0,0 +1,262 @@
+"""
+Headless command line interface for PromptBuster.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+from config.settings import SettingsManager
+from core.models import BatchResult, LLMConfig, LLMProvider, RetryPolicy, SessionSummary
+
+
+def add_llm_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--provider", choices=[p.value for p in LLMProvider],
+                        help="LLM provider (defaults to the saved configuration)")
+    parser.add_argument("--model", help="Model name")
+    parser.add_argument("--base-url", help="Base URL for local or proxy endpoints")
+    parser.add_argument("--temperature", type=float)
+    parser.add_argument("--max-tokens", type=int)
+    parser.add_argument("--context-window", type=int,
+                        help="Override the model's context window used for prompt budgeting")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the response cache")
+    parser.add_argument("--rpm", type=int, help="Requests-per-minute budget for the provider")
+    parser.add_argument("--tpm", type=int, help="Tokens-per-minute budget for the provider")
+    parser.add_argument("--timeout", type=float, help="Seconds allowed per provider attempt")
+    parser.add_argument("--max-retries", type=int, help="Retries for transient provider errors")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Send a second attempt when a call runs past the observed p95 latency")
+    parser.add_argument("--routing", help="JSON file of other models to route steps to "
+                                          "(defaults to ~/.promptbuster/routing.json when present)")
+
+
+def build_config(args: argparse.Namespace, settings: SettingsManager) -> LLMConfig:
+    saved = settings.load_config()
+    provider = LLMProvider(args.provider) if args.provider else (saved.provider if saved else LLMProvider.OPENAI)
+    same_provider = saved is not None and saved.provider == provider
+    
+    if args.model:
+        model = args.model
+    elif same_provider:
+        model = saved.model
+    else:
+        raise SystemExit("--model is required when no configuration is saved for this provider")
+    
+    retry = saved.retry if same_provider else RetryPolicy()
+    retry_overrides = {"timeout": args.timeout, "max_retries": args.max_retries, "hedge": args.hedge or None}
+    retry = retry.model_copy(update={k: v for k, v in retry_overrides.items() if v is not None})
+    
+    return LLMConfig(
+        provider=provider,
+        model=model,
+        api_key=settings.get_api_key_from_env(provider),
+        base_url=args.base_url or (saved.base_url if same_provider else None),
+        temperature=args.temperature if args.temperature is not None else (saved.temperature if saved else 0.7),
+        max_tokens=args.max_tokens or (saved.max_tokens if saved else 4000),
+        context_window=args.context_window or (saved.context_window if same_provider else None),
+        use_cache=not args.no_cache,
+        requests_per_minute=args.rpm or (saved.requests_per_minute if same_provider else None),
+        tokens_per_minute=args.tpm or (saved.tokens_per_minute if same_provider else None),
+        retry=retry,
+        routing=settings.load_routing(Path(args.routing) if args.routing else None)
+    )
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    from core.batch import BatchRunner, read_jobs
+    from core.cache import ResponseCache
+    from core.llm_providers import create_provider
+    
+    settings = SettingsManager()
+    config = build_config(args, settings)
+    
+    def report(result: BatchResult):
+        detail = f" ({result.error})" if result.error else ""
+        print(f"[{result.status}] {result.id} in {result.elapsed_seconds:.1f}s{detail}", file=sys.stderr)
+    
+    async def run() -> dict:
+        cache = ResponseCache(settings.cache_dir)
+        provider = create_provider(config, cache=cache)
+        try:
+            runner = BatchRunner(
+                config,
+                concurrency=args.concurrency,
+                llm_provider=provider,
+                on_result=report,
+                example_token_budget=args.example_budget
+            )
+            return await runner.run(read_jobs(Path(args.input)), Path(args.output), resume=not args.restart)
+        finally:
+            await provider.aclose()
+    
+    if args.processes and args.processes > 1:
+        from core.batch_pool import ProcessBatchRunner
+        runner = ProcessBatchRunner(
+            config,
+            processes=args.processes,
+            concurrency=args.concurrency,
+            on_result=report,
+            example_token_budget=args.example_budget,
+            cache_dir=settings.cache_dir
+        )
+        summary = runner.run(read_jobs(Path(args.input)), Path(args.output), resume=not args.restart)
+    else:
+        summary = asyncio.run(run())
+    print(f"Completed: {summary['ok']} ok, {summary['error']} failed, {summary['skipped']} skipped", file=sys.stderr)
+    if args.metrics and args.processes > 1:
+        print("--metrics is not collected across worker processes; skipped", file=sys.stderr)
+    elif args.metrics:
+        write_metrics(Path(args.metrics))
+    return 1 if summary["error"] else 0
+
+
+def write_metrics(path: Path):
+    from core.telemetry import REGISTRY
+    
+    if path.suffix == ".prom":
+        REGISTRY.export_prometheus(path)
+    else:
+        REGISTRY.export_json(path)
+    print(f"Wrote call metrics to {path}", file=sys.stderr)
+
+
+def run_server(args: argparse.Namespace) -> int:
+    from aiohttp import web
+    from core.cache import ResponseCache
+    from server import create_app
+    
+    settings = SettingsManager()
+    config = build_config(args, settings)
+    app = create_app(config, cache=ResponseCache(settings.cache_dir), workers=args.workers,
+                     max_pending=args.queue_size)
+    web.run_app(app, host=args.host, port=args.port)
+    return 0
+
+
+def format_summary(summary: SessionSummary) -> str:
+    score = f"{summary.best_score:.1f}" if summary.best_score is not None else "-"
+    line = f"{summary.name}\t{summary.role}\t{summary.model}\t{score}\t{summary.current_step}"
+    return line + (f"\n    {summary.snippet}" if summary.snippet else "")
+
+
+def run_sessions(args: argparse.Namespace) -> int:
+    store = SettingsManager().session_store
+    
+    if args.action == "list":
+        offset = (args.page - 1) * args.page_size
+        summaries = store.list(args.page_size, offset, role=args.role, order_by=args.sort)
+    elif args.action == "search":
+        offset = (args.page - 1) * args.page_size
+        summaries = store.search(args.query, args.page_size, offset, by_relevance=args.relevance)
+    elif args.action in ("show", "history", "diff"):
+        session_id = store.get_id(args.name)
+        if session_id is None:
+            print(f"No session named {args.name}", file=sys.stderr)
+            return 1
+        if args.action == "history":
+            for revision in store.list_revisions(session_id, args.limit):
+                label = f" {revision.label}" if revision.label else ""
+                print(f"{revision.number}{label}\t{', '.join(revision.changed_fields)}")
+        elif args.action == "diff":
+            fields = [args.field] if args.field else None
+            try:
+                sys.stdout.write(store.diff_revisions(session_id, args.old, args.new, fields))
+            except ValueError as e:
+                print(e, file=sys.stderr)
+                return 1
+        elif args.revision is not None:
+            try:
+                session = store.load_revision(session_id, args.revision)
+            except ValueError as e:
+                print(e, file=sys.stderr)
+                return 1
+            print(getattr(session, args.field) if args.field else session.model_dump_json(indent=2))
+        elif args.field:
+            value = store.load_field(session_id, args.field)
+            print(value if isinstance(value, str) else json.dumps(value, indent=2))
+        else:
+            print(store.load(session_id).model_dump_json(indent=2))
+        return 0
+    else:
+        path = Path(args.path)
+        count = store.import_json_sessions(path) if path.is_dir() else store.import_batch_results(path, args.model)
+        print(f"Imported {count} sessions", file=sys.stderr)
+        return 0
+    
+    for summary in summaries:
+        print(format_summary(summary))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="promptbuster", description="PromptBuster headless mode")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    batch = subparsers.add_parser("batch", help="Run the 7-step workflow for every job in a JSONL file")
+    batch.add_argument("input", help='JSONL file of {"id", "role", "examples": [{"input_text", "expected_output"}]}')
+    batch.add_argument("-o", "--output", required=True, help="JSONL file to append results to")
+    batch.add_argument("-c", "--concurrency", type=int, default=8, help="Jobs to run at once in each process")
+    batch.add_argument("-p", "--processes", type=int, default=1,
+                       help="Worker processes to shard jobs across; the rate budget is split between them")
+    batch.add_argument("--example-budget", type=int,
+                       help="Token budget for examples in the prompt; larger sets are deduplicated and sampled")
+    batch.add_argument("--restart", action="store_true",
+                       help="Overwrite the output instead of skipping jobs already completed in it")
+    batch.add_argument("--metrics", help="Write per-step latency, token and cost metrics to this file "
+                                         "(Prometheus text for .prom, JSON otherwise; single process only)")
+    add_llm_arguments(batch)
+    batch.set_defaults(handler=run_batch)
+    
+    serve = subparsers.add_parser("serve", help="Serve the workflow over HTTP")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument("-w", "--workers", type=int, default=4, help="Jobs to run at once")
+    serve.add_argument("--queue-size", type=int, default=100,
+                       help="Jobs allowed to wait before requests are rejected with 503")
+    add_llm_arguments(serve)
+    serve.set_defaults(handler=run_server)
+    
+    sessions = subparsers.add_parser("sessions", help="Browse and search saved sessions")
+    actions = sessions.add_subparsers(dest="action", required=True)
+    listing = actions.add_parser("list", help="List sessions, most recently updated first")
+    listing.add_argument("--role", help="Only sessions for this role")
+    listing.add_argument("--sort", choices=["updated", "score", "name"], default="updated")
+    search = actions.add_parser("search", help="Full-text search over roles, guides and prompts")
+    search.add_argument("query")
+    search.add_argument("--relevance", action="store_true", help="Order by relevance instead of recency")
+    for action in (listing, search):
+        action.add_argument("--page", type=int, default=1)
+        action.add_argument("--page-size", type=int, default=50)
+    show = actions.add_parser("show", help="Print one session as JSON")
+    show.add_argument("name")
+    show.add_argument("--field", help="Print only this session field")
+    show.add_argument("--revision", type=int, help="Print an earlier revision")
+    history = actions.add_parser("history", help="List a session's revisions, newest first")
+    history.add_argument("name")
+    history.add_argument("--limit", type=int, default=50)
+    diff = actions.add_parser("diff", help="Diff two revisions of a session")
+    diff.add_argument("name")
+    diff.add_argument("old", type=int)
+    diff.add_argument("new", type=int)
+    diff.add_argument("--field", help="Only diff this session field")
+    importing = actions.add_parser("import", help="Index a sessions directory or a batch output JSONL file")
+    importing.add_argument("path")
+    importing.add_argument("--model", default="", help="Model recorded for imported batch sessions")
+    sessions.set_defaults(handler=run_sessions)
+    
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    load_dotenv()
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import json
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+from pydantic_core import to_jsonable_python
+from core.models import PromptSession
+
+
+class SessionJournal:
+    """Write-ahead log of session field updates with periodic compaction.
+
+    ``record`` only enqueues the change; a background thread appends one
+    JSON line per update to ``session.journal`` and fsyncs it. Every
+    ``compact_every`` entries the current state is written to
+    ``session.json`` and the journal is truncated. ``recover`` replays the
+    journal over the snapshot.
+    """
+
+    def __init__(self, directory: Path, compact_every: int = 50):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.snapshot_file = self.directory / "session.json"
+        self.journal_file = self.directory / "session.journal"
+        self.compact_every = compact_every
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._state: Dict[str, Any] = {}
+        self._entries = 0
+        self._thread: Optional[threading.Thread] = None
+    
+    def _read_state(self) -> Dict[str, Any]:
+        state: Dict[str, Any] = {}
+        try:
+            with open(self.snapshot_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            pass
+        
+        try:
+            with open(self.journal_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn write from a crash: everything before it is intact
+                        break
+                    if entry.get("reset"):
+                        state = {}
+                    else:
+                        state[entry["field"]] = entry["value"]
+        except OSError:
+            pass
+        return state
+    
+    def recover(self) -> Optional[PromptSession]:
+        """The last saved session, or None if nothing worth restoring was saved"""
+        state = self._read_state()
+        if not state:
+            return None
+        try:
+            session = PromptSession.model_validate(state)
+        except ValueError:
+            return None
+        return session if session != PromptSession() else None
+    
+    def start(self, session: Optional[PromptSession] = None) -> "SessionJournal":
+        """Begin journaling, seeded with the session being edited.
+
+        Calling it again re-seeds a running journal, e.g. after the session
+        is saved, so later updates are replayed over the whole session.
+        """
+        state = session.model_dump(mode="json") if session is not None else self._read_state()
+        # Seeding goes through the queue so it lands after updates already recorded
+        self._queue.put(("seed", state))
+        self._queue.put(("compact",))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="promptbuster-autosave", daemon=True)
+            self._thread.start()
+        return self
+    
+    def record(self, field: str, value: Any):
+        """Thread-safe and non-blocking: queue one field update for persistence"""
+        self._queue.put(("set", field, value))
+    
+    def reset(self):
+        self._queue.put(("reset",))
+    
+    def flush(self):
+        """Block until every queued update has been written"""
+        if self._thread is not None:
+            self._queue.join()
+    
+    def close(self):
+        if self._thread is None:
+            return
+        self._queue.put(("compact",))
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        self._thread = None
+    
+    def _run(self):
+        journal = open(self.journal_file, "a", encoding="utf-8")
+        try:
+            while True:
+                item = self._queue.get()
+                try:
+                    if item is None:
+                        return
+                    if item[0] == "seed":
+                        self._state = item[1]
+                        continue
+                    if item[0] == "compact":
+                        journal = self._compact(journal)
+                        continue
+                    
+                    if item[0] == "reset":
+                        self._state = {}
+                        entry = {"reset": True}
+                    else:
+                        _, field, value = item
+                        value = to_jsonable_python(value)
+                        self._state[field] = value
+                        entry = {"field": field, "value": value}
+                    
+                    journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    journal.flush()
+                    os.fsync(journal.fileno())
+                    self._entries += 1
+                    if self._entries >= self.compact_every:
+                        journal = self._compact(journal)
+                finally:
+                    self._queue.task_done()
+        finally:
+            journal.close()
+    
+    def _compact(self, journal):
+        tmp_file = self.snapshot_file.with_suffix(".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        tmp_file.replace(self.snapshot_file)
+        
+        journal.close()
+        self._entries = 0
+        return open(self.journal_file, "w", encoding="utf-8")
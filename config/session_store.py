@@ -0,0 +1,407 @@
+import difflib
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Type, get_args
+from pydantic import BaseModel
+from core.models import BatchResult, PromptSession, SessionRevision, SessionSummary
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    role TEXT NOT NULL DEFAULT '',
+    model TEXT NOT NULL DEFAULT '',
+    best_score REAL,
+    current_step TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS sessions_role ON sessions (role, updated_at DESC);
+CREATE INDEX IF NOT EXISTS sessions_score ON sessions (best_score DESC, id DESC);
+-- Full session JSON is kept apart so listings never read it
+CREATE TABLE IF NOT EXISTS session_bodies (
+    session_id INTEGER PRIMARY KEY REFERENCES sessions (id) ON DELETE CASCADE,
+    data TEXT NOT NULL
+);
+-- Each distinct text is stored once, zlib-compressed, keyed by its SHA-256
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+-- A revision maps every session field to blob hashes
+CREATE TABLE IF NOT EXISTS revisions (
+    session_id INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    number INTEGER NOT NULL,
+    label TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    manifest TEXT NOT NULL,
+    changed_fields TEXT NOT NULL,
+    PRIMARY KEY (session_id, number)
+);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS session_text USING fts5 (
+    role, prompt_guide, generated_prompt, evaluation_guide, alternatives, final_prompt,
+    tokenize = 'porter unicode61'
+);
+"""
+
+SUMMARY_COLUMNS = "s.id, s.name, s.role, s.model, s.best_score, s.current_step, s.updated_at"
+
+ORDERINGS = {
+    "updated": "s.updated_at DESC, s.id DESC",
+    # NULL sorts lowest, so unscored sessions come last
+    "score": "s.best_score DESC, s.id DESC",
+    "name": "s.name",
+}
+
+
+def blob_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def item_model(field: str) -> Optional[Type[BaseModel]]:
+    """The model of a session field that is a list of models, such as scored_alternatives"""
+    args = get_args(PromptSession.model_fields[field].annotation)
+    if args and isinstance(args[0], type) and issubclass(args[0], BaseModel):
+        return args[0]
+    return None
+
+
+def best_score(session: PromptSession) -> Optional[float]:
+    scores = [c.score for c in session.scored_alternatives if c.score is not None]
+    return max(scores) if scores else None
+
+
+class SessionStore:
+    """SQLite index of saved sessions with full-text search over prompts and guides"""
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        try:
+            self._conn.executescript(FTS_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search falls back to LIKE
+            self.full_text = False
+        self._conn.commit()
+    
+    def save(self, name: str, session: PromptSession, model: str = "") -> int:
+        """Insert or replace a session by name and return its id; changes are kept as a new revision"""
+        with self._lock, self._conn:
+            return self._save(name, session, model, time.time())
+    
+    def save_many(self, items: Iterable[tuple]) -> int:
+        """Save (name, session, model) tuples in one transaction"""
+        count = 0
+        now = time.time()
+        with self._lock, self._conn:
+            for name, session, model in items:
+                self._save(name, session, model, now)
+                count += 1
+        return count
+    
+    def _save(self, name: str, session: PromptSession, model: str, now: float, label: str = "") -> int:
+        row = self._conn.execute(
+            """INSERT INTO sessions (name, role, model, best_score, current_step, created_at, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (name) DO UPDATE SET role = excluded.role, model = excluded.model,
+                   best_score = excluded.best_score, current_step = excluded.current_step,
+                   updated_at = excluded.updated_at
+               RETURNING id""",
+            (name, session.role, model, best_score(session), session.current_step.value, now, now)
+        ).fetchone()
+        session_id = row[0]
+        
+        self._conn.execute(
+            "INSERT OR REPLACE INTO session_bodies (session_id, data) VALUES (?, ?)",
+            (session_id, session.model_dump_json())
+        )
+        if self.full_text:
+            self._conn.execute("DELETE FROM session_text WHERE rowid = ?", (session_id,))
+            self._conn.execute(
+                "INSERT INTO session_text (rowid, role, prompt_guide, generated_prompt, evaluation_guide, "
+                "alternatives, final_prompt) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session_id, session.role, session.prompt_guide, session.generated_prompt,
+                 session.evaluation_guide, "\n\n".join(session.alternative_prompts), session.final_prompt)
+            )
+        self._commit_revision(session_id, session, label, now)
+        return session_id
+    
+    def count(self, role: Optional[str] = None) -> int:
+        with self._lock:
+            if role is None:
+                return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM sessions WHERE role = ?", (role,)).fetchone()[0]
+    
+    def list(self, limit: int = 50, offset: int = 0, role: Optional[str] = None,
+             order_by: str = "updated") -> List[SessionSummary]:
+        """One page of summaries; session bodies are not read"""
+        where, params = ("WHERE s.role = ?", [role]) if role is not None else ("", [])
+        sql = (f"SELECT {SUMMARY_COLUMNS} FROM sessions s {where} "
+               f"ORDER BY {ORDERINGS[order_by]} LIMIT ? OFFSET ?")
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit, offset]).fetchall()
+        return [SessionSummary(**dict(row)) for row in rows]
+    
+    def search(self, query: str, limit: int = 50, offset: int = 0,
+               by_relevance: bool = False) -> List[SessionSummary]:
+        """Full-text search across role, guides and prompts, newest first.
+
+        Relevance ordering has to score every match, so it is slower for
+        common terms.
+        """
+        if self.full_text:
+            # Rowids follow creation, not the last save, so order by the session's timestamp.
+            # The subquery picks the page first; snippets are only built for its rows.
+            order = f"rank, {ORDERINGS['updated']}" if by_relevance else ORDERINGS["updated"]
+            match = self._match_expression(query)
+            sql = (f"SELECT {SUMMARY_COLUMNS}, snippet(session_text, -1, '[', ']', '...', 12) AS snippet "
+                   f"FROM session_text JOIN sessions s ON s.id = session_text.rowid "
+                   f"WHERE session_text MATCH ? AND session_text.rowid IN ("
+                   f"SELECT session_text.rowid FROM session_text JOIN sessions s ON s.id = session_text.rowid "
+                   f"WHERE session_text MATCH ? ORDER BY {order} LIMIT ? OFFSET ?) "
+                   f"ORDER BY {order}")
+            params = [match, match, limit, offset]
+        else:
+            sql = (f"SELECT {SUMMARY_COLUMNS} FROM sessions s JOIN session_bodies b ON b.session_id = s.id "
+                   f"WHERE b.data LIKE ? ORDER BY {ORDERINGS['updated']} LIMIT ? OFFSET ?")
+            params = [f"%{query}%", limit, offset]
+        
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [SessionSummary(**dict(row)) for row in rows]
+    
+    @staticmethod
+    def _match_expression(query: str) -> str:
+        # Quote each term so user input can't be parsed as FTS syntax
+        terms = [term.replace('"', '""') for term in query.split()]
+        return " ".join(f'"{term}"' for term in terms) or '""'
+    
+    def get_id(self, name: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM sessions WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+    
+    def load(self, session_id: int) -> Optional[PromptSession]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM session_bodies WHERE session_id = ?", (session_id,)).fetchone()
+        return PromptSession.model_validate_json(row[0]) if row else None
+    
+    def load_field(self, session_id: int, field: str):
+        """Read a single session field without parsing the rest"""
+        if field not in PromptSession.model_fields:
+            raise ValueError(f"Unknown session field: {field}")
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT json_quote(json_extract(data, ?)) FROM session_bodies WHERE session_id = ?",
+                (f"$.{field}", session_id)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def delete(self, session_id: int) -> bool:
+        with self._lock, self._conn:
+            deleted = self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount
+            if self.full_text:
+                self._conn.execute("DELETE FROM session_text WHERE rowid = ?", (session_id,))
+        return bool(deleted)
+    
+    def _put_blob(self, text: str) -> str:
+        digest = blob_hash(text)
+        if self._conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone() is None:
+            self._conn.execute("INSERT INTO blobs (hash, data) VALUES (?, ?)",
+                               (digest, zlib.compress(text.encode("utf-8"))))
+        return digest
+    
+    def _get_blob(self, digest: str) -> str:
+        row = self._conn.execute("SELECT data FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8")
+    
+    def _manifest(self, session: PromptSession) -> Dict[str, object]:
+        manifest = {}
+        for field, info in PromptSession.model_fields.items():
+            value = getattr(session, field)
+            if info.annotation is str:
+                manifest[field] = self._put_blob(value)
+            elif info.annotation == List[str]:
+                # Per-item hashes so candidates carried between rounds are shared
+                manifest[field] = [self._put_blob(item) for item in value]
+            elif item_model(field) is not None:
+                # Likewise per item, with each attribute hashed apart so an unchanged
+                # prompt or critique is shared even when its score changes
+                manifest[field] = [
+                    {
+                        name: self._put_blob(text if isinstance(text, str) else json.dumps(text, sort_keys=True))
+                        for name, text in item.model_dump(mode="json").items()
+                    }
+                    for item in value
+                ]
+            else:
+                manifest[field] = self._put_blob(json.dumps(
+                    session.model_dump(mode="json", include={field})[field], sort_keys=True))
+        return manifest
+    
+    def _commit_revision(self, session_id: int, session: PromptSession, label: str, now: float) -> int:
+        manifest = self._manifest(session)
+        latest = self._conn.execute(
+            "SELECT number, manifest FROM revisions WHERE session_id = ? ORDER BY number DESC LIMIT 1", (session_id,)
+        ).fetchone()
+        if latest:
+            previous = json.loads(latest["manifest"])
+            changed = [field for field, digest in manifest.items() if previous.get(field) != digest]
+        else:
+            defaults = PromptSession()
+            changed = [field for field in manifest if getattr(session, field) != getattr(defaults, field)]
+        if latest and not changed:
+            return latest["number"]
+        
+        number = latest["number"] + 1 if latest else 1
+        self._conn.execute(
+            "INSERT INTO revisions (session_id, number, label, created_at, manifest, changed_fields) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (session_id, number, label, now, json.dumps(manifest), json.dumps(changed))
+        )
+        return number
+    
+    def commit_revision(self, session_id: int, session: PromptSession, label: str = "") -> int:
+        """Record a revision without touching the current session; unchanged sessions reuse the latest"""
+        with self._lock, self._conn:
+            return self._commit_revision(session_id, session, label, time.time())
+    
+    def record_revision(self, name: str, session: PromptSession, model: str = "", label: str = "") -> int:
+        """Add a revision to the session saved under ``name``, e.g. one optimizer generation.
+
+        The saved session itself is left as it is; a name that isn't saved yet
+        is saved with this as its first revision. Returns the revision number.
+        """
+        with self._lock, self._conn:
+            now = time.time()
+            row = self._conn.execute("SELECT id FROM sessions WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                self._save(name, session, model, now, label)
+                return 1
+            return self._commit_revision(row[0], session, label, now)
+    
+    def list_revisions(self, session_id: int, limit: int = 100, offset: int = 0) -> List[SessionRevision]:
+        """Revisions newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT number, label, created_at, changed_fields FROM revisions WHERE session_id = ? "
+                "ORDER BY number DESC LIMIT ? OFFSET ?", (session_id, limit, offset)
+            ).fetchall()
+        return [SessionRevision(number=row["number"], label=row["label"], created_at=row["created_at"],
+                                changed_fields=json.loads(row["changed_fields"])) for row in rows]
+    
+    def _revision_fields(self, session_id: int, number: int, fields: Optional[Iterable[str]] = None) -> Dict[str, object]:
+        row = self._conn.execute(
+            "SELECT manifest FROM revisions WHERE session_id = ? AND number = ?", (session_id, number)
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Session has no revision {number}")
+        
+        manifest = json.loads(row[0])
+        values = {}
+        for field in fields or manifest:
+            digest = manifest[field]
+            if isinstance(digest, list) and item_model(field) is not None:
+                model = item_model(field)
+                values[field] = [
+                    {
+                        name: self._get_blob(item_digest) if model.model_fields[name].annotation is str
+                        else json.loads(self._get_blob(item_digest))
+                        for name, item_digest in item.items()
+                    }
+                    for item in digest
+                ]
+            elif isinstance(digest, list):
+                values[field] = [self._get_blob(item) for item in digest]
+            elif PromptSession.model_fields[field].annotation is str:
+                values[field] = self._get_blob(digest)
+            else:
+                values[field] = json.loads(self._get_blob(digest))
+        return values
+    
+    def load_revision(self, session_id: int, number: int) -> PromptSession:
+        with self._lock:
+            return PromptSession.model_validate(self._revision_fields(session_id, number))
+    
+    def diff_revisions(self, session_id: int, old: int, new: int, fields: Optional[Iterable[str]] = None) -> str:
+        """Unified diff of the text of every field that differs between two revisions"""
+        with self._lock:
+            before = self._revision_fields(session_id, old, fields)
+            after = self._revision_fields(session_id, new, fields)
+        
+        def render(value) -> List[str]:
+            if isinstance(value, str):
+                text = value
+            elif isinstance(value, list) and all(isinstance(item, str) for item in value):
+                text = "\n\n".join(f"{i}. {item}" for i, item in enumerate(value, start=1))
+            else:
+                text = json.dumps(value, indent=2, sort_keys=True)
+            return text.splitlines(keepends=True)
+        
+        chunks = []
+        for field in before:
+            if before[field] == after[field]:
+                continue
+            diff = difflib.unified_diff(render(before[field]), render(after[field]),
+                                        fromfile=f"{field}@{old}", tofile=f"{field}@{new}")
+            chunks.append("".join(line if line.endswith("\n") else line + "\n" for line in diff))
+        return "".join(chunks)
+    
+    def prune_blobs(self) -> int:
+        """Delete blobs no revision refers to, e.g. after deleting sessions"""
+        with self._lock, self._conn:
+            referenced = set()
+            for (manifest,) in self._conn.execute("SELECT manifest FROM revisions"):
+                for digest in json.loads(manifest).values():
+                    for item in digest if isinstance(digest, list) else [digest]:
+                        referenced.update(item.values() if isinstance(item, dict) else [item])
+            orphans = [row[0] for row in self._conn.execute("SELECT hash FROM blobs") if row[0] not in referenced]
+            self._conn.executemany("DELETE FROM blobs WHERE hash = ?", [(digest,) for digest in orphans])
+        return len(orphans)
+    
+    def import_json_sessions(self, directory: Path) -> int:
+        """Index the legacy one-file-per-session JSON directory"""
+        def read():
+            for session_file in sorted(Path(directory).glob("*.json")):
+                try:
+                    with open(session_file, "r") as f:
+                        yield session_file.stem, PromptSession.model_validate(json.load(f)), ""
+                except (OSError, ValueError):
+                    continue
+        
+        return self.save_many(read())
+    
+    def import_batch_results(self, path: Path, model: str = "") -> int:
+        """Index every successful session from a batch output JSONL file"""
+        def read():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        result = BatchResult.model_validate_json(line)
+                    except ValueError:
+                        continue
+                    if result.session is not None:
+                        yield result.id, result.session, model
+        
+        return self.save_many(read())
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
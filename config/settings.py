@@ -2,13 +2,19 @@ import os
 import json
 from typing import Optional, Dict, Any
 from pathlib import Path
-from core.models import LLMConfig, LLMProvider
+from core.models import LLMConfig, LLMProvider, PromptSession, RetryPolicy, RoutingPolicy
+from .session_store import SessionStore
 
 
 class SettingsManager:
     def __init__(self):
         self.config_dir = Path.home() / ".promptbuster"
         self.config_file = self.config_dir / "config.json"
+        self.routing_file = self.config_dir / "routing.json"
+        self.cache_dir = self.config_dir / "cache"
+        self.autosave_dir = self.config_dir / "autosave"
+        self.sessions_db = self.config_dir / "sessions.db"
+        self._session_store = None
         self.ensure_config_dir()
     
     def ensure_config_dir(self):
@@ -21,7 +27,13 @@ class SettingsManager:
             "model": config.model,
             "base_url": config.base_url,
             "temperature": config.temperature,
-            "max_tokens": config.max_tokens
+            "max_tokens": config.max_tokens,
+            "context_window": config.context_window,
+            "prompt_caching": config.prompt_caching,
+            "use_cache": config.use_cache,
+            "requests_per_minute": config.requests_per_minute,
+            "tokens_per_minute": config.tokens_per_minute,
+            "retry": config.retry.model_dump()
         }
         
         with open(self.config_file, "w") as f:
@@ -41,11 +53,30 @@ class SettingsManager:
                 model=config_data["model"],
                 base_url=config_data.get("base_url"),
                 temperature=config_data.get("temperature", 0.7),
-                max_tokens=config_data.get("max_tokens", 4000)
+                max_tokens=config_data.get("max_tokens", 4000),
+                context_window=config_data.get("context_window"),
+                prompt_caching=config_data.get("prompt_caching", True),
+                use_cache=config_data.get("use_cache", True),
+                requests_per_minute=config_data.get("requests_per_minute"),
+                tokens_per_minute=config_data.get("tokens_per_minute"),
+                retry=RetryPolicy(**config_data.get("retry", {}))
             )
         except (json.JSONDecodeError, KeyError, ValueError):
             return None
     
+    def load_routing(self, path: Optional[Path] = None) -> Optional[RoutingPolicy]:
+        """Load the models to route steps between, taking their API keys from the environment"""
+        path = path or self.routing_file
+        if not path.exists():
+            return None
+        
+        with open(path, "r") as f:
+            routing = RoutingPolicy.model_validate(json.load(f))
+        for route in routing.routes:
+            if route.provider is not None and not route.api_key:
+                route.api_key = self.get_api_key_from_env(route.provider)
+        return routing
+    
     def get_api_key_from_env(self, provider: LLMProvider) -> Optional[str]:
         """Get API key from environment variables"""
         env_var_map = {
@@ -58,33 +89,30 @@ class SettingsManager:
             return os.getenv(env_var)
         return None
     
+    @property
+    def session_store(self) -> SessionStore:
+        """The indexed session store, importing legacy JSON sessions when first created"""
+        if self._session_store is None:
+            is_new = not self.sessions_db.exists()
+            self._session_store = SessionStore(self.sessions_db)
+            legacy_dir = self.config_dir / "sessions"
+            if is_new and legacy_dir.exists():
+                self._session_store.import_json_sessions(legacy_dir)
+        return self._session_store
+    
     def save_session(self, session_name: str, session_data: Dict[str, Any]) -> None:
         """Save a prompt engineering session"""
-        sessions_dir = self.config_dir / "sessions"
-        sessions_dir.mkdir(exist_ok=True)
-        
-        session_file = sessions_dir / f"{session_name}.json"
-        with open(session_file, "w") as f:
-            json.dump(session_data, f, indent=2)
+        self.session_store.save(session_name, PromptSession.model_validate(session_data))
     
     def load_session(self, session_name: str) -> Optional[Dict[str, Any]]:
         """Load a prompt engineering session"""
-        sessions_dir = self.config_dir / "sessions"
-        session_file = sessions_dir / f"{session_name}.json"
-        
-        if not session_file.exists():
+        session_id = self.session_store.get_id(session_name)
+        if session_id is None:
             return None
         
-        try:
-            with open(session_file, "r") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return None
+        session = self.session_store.load(session_id)
+        return session.model_dump(mode="json") if session else None
     
-    def list_sessions(self) -> list[str]:
-        """List all saved sessions"""
-        sessions_dir = self.config_dir / "sessions"
-        if not sessions_dir.exists():
-            return []
-        
-        return [f.stem for f in sessions_dir.glob("*.json")]
\ No newline at end of file
+    def list_sessions(self, limit: int = 50, offset: int = 0) -> list[str]:
+        """List saved sessions, most recently updated first"""
+        return [summary.name for summary in self.session_store.list(limit, offset)]
\ No newline at end of file
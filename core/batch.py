@@ -0,0 +1,148 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Set
+import httpx
+from .models import BatchJob, BatchResult, LLMConfig
+from .llm_providers import BaseLLMProvider, create_provider
+from .rate_limit import PRIORITY_BATCH, request_priority
+from .workflow import PromptBusterWorkflow
+
+
+def read_jobs(path: Path) -> Iterator[BatchJob]:
+    """Yield jobs from a JSONL file of {"id"?, "role", "examples"} objects"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            data = json.loads(line)
+            data.setdefault("id", str(line_number))
+            data["id"] = str(data["id"])
+            yield BatchJob(**data)
+
+
+def read_completed_ids(path: Path) -> Set[str]:
+    """IDs already written to a results file, so a rerun can skip them"""
+    completed = set()
+    if not path.exists():
+        return completed
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A partial last line from a crash; that job is rerun
+                continue
+            if result.get("status") == "ok":
+                completed.add(str(result["id"]))
+    return completed
+
+
+class BatchRunner:
+    """Runs the full workflow for many jobs with bounded concurrency.
+
+    Results are appended to the output JSONL as each job finishes, so a
+    crash only loses the jobs that were in flight.
+    """
+
+    def __init__(self, llm_config: LLMConfig, concurrency: int = 8,
+                 llm_provider: Optional[BaseLLMProvider] = None,
+                 on_result: Optional[Callable[[BatchResult], None]] = None,
+                 example_token_budget: Optional[int] = None):
+        self.llm_config = llm_config
+        self.concurrency = max(1, concurrency)
+        # When set, large example sets are deduplicated, split and packed into this budget
+        self.example_token_budget = example_token_budget
+        self.llm_provider = llm_provider
+        self.on_result = on_result
+    
+    async def run_job(self, job: BatchJob, provider: BaseLLMProvider) -> BatchResult:
+        workflow = PromptBusterWorkflow(self.llm_config, llm_provider=provider)
+        workflow.set_role(job.role)
+        started = time.perf_counter()
+        try:
+            if self.example_token_budget:
+                workflow.load_examples(job.examples, self.example_token_budget)
+            else:
+                workflow.set_examples(job.examples)
+            # Batch calls yield to interactive requests sharing the same rate limiter
+            with request_priority(PRIORITY_BATCH):
+                session = await workflow.run_all()
+        except Exception as e:
+            return BatchResult(
+                id=job.id,
+                status="error",
+                error=f"{type(e).__name__}: {e}",
+                elapsed_seconds=time.perf_counter() - started
+            )
+        return BatchResult(
+            id=job.id,
+            status="ok",
+            session=session,
+            elapsed_seconds=time.perf_counter() - started
+        )
+    
+    async def run(self, jobs: Iterable[BatchJob], output_path: Path, resume: bool = True) -> dict:
+        output_path = Path(output_path)
+        skip = read_completed_ids(output_path) if resume else set()
+        summary = {"ok": 0, "error": 0, "skipped": 0}
+        
+        owns_provider = self.llm_provider is None
+        http_client = None
+        provider = self.llm_provider
+        if owns_provider:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.concurrency * 2,
+                                    max_keepalive_connections=self.concurrency),
+                timeout=httpx.Timeout(60.0, connect=10.0)
+            )
+            provider = create_provider(self.llm_config, http_client)
+        
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        
+        async def worker(out):
+            while True:
+                job = await queue.get()
+                try:
+                    if job is None:
+                        return
+                    result = await self.run_job(job, provider)
+                    out.write(result.model_dump_json() + "\n")
+                    out.flush()
+                    summary[result.status] += 1
+                    if self.on_result:
+                        self.on_result(result)
+                finally:
+                    queue.task_done()
+        
+        async def produce():
+            for job in jobs:
+                if job.id in skip:
+                    summary["skipped"] += 1
+                    continue
+                await queue.put(job)
+            for _ in range(self.concurrency):
+                await queue.put(None)
+        
+        try:
+            with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+                workers = [asyncio.ensure_future(worker(out)) for _ in range(self.concurrency)]
+                tasks = [asyncio.ensure_future(produce())] + workers
+                try:
+                    # A worker that fails (say, writing a result) would leave the producer
+                    # blocked on a full queue, so the first failure stops the whole run
+                    done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+                    errors = [task.exception() for task in done if task.exception() is not None]
+                    if errors:
+                        raise errors[0]
+                finally:
+                    for task in tasks:
+                        task.cancel()
+        finally:
+            if owns_provider:
+                await provider.aclose()
+                await http_client.aclose()
+        
+        return summary
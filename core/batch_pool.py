@@ -0,0 +1,188 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from .batch import BatchRunner, read_completed_ids
+from .models import BatchJob, BatchResult, LLMConfig
+
+
+def _share(limit: Optional[int], workers: int) -> Optional[int]:
+    return max(1, limit // workers) if limit else limit
+
+
+def _worker_main(config_json: str, concurrency: int, example_token_budget: Optional[int],
+                 cache_dir: Optional[str], tasks, results):
+    asyncio.run(_serve(LLMConfig.model_validate_json(config_json), concurrency, example_token_budget,
+                       cache_dir, tasks, results))
+
+
+async def _serve(config: LLMConfig, concurrency: int, example_token_budget: Optional[int],
+                 cache_dir: Optional[str], tasks, results):
+    # Imported here so the coordinator never loads provider SDKs it doesn't use
+    from .cache import ResponseCache
+    from .llm_providers import create_provider
+    
+    pid = os.getpid()
+    provider = create_provider(config, cache=ResponseCache(Path(cache_dir)) if cache_dir else None)
+    runner = BatchRunner(config, concurrency, provider, example_token_budget=example_token_budget)
+    loop = asyncio.get_running_loop()
+    # Hold at most one job beyond those running so idle processes can take the rest
+    local: asyncio.Queue = asyncio.Queue(maxsize=1)
+    
+    async def feed():
+        while True:
+            payload = await loop.run_in_executor(None, tasks.get)
+            if payload is None:
+                break
+            job = BatchJob.model_validate_json(payload)
+            results.put(("claim", pid, job.id))
+            await local.put(job)
+        for _ in range(concurrency):
+            await local.put(None)
+    
+    async def work():
+        while True:
+            job = await local.get()
+            if job is None:
+                return
+            result = await runner.run_job(job, provider)
+            # Serialised here, so the coordinator only writes lines
+            results.put(("result", pid, result.model_dump_json(), result.id, result.status,
+                         result.error, result.elapsed_seconds))
+    
+    try:
+        await asyncio.gather(feed(), *[work() for _ in range(concurrency)])
+    finally:
+        await provider.aclose()
+        results.put(("done", pid))
+
+
+class ProcessBatchRunner:
+    """Shards batch jobs across worker processes, each with its own event loop and providers.
+
+    Workers pull jobs from a shared queue, so faster processes take more
+    of them. The rate budget is split evenly between processes. The
+    coordinator is the only writer of the output JSONL, which doubles as
+    the checkpoint of completed job IDs. ``on_result`` receives results
+    without their session, to keep the coordinator from parsing them.
+    """
+    
+    def __init__(self, llm_config: LLMConfig, processes: Optional[int] = None, concurrency: int = 8,
+                 on_result: Optional[Callable[[BatchResult], None]] = None,
+                 example_token_budget: Optional[int] = None, cache_dir: Optional[Path] = None):
+        self.llm_config = llm_config
+        self.processes = max(1, processes or os.cpu_count() or 1)
+        # Concurrent jobs within each process
+        self.concurrency = max(1, concurrency)
+        self.on_result = on_result
+        self.example_token_budget = example_token_budget
+        self.cache_dir = cache_dir
+    
+    def worker_config(self) -> LLMConfig:
+        routing = self.llm_config.routing
+        if routing is not None:
+            routing = routing.model_copy(update={
+                "routes": [
+                    route.model_copy(update={
+                        "requests_per_minute": _share(route.requests_per_minute, self.processes),
+                        "tokens_per_minute": _share(route.tokens_per_minute, self.processes)
+                    })
+                    for route in routing.routes
+                ],
+                # Each process tracks its own spend
+                "budget_usd": routing.budget_usd / self.processes if routing.budget_usd else routing.budget_usd
+            })
+        return self.llm_config.model_copy(update={
+            "requests_per_minute": _share(self.llm_config.requests_per_minute, self.processes),
+            "tokens_per_minute": _share(self.llm_config.tokens_per_minute, self.processes),
+            "routing": routing
+        })
+    
+    def run(self, jobs: Iterable[BatchJob], output_path: Path, resume: bool = True) -> dict:
+        output_path = Path(output_path)
+        skip = read_completed_ids(output_path) if resume else set()
+        summary = {"ok": 0, "error": 0, "skipped": 0}
+        
+        # Spawned rather than forked: the parent may already run threads and event loops
+        context = multiprocessing.get_context("spawn")
+        tasks = context.Queue(maxsize=self.processes * self.concurrency * 2)
+        results = context.Queue()
+        workers = [
+            context.Process(
+                target=_worker_main,
+                args=(self.worker_config().model_dump_json(), self.concurrency, self.example_token_budget,
+                      str(self.cache_dir) if self.cache_dir else None, tasks, results),
+                daemon=True
+            )
+            for _ in range(self.processes)
+        ]
+        for worker in workers:
+            worker.start()
+        
+        feed_errors: List[BaseException] = []
+        
+        def feed():
+            try:
+                for job in jobs:
+                    if job.id in skip:
+                        summary["skipped"] += 1
+                        continue
+                    tasks.put(job.model_dump_json())
+            except BaseException as e:
+                # Raised again by run() once the workers have drained the queued jobs
+                feed_errors.append(e)
+            finally:
+                for _ in workers:
+                    tasks.put(None)
+        
+        feeder = threading.Thread(target=feed, name="promptbuster-batch-feeder", daemon=True)
+        feeder.start()
+        
+        in_flight: Dict[int, Set[str]] = {worker.pid: set() for worker in workers}
+        finished: Set[int] = set()
+        
+        def record(out, line: str, result: BatchResult):
+            out.write(line + "\n")
+            out.flush()
+            summary[result.status] += 1
+            if self.on_result:
+                self.on_result(result)
+        
+        try:
+            with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+                while len(finished) < len(workers):
+                    try:
+                        message = results.get(timeout=1.0)
+                    except queue.Empty:
+                        for worker in workers:
+                            if worker.pid not in finished and not worker.is_alive():
+                                # Crashed: its claimed jobs are recorded as errors and rerun on resume
+                                for job_id in in_flight.pop(worker.pid, set()):
+                                    result = BatchResult(id=job_id, status="error",
+                                                         error=f"Worker process exited with {worker.exitcode}")
+                                    record(out, result.model_dump_json(), result)
+                                finished.add(worker.pid)
+                        continue
+                    
+                    kind, pid = message[0], message[1]
+                    if kind == "claim":
+                        in_flight.setdefault(pid, set()).add(message[2])
+                    elif kind == "result":
+                        _, _, line, job_id, status, error, elapsed = message
+                        in_flight.get(pid, set()).discard(job_id)
+                        record(out, line, BatchResult(id=job_id, status=status, error=error,
+                                                      elapsed_seconds=elapsed))
+                    else:
+                        finished.add(pid)
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+                worker.join()
+        
+        if feed_errors:
+            raise feed_errors[0]
+        return summary
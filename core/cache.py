@@ -0,0 +1,225 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple
+from .llm_providers import BaseLLMProvider, ProviderWrapper, call_truncated, note_cache_hit
+
+
+_fresh_responses: contextvars.ContextVar[bool] = contextvars.ContextVar("promptbuster_fresh_responses", default=False)
+
+
+@contextmanager
+def fresh_responses():
+    """Send provider calls made inside the block around the response cache, e.g. to sample new outputs"""
+    token = _fresh_responses.set(True)
+    try:
+        yield
+    finally:
+        _fresh_responses.reset(token)
+
+
+class ResponseCache:
+    """Content-addressed LLM response cache: in-memory LRU in front of a disk store.
+
+    Entries live in ``directory/<key[:2]>/<key>.json`` and are evicted once
+    older than ``ttl_seconds`` or, oldest first, when the store grows past
+    ``max_disk_bytes``.
+    """
+
+    def __init__(self, directory: Path, max_memory_entries: int = 256,
+                 max_disk_bytes: int = 256 * 1024 * 1024, ttl_seconds: Optional[float] = 7 * 24 * 3600,
+                 enabled: bool = True):
+        self.directory = Path(directory)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._disk_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(config_fields: dict, prompt: str, system_prompt: Optional[str]) -> str:
+        payload = json.dumps(
+            {"config": config_fields, "system": system_prompt, "prompt": prompt},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+    
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+    
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._memory.move_to_end(key)
+                    return entry[1]
+                del self._memory[key]
+        
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        
+        if self._expired(data["created"]):
+            self._remove(path)
+            return None
+        
+        self._remember(key, data["created"], data["response"])
+        return data["response"]
+    
+    def put(self, key: str, response: str) -> None:
+        created = time.time()
+        self._remember(key, created, response)
+        
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created": created, "response": response}, f, ensure_ascii=False)
+        tmp_path.replace(path)
+        
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += path.stat().st_size
+        self._evict_disk()
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        for path in self.directory.glob("*/*.json"):
+            self._remove(path)
+        with self._lock:
+            self._disk_bytes = 0
+    
+    def _remember(self, key: str, created: float, response: str):
+        with self._lock:
+            self._memory[key] = (created, response)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+    
+    def _remove(self, path: Path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes -= size
+    
+    def _evict_disk(self):
+        with self._lock:
+            if self._disk_bytes is not None and self._disk_bytes <= self.max_disk_bytes:
+                return
+        
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_disk_bytes and not self._expired(mtime):
+                continue
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+        
+        with self._lock:
+            self._disk_bytes = total
+
+
+class CachedProvider(ProviderWrapper):
+    """Serves repeated requests from a ResponseCache; set ``bypass`` to force fresh calls"""
+
+    def __init__(self, inner: BaseLLMProvider, cache: ResponseCache):
+        super().__init__(inner)
+        self.cache = cache
+        self.bypass = False
+    
+    @property
+    def active(self) -> bool:
+        return self.cache.enabled and not self.bypass and not _fresh_responses.get()
+    
+    def _key(self, prompt: str, system_prompt: Optional[str], max_tokens: Optional[int]) -> str:
+        config = self.config
+        return self.cache.make_key(
+            {
+                "provider": config.provider.value,
+                "base_url": config.base_url,
+                "model": config.model,
+                "temperature": config.temperature,
+                "max_tokens": self.resolve_max_tokens(max_tokens),
+            },
+            prompt,
+            system_prompt
+        )
+    
+    async def _lookup(self, key: str) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.cache.get, key)
+    
+    async def _store(self, key: str, response: str):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.cache.put, key, response)
+    
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        if not self.active:
+            return await self.inner.generate(prompt, system_prompt, max_tokens)
+        
+        key = self._key(prompt, system_prompt, max_tokens)
+        cached = await self._lookup(key)
+        if cached is not None:
+            note_cache_hit()
+            return cached
+        
+        response = await self.inner.generate(prompt, system_prompt, max_tokens)
+        # A cut-off reply would be served again on every retry
+        if not call_truncated():
+            await self._store(key, response)
+        return response
+    
+    async def stream(self, prompt: str, system_prompt: Optional[str] = None,
+                     max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        if not self.active:
+            async for chunk in self.inner.stream(prompt, system_prompt, max_tokens):
+                yield chunk
+            return
+        
+        key = self._key(prompt, system_prompt, max_tokens)
+        cached = await self._lookup(key)
+        if cached is not None:
+            note_cache_hit()
+            yield cached
+            return
+        
+        chunks = []
+        async for chunk in self.inner.stream(prompt, system_prompt, max_tokens):
+            chunks.append(chunk)
+            yield chunk
+        if not call_truncated():
+            await self._store(key, "".join(chunks))
@@ -0,0 +1,151 @@
+import csv
+import json
+import random
+from pathlib import Path
+from typing import List, Optional, Tuple
+from .models import Example
+from .tokens import estimate_tokens
+from .similarity import jaccard, shingles, tokenize
+
+
+INPUT_KEYS = ("input_text", "input", "prompt", "question")
+OUTPUT_KEYS = ("expected_output", "output", "completion", "answer")
+
+# Tokens for the "Input: ... Output: ..." scaffolding around each example
+EXAMPLE_OVERHEAD_TOKENS = 8
+
+
+def _example_from_record(record: dict) -> Optional[Example]:
+    input_text = next((record[key] for key in INPUT_KEYS if record.get(key)), None)
+    output_text = next((record[key] for key in OUTPUT_KEYS if record.get(key)), None)
+    if input_text is None or output_text is None:
+        return None
+    return Example(input_text=str(input_text).strip(), expected_output=str(output_text).strip())
+
+
+def _read_records(path: Path) -> List[Tuple[int, dict]]:
+    """(position, record) pairs; positions are line numbers, or item numbers in a JSON list"""
+    suffix = path.suffix.lower()
+    # utf-8-sig drops the byte order mark spreadsheet exports put in front of the first header
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if suffix == ".csv":
+            reader = csv.DictReader(f)
+            return [(reader.line_num, row) for row in reader]
+        if suffix == ".json":
+            records = json.load(f)
+            if not isinstance(records, list):
+                raise ValueError("A .json examples file must contain a list of objects")
+            numbered = list(enumerate(records, start=1))
+            label = "Item"
+        else:
+            numbered = [(number, json.loads(line)) for number, line in enumerate(f, start=1) if line.strip()]
+            label = "Line"
+    for number, record in numbered:
+        if not isinstance(record, dict):
+            raise ValueError(f"{label} {number} is not a JSON object")
+    return numbered
+
+
+def load_examples(path: Path) -> Tuple[List[Example], List[int]]:
+    """Read examples from a .csv or .jsonl/.json file.
+
+    Columns/keys may be named input_text/expected_output or input/output
+    (also prompt/completion, question/answer). Returns the examples and the
+    positions of rows skipped for lacking either: line numbers for CSV and
+    JSONL files, item numbers for a JSON list.
+    """
+    examples = []
+    skipped = []
+    for number, record in _read_records(Path(path)):
+        example = _example_from_record(record)
+        if example is None:
+            skipped.append(number)
+        else:
+            examples.append(example)
+    return examples, skipped
+
+
+def example_tokens(example: Example) -> int:
+    return estimate_tokens(example.input_text) + estimate_tokens(example.expected_output) + EXAMPLE_OVERHEAD_TOKENS
+
+
+def deduplicate_examples(examples: List[Example], threshold: float = 0.9) -> List[Example]:
+    """Drop exact and near-duplicate examples (by input and output similarity)"""
+    kept: List[Example] = []
+    kept_shingles: List[set] = []
+    seen_exact = set()
+    for example in examples:
+        key = (" ".join(tokenize(example.input_text)), " ".join(tokenize(example.expected_output)))
+        if key in seen_exact:
+            continue
+        seen_exact.add(key)
+        
+        example_shingles = shingles(tokenize(example.input_text + " " + example.expected_output))
+        if any(jaccard(example_shingles, other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(example)
+        kept_shingles.append(example_shingles)
+    return kept
+
+
+def select_diverse(examples: List[Example], token_budget: int, max_examples: Optional[int] = None) -> List[Example]:
+    """Pick a representative, diverse subset that fits the token budget.
+
+    Starts from the example most similar to the rest (the most
+    representative one) and then greedily adds whichever example is
+    farthest from everything selected so far, skipping examples that no
+    longer fit the budget.
+    """
+    if not examples:
+        return []
+    
+    features = [shingles(tokenize(ex.input_text + " " + ex.expected_output), size=1) for ex in examples]
+    costs = [example_tokens(ex) for ex in examples]
+    
+    # Representativeness is estimated against a bounded sample to stay O(n)
+    rng = random.Random(0)
+    sample = rng.sample(range(len(examples)), min(len(examples), 50))
+    centrality = [sum(jaccard(features[i], features[j]) for j in sample) for i in range(len(examples))]
+    
+    selected: List[int] = []
+    remaining_budget = token_budget
+    min_distance = [float("inf")] * len(examples)
+    candidates = set(range(len(examples)))
+    
+    first = max((i for i in candidates if costs[i] <= remaining_budget), key=lambda i: centrality[i], default=None)
+    next_index = first
+    while next_index is not None:
+        selected.append(next_index)
+        candidates.discard(next_index)
+        remaining_budget -= costs[next_index]
+        if max_examples is not None and len(selected) >= max_examples:
+            break
+        
+        for i in candidates:
+            distance = 1.0 - jaccard(features[i], features[next_index])
+            if distance < min_distance[i]:
+                min_distance[i] = distance
+        
+        affordable = [i for i in candidates if costs[i] <= remaining_budget]
+        next_index = max(affordable, key=lambda i: (min_distance[i], centrality[i]), default=None)
+    
+    return [examples[i] for i in selected]
+
+
+def split_holdout(examples: List[Example], holdout_fraction: float = 0.2,
+                  seed: int = 0) -> Tuple[List[Example], List[Example]]:
+    """Shuffle deterministically and reserve a fraction for evaluation"""
+    if len(examples) < 2 or holdout_fraction <= 0:
+        return list(examples), []
+    shuffled = list(examples)
+    random.Random(seed).shuffle(shuffled)
+    holdout_size = max(1, int(len(shuffled) * holdout_fraction))
+    return shuffled[holdout_size:], shuffled[:holdout_size]
+
+
+def prepare_examples(examples: List[Example], token_budget: int = 3000, holdout_fraction: float = 0.2,
+                     max_examples: Optional[int] = None, seed: int = 0) -> Tuple[List[Example], List[Example]]:
+    """Deduplicate, split off a held-out set and select prompt examples within budget"""
+    unique = deduplicate_examples(examples)
+    pool, holdout = split_holdout(unique, holdout_fraction, seed)
+    return select_diverse(pool, token_budget, max_examples), holdout
@@ -0,0 +1,81 @@
+import asyncio
+from typing import List, Optional
+from .llm_providers import BaseLLMProvider
+from .models import Example, ExampleResult, FidelityReport
+from .similarity import char_similarity, exact_match, rouge_l, token_f1
+from .tokens import TokenBudget
+
+
+METRICS = ("exact_match", "token_f1", "rouge_l", "char_similarity")
+
+
+def score_output(index: int, output: str, expected_output: str) -> ExampleResult:
+    return ExampleResult(
+        example_index=index,
+        output=output,
+        exact_match=exact_match(output, expected_output),
+        token_f1=token_f1(output, expected_output),
+        rouge_l=rouge_l(output, expected_output),
+        char_similarity=char_similarity(output, expected_output)
+    )
+
+
+def summarize(prompt: str, results: List[ExampleResult]) -> FidelityReport:
+    report = FidelityReport(prompt=prompt, results=results)
+    if results:
+        for metric in METRICS:
+            setattr(report, metric, sum(getattr(result, metric) for result in results) / len(results))
+    return report
+
+
+class FidelityHarness:
+    """Runs candidate prompts on example inputs and compares against expected outputs.
+
+    Each candidate is sent as the system prompt with the example input as
+    the user message. Every (candidate, example) pair runs concurrently.
+    """
+
+    def __init__(self, llm_provider: BaseLLMProvider, budget: Optional[TokenBudget] = None):
+        self.llm_provider = llm_provider
+        self.budget = budget or TokenBudget(llm_provider.config)
+    
+    async def _run_example(self, prompt: str, index: int, example: Example) -> ExampleResult:
+        try:
+            output = await self.llm_provider.generate(
+                example.input_text,
+                system_prompt=prompt,
+                max_tokens=self.budget.output_room(example.input_text, prompt)
+            )
+        except Exception as e:
+            return ExampleResult(example_index=index, error=f"{type(e).__name__}: {e}")
+        # ROUGE-L is quadratic in output length; scoring inline would stall every other call
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, score_output, index, output, example.expected_output)
+    
+    async def evaluate(self, candidates: List[str], examples: List[Example]) -> List[FidelityReport]:
+        pairs = [(prompt, index, example) for prompt in candidates for index, example in enumerate(examples)]
+        results = await asyncio.gather(*[self._run_example(*pair) for pair in pairs])
+        
+        reports = []
+        for offset, prompt in enumerate(candidates):
+            start = offset * len(examples)
+            reports.append(summarize(prompt, list(results[start:start + len(examples)])))
+        return reports
+
+
+def format_matrix(reports: List[FidelityReport], metric: str = "rouge_l") -> str:
+    """Plain-text candidate x example table of one metric plus per-candidate means"""
+    if not reports:
+        return ""
+    example_count = max(len(report.results) for report in reports)
+    header = "Candidate  " + "  ".join(f"Ex{i + 1:>3}" for i in range(example_count)) + "   Mean  Exact"
+    lines = [f"{metric} per example", header]
+    for number, report in enumerate(reports, start=1):
+        cells = [
+            " err " if result.error else f"{getattr(result, metric):5.2f}"
+            for result in report.results
+        ]
+        lines.append(
+            f"#{number:<9} " + "  ".join(cells) + f"  {getattr(report, metric):5.2f}  {report.exact_match:5.2f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,163 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from .models import JobStatus
+
+FINISHED_STATES = ("ok", "error", "cancelled")
+
+
+class Job:
+    """A queued unit of work with an event log that late subscribers can replay"""
+    
+    def __init__(self, kind: str, func: Callable[["Job"], Awaitable[Any]]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.func = func
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+    
+    def snapshot(self) -> JobStatus:
+        return JobStatus(
+            id=self.id,
+            kind=self.kind,
+            status=self.status,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            result=self.result,
+            error=self.error
+        )
+    
+    def emit(self, event: str, data: Any = None):
+        self.events.append({"event": event, "data": data})
+        # Wake everyone waiting on the current event and start a fresh one
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+    
+    def _finish(self, status: str, result: Any = None, error: Optional[str] = None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        self.emit("end", self.snapshot().model_dump(mode="json"))
+    
+    async def follow(self) -> AsyncIterator[Dict[str, Any]]:
+        """Every event so far, then new ones as they arrive, until the job ends"""
+        index = 0
+        while True:
+            if index == len(self.events):
+                await self._changed.wait()
+            while index < len(self.events):
+                event = self.events[index]
+                index += 1
+                yield event
+                if event["event"] == "end":
+                    return
+    
+    async def wait(self) -> JobStatus:
+        while not self.finished:
+            await self._changed.wait()
+        return self.snapshot()
+
+
+class JobQueue:
+    """In-process job queue drained by a fixed pool of worker tasks.
+
+    Submitting raises ``asyncio.QueueFull`` once ``max_pending`` jobs are
+    waiting, so callers can shed load. Only the newest ``max_finished``
+    finished jobs are kept for polling.
+    """
+    
+    def __init__(self, workers: int = 4, max_pending: int = 100, max_finished: int = 1000):
+        self.workers = max(1, workers)
+        self.max_finished = max_finished
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.running = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+    
+    def start(self):
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+    
+    async def stop(self):
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in list(self.jobs.values()):
+            if not job.finished:
+                job._finish("cancelled")
+    
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+    
+    def submit(self, kind: str, func: Callable[[Job], Awaitable[Any]]) -> Job:
+        job = Job(kind, func)
+        self._queue.put_nowait(job)
+        self.jobs[job.id] = job
+        self._evict()
+        return job
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+    
+    def cancel(self, job_id: str) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        if job.task is not None:
+            job.task.cancel()
+        else:
+            # Still queued: the worker skips it when dequeued
+            job._finish("cancelled")
+        return True
+    
+    def _evict(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
+    
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.finished:
+                    continue
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+    
+    async def _run(self, job: Job):
+        job.status = "running"
+        job.started_at = time.time()
+        job.emit("status", "running")
+        self.running += 1
+        job.task = asyncio.ensure_future(job.func(job))
+        try:
+            result = await job.task
+        except asyncio.CancelledError:
+            job._finish("cancelled")
+            if self._stopping:
+                raise
+        except Exception as e:
+            job._finish("error", error=f"{type(e).__name__}: {e}")
+        else:
+            job._finish("ok", result)
+        finally:
+            self.running -= 1
@@ -1,83 +1,378 @@
+import importlib
+import json
 from abc import ABC, abstractmethod
-from typing import Optional
-import openai
-import anthropic
-import requests
-from .models import LLMConfig, LLMProvider
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+import httpx
+from .models import CallRecord, LLMConfig, LLMProvider
+from .tokens import get_token_counter
+
+if TYPE_CHECKING:
+    from .cache import ResponseCache
+
+# The call in progress, set by TelemetryProvider so every layer below can annotate it
+current_call: ContextVar[Optional[CallRecord]] = ContextVar("current_call", default=None)
+
+
+def report_usage(input_tokens: Optional[int], output_tokens: Optional[int], cached_input_tokens: Optional[int] = 0):
+    """Add token usage from a provider response to the current call"""
+    call = current_call.get()
+    if call is None:
+        return
+    call.input_tokens += input_tokens or 0
+    call.output_tokens += output_tokens or 0
+    call.cached_input_tokens += cached_input_tokens or 0
+
+
+def add_queue_wait(seconds: float):
+    call = current_call.get()
+    if call is not None:
+        call.queue_wait_seconds += seconds
+
+
+def note_retry():
+    call = current_call.get()
+    if call is not None:
+        call.retries += 1
+
+
+def note_hedge():
+    call = current_call.get()
+    if call is not None:
+        call.hedged = True
+
+
+def note_cache_hit():
+    call = current_call.get()
+    if call is not None:
+        call.cache_hit = True
+
+
+def note_truncated():
+    call = current_call.get()
+    if call is not None:
+        call.truncated = True
+
+
+def call_truncated() -> bool:
+    call = current_call.get()
+    return call is not None and call.truncated
 
 
 class BaseLLMProvider(ABC):
-    def __init__(self, config: LLMConfig):
+    def __init__(self, config: LLMConfig, http_client: Optional[httpx.AsyncClient] = None):
         self.config = config
+        # A shared client is owned by the caller (e.g. AsyncRuntime) and
+        # must outlive this provider, so only close clients we created.
+        self.http_client = http_client
+        self.owns_http_client = http_client is None
     
     @abstractmethod
-    async def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       max_tokens: Optional[int] = None) -> str:
         pass
+    
+    async def stream(self, prompt: str, system_prompt: Optional[str] = None,
+                     max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """Yield the completion as text chunks; falls back to a single chunk"""
+        yield await self.generate(prompt, system_prompt, max_tokens)
+    
+    def resolve_max_tokens(self, max_tokens: Optional[int]) -> int:
+        return max_tokens or self.config.max_tokens
+    
+    @property
+    def endpoint(self) -> Optional[str]:
+        return None
+    
+    async def warm_up(self) -> None:
+        """Open a pooled connection to the provider ahead of the first request"""
+        if self.http_client is None or not self.endpoint:
+            return
+        try:
+            await self.http_client.head(self.endpoint, timeout=5)
+        except httpx.HTTPError:
+            pass
+    
+    async def aclose(self) -> None:
+        pass
+
+
+class ProviderWrapper(BaseLLMProvider):
+    """Base for layers that sit in front of another provider and delegate to it"""
+
+    def __init__(self, inner: BaseLLMProvider):
+        super().__init__(inner.config, inner.http_client)
+        self.owns_http_client = inner.owns_http_client
+        self.inner = inner
+    
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        return await self.inner.generate(prompt, system_prompt, max_tokens)
+    
+    async def stream(self, prompt: str, system_prompt: Optional[str] = None,
+                     max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        async for chunk in self.inner.stream(prompt, system_prompt, max_tokens):
+            yield chunk
+    
+    @property
+    def endpoint(self) -> Optional[str]:
+        return self.inner.endpoint
+    
+    async def warm_up(self) -> None:
+        await self.inner.warm_up()
+    
+    async def aclose(self) -> None:
+        await self.inner.aclose()
 
 
 class OpenAIProvider(BaseLLMProvider):
-    def __init__(self, config: LLMConfig):
-        super().__init__(config)
-        self.client = openai.OpenAI(
+    def __init__(self, config: LLMConfig, http_client: Optional[httpx.AsyncClient] = None):
+        super().__init__(config, http_client)
+        import openai
+        self.client = openai.AsyncOpenAI(
             api_key=config.api_key,
-            base_url=config.base_url
+            base_url=config.base_url,
+            http_client=http_client,
+            timeout=config.retry.timeout,
+            max_retries=0
         )
     
-    async def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    @property
+    def endpoint(self) -> Optional[str]:
+        return str(self.client.base_url)
+    
+    def _messages(self, prompt: str, system_prompt: Optional[str]) -> list:
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
-        
-        response = self.client.chat.completions.create(
+        return messages
+    
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        response = await self.client.chat.completions.create(
             model=self.config.model,
-            messages=messages,
+            messages=self._messages(prompt, system_prompt),
             temperature=self.config.temperature,
-            max_tokens=self.config.max_tokens
+            max_tokens=self.resolve_max_tokens(max_tokens)
         )
+        self._report(response.usage)
+        if response.choices[0].finish_reason == "length":
+            note_truncated()
         return response.choices[0].message.content
+    
+    @staticmethod
+    def _report(usage):
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        report_usage(usage.prompt_tokens, usage.completion_tokens, getattr(details, "cached_tokens", 0))
+    
+    async def stream(self, prompt: str, system_prompt: Optional[str] = None,
+                     max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        # Only the OpenAI API itself is known to accept stream_options; compatible
+        # servers may reject it, and their usage is estimated instead
+        extra = {"stream_options": {"include_usage": True}} if self.config.base_url is None else {}
+        response = await self.client.chat.completions.create(
+            model=self.config.model,
+            messages=self._messages(prompt, system_prompt),
+            temperature=self.config.temperature,
+            max_tokens=self.resolve_max_tokens(max_tokens),
+            stream=True,
+            **extra
+        )
+        async for chunk in response:
+            if getattr(chunk, "usage", None):
+                self._report(chunk.usage)
+            if chunk.choices and chunk.choices[0].finish_reason == "length":
+                note_truncated()
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    async def aclose(self) -> None:
+        if self.owns_http_client:
+            await self.client.close()
 
 
 class AnthropicProvider(BaseLLMProvider):
-    def __init__(self, config: LLMConfig):
-        super().__init__(config)
-        self.client = anthropic.Anthropic(api_key=config.api_key)
+    # Prompt caching ignores prefixes shorter than this (larger for Haiku models)
+    MIN_CACHEABLE_TOKENS = 1024
+    MIN_CACHEABLE_TOKENS_HAIKU = 2048
+    
+    def __init__(self, config: LLMConfig, http_client: Optional[httpx.AsyncClient] = None):
+        super().__init__(config, http_client)
+        import anthropic
+        self.client = anthropic.AsyncAnthropic(
+            api_key=config.api_key,
+            http_client=http_client,
+            timeout=config.retry.timeout,
+            max_retries=0
+        )
+    
+    @property
+    def endpoint(self) -> Optional[str]:
+        return str(self.client.base_url)
     
-    async def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
-        response = self.client.messages.create(
+    def _system(self, system_prompt: Optional[str]):
+        """Mark long system prompts as a cacheable prefix"""
+        if not system_prompt or not self.config.prompt_caching:
+            return system_prompt or ""
+        minimum = self.MIN_CACHEABLE_TOKENS_HAIKU if "haiku" in self.config.model else self.MIN_CACHEABLE_TOKENS
+        if get_token_counter(self.config).count(system_prompt) < minimum:
+            return system_prompt
+        return [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+    
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        response = await self.client.messages.create(
             model=self.config.model,
-            max_tokens=self.config.max_tokens,
+            max_tokens=self.resolve_max_tokens(max_tokens),
             temperature=self.config.temperature,
-            system=system_prompt or "",
+            system=self._system(system_prompt),
             messages=[{"role": "user", "content": prompt}]
         )
+        self._report(response.usage)
+        if response.stop_reason == "max_tokens":
+            note_truncated()
         return response.content[0].text
+    
+    @staticmethod
+    def _report(usage):
+        # Cache writes are billed as input; cache reads are reported separately
+        cached = getattr(usage, "cache_read_input_tokens", None) or 0
+        written = getattr(usage, "cache_creation_input_tokens", None) or 0
+        report_usage(usage.input_tokens + cached + written, usage.output_tokens, cached)
+    
+    async def stream(self, prompt: str, system_prompt: Optional[str] = None,
+                     max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        async with self.client.messages.stream(
+            model=self.config.model,
+            max_tokens=self.resolve_max_tokens(max_tokens),
+            temperature=self.config.temperature,
+            system=self._system(system_prompt),
+            messages=[{"role": "user", "content": prompt}]
+        ) as response:
+            async for text in response.text_stream:
+                yield text
+            message = await response.get_final_message()
+            self._report(message.usage)
+            if message.stop_reason == "max_tokens":
+                note_truncated()
+    
+    async def aclose(self) -> None:
+        if self.owns_http_client:
+            await self.client.close()
 
 
 class LocalProvider(BaseLLMProvider):
-    async def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
-        payload = {
+    def __init__(self, config: LLMConfig, http_client: Optional[httpx.AsyncClient] = None):
+        super().__init__(config, http_client)
+        self.client = http_client or httpx.AsyncClient(timeout=config.retry.timeout)
+    
+    @property
+    def endpoint(self) -> Optional[str]:
+        return self.config.base_url
+    
+    def _payload(self, prompt: str, system_prompt: Optional[str], max_tokens: Optional[int]) -> dict:
+        return {
             "prompt": prompt,
             "system": system_prompt,
             "temperature": self.config.temperature,
-            "max_tokens": self.config.max_tokens
+            "max_tokens": self.resolve_max_tokens(max_tokens)
         }
-        
-        response = requests.post(
+    
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        response = await self.client.post(
             f"{self.config.base_url}/generate",
-            json=payload,
-            timeout=60
+            json=self._payload(prompt, system_prompt, max_tokens),
+            timeout=self.config.retry.timeout
         )
         response.raise_for_status()
-        return response.json()["response"]
+        data = response.json()
+        self._report(data)
+        return data["response"]
+    
+    @staticmethod
+    def _report(data: dict):
+        # Ollama-style counters and stop reason, when the server provides them
+        if "prompt_eval_count" in data or "eval_count" in data:
+            report_usage(data.get("prompt_eval_count"), data.get("eval_count"))
+        if data.get("done_reason") == "length":
+            note_truncated()
+    
+    async def stream(self, prompt: str, system_prompt: Optional[str] = None,
+                     max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        # Streaming responses are newline-delimited JSON objects carrying a
+        # "response" chunk, with "done": true on the final line.
+        payload = self._payload(prompt, system_prompt, max_tokens)
+        payload["stream"] = True
+        async with self.client.stream(
+            "POST",
+            f"{self.config.base_url}/generate",
+            json=payload,
+            timeout=self.config.retry.timeout
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    self._report(data)
+                    break
+    
+    async def aclose(self) -> None:
+        if self.owns_http_client:
+            await self.client.aclose()
 
 
-def create_provider(config: LLMConfig) -> BaseLLMProvider:
+# SDKs are imported by the provider that uses them; loading both costs seconds at startup
+SDK_MODULES = {
+    LLMProvider.OPENAI: "openai",
+    LLMProvider.ANTHROPIC: "anthropic",
+}
+
+
+def preload_sdk(provider: LLMProvider):
+    """Import a provider's SDK ahead of its first use, e.g. from a background thread"""
+    module = SDK_MODULES.get(provider)
+    if module is not None:
+        importlib.import_module(module)
+
+
+def create_base_provider(config: LLMConfig, http_client: Optional[httpx.AsyncClient] = None) -> BaseLLMProvider:
     if config.provider == LLMProvider.OPENAI:
-        return OpenAIProvider(config)
+        return OpenAIProvider(config, http_client)
     elif config.provider == LLMProvider.ANTHROPIC:
-        return AnthropicProvider(config)
+        return AnthropicProvider(config, http_client)
     elif config.provider == LLMProvider.LOCAL:
-        return LocalProvider(config)
+        return LocalProvider(config, http_client)
     else:
-        raise ValueError(f"Unsupported provider: {config.provider}")
\ No newline at end of file
+        raise ValueError(f"Unsupported provider: {config.provider}")
+
+
+def create_provider(config: LLMConfig, http_client: Optional[httpx.AsyncClient] = None,
+                    cache: Optional["ResponseCache"] = None) -> BaseLLMProvider:
+    # Layers subclass ProviderWrapper, so they are imported here to avoid a cycle
+    from .cache import CachedProvider
+    from .rate_limit import RateLimitedProvider
+    from .resilience import ResilientProvider
+    from .telemetry import TelemetryProvider
+    
+    if config.routing is not None and config.routing.routes:
+        from .routing import create_router
+        return create_router(config, http_client, cache)
+    
+    provider = create_base_provider(config, http_client)
+    # Timeouts, retries and hedging cover the upstream call only; waiting for the
+    # limiter is not an attempt, and 429s are retried by the limiter alone
+    resilient = ResilientProvider(provider, config.retry)
+    provider = RateLimitedProvider(resilient)
+    # Retries and hedges are requests too, so each one waits for the limiter as well
+    resilient.admit = provider.admit
+    if cache is not None and config.use_cache:
+        provider = CachedProvider(provider, cache)
+    return TelemetryProvider(provider)
\ No newline at end of file
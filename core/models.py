@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, List, Optional
 from enum import Enum
 
 
@@ -18,27 +18,213 @@ class Example(BaseModel):
     expected_output: str
 
 
+class ScoredCandidate(BaseModel):
+    prompt: str
+    score: Optional[float] = None
+    critique: str = ""
+
+
+class ExampleResult(BaseModel):
+    example_index: int
+    output: str = ""
+    exact_match: float = 0.0
+    token_f1: float = 0.0
+    rouge_l: float = 0.0
+    char_similarity: float = 0.0
+    error: Optional[str] = None
+
+
+class FidelityReport(BaseModel):
+    prompt: str
+    results: List[ExampleResult] = []
+    exact_match: float = 0.0
+    token_f1: float = 0.0
+    rouge_l: float = 0.0
+    char_similarity: float = 0.0
+
+
+class OptimizationRound(BaseModel):
+    generation: int
+    best_score: Optional[float] = None
+    candidates_scored: int = 0
+    beam: List[ScoredCandidate] = []
+
+
+class OptimizationResult(BaseModel):
+    best: Optional[ScoredCandidate] = None
+    rounds: List[OptimizationRound] = []
+    stopped_reason: str = ""
+    estimated_tokens: int = 0
+
+
 class PromptSession(BaseModel):
     role: str = ""
+    prompt_guide: str = ""
     examples: List[Example] = []
+    holdout_examples: List[Example] = []
     generated_prompt: str = ""
     evaluation_guide: str = ""
     evaluation_result: str = ""
     alternative_prompts: List[str] = []
+    scored_alternatives: List[ScoredCandidate] = []
+    fidelity_reports: List[FidelityReport] = []
     final_prompt: str = ""
     current_step: WorkflowStep = WorkflowStep.INITIAL_PROMPT
 
 
+class SessionSummary(BaseModel):
+    id: int
+    name: str
+    role: str = ""
+    model: str = ""
+    best_score: Optional[float] = None
+    current_step: str = ""
+    updated_at: float = 0.0
+    snippet: str = ""
+
+
+class SessionRevision(BaseModel):
+    number: int
+    label: str = ""
+    created_at: float = 0.0
+    changed_fields: List[str] = []
+
+
+class CallRecord(BaseModel):
+    step: str = ""
+    provider: str = ""
+    model: str = ""
+    started_at: float = 0.0
+    streamed: bool = False
+    queue_wait_seconds: float = 0.0
+    ttft_seconds: Optional[float] = None
+    total_seconds: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_input_tokens: int = 0
+    # True when the provider reported no usage and tokens were counted locally
+    usage_estimated: bool = False
+    cost_usd: float = 0.0
+    retries: int = 0
+    hedged: bool = False
+    cache_hit: bool = False
+    # The provider stopped at max_tokens, so the output is cut off
+    truncated: bool = False
+    error: Optional[str] = None
+
+
+class StepMetrics(BaseModel):
+    step: str
+    model: str
+    calls: int = 0
+    errors: int = 0
+    cache_hits: int = 0
+    retries: int = 0
+    truncated: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+    total_seconds: float = 0.0
+    queue_wait_seconds: float = 0.0
+    p50_seconds: Optional[float] = None
+    p95_seconds: Optional[float] = None
+    ttft_p50_seconds: Optional[float] = None
+
+
+class JobStatus(BaseModel):
+    id: str
+    kind: str
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+
+
+class StepRequest(BaseModel):
+    role: str = ""
+    examples: List[Example] = []
+    prompt: str = ""
+    evaluation_guide: str = ""
+    evaluation: str = ""
+    candidates: List[str] = []
+
+
+class RunRequest(BaseModel):
+    role: str
+    examples: List[Example] = []
+    steps: Optional[List[WorkflowStep]] = None
+    candidate_count: Optional[int] = None
+    auto_score: bool = False
+    example_token_budget: Optional[int] = None
+
+
+class BatchJob(BaseModel):
+    id: str
+    role: str
+    examples: List[Example] = []
+
+
+class BatchResult(BaseModel):
+    id: str
+    status: str
+    session: Optional[PromptSession] = None
+    error: Optional[str] = None
+    elapsed_seconds: float = 0.0
+
+
+class RetryPolicy(BaseModel):
+    timeout: float = 120.0
+    deadline: Optional[float] = None
+    max_retries: int = 3
+    backoff_base: float = 1.0
+    backoff_max: float = 30.0
+    hedge: bool = False
+    hedge_delay: Optional[float] = None
+    hedge_min_samples: int = 10
+
+
 class LLMProvider(Enum):
     OPENAI = "openai"
     ANTHROPIC = "anthropic"
     LOCAL = "local"
 
 
+class ModelRoute(BaseModel):
+    """Another model the router may send calls to; unset fields follow the primary configuration"""
+    model: str
+    provider: Optional[LLMProvider] = None
+    api_key: Optional[str] = None
+    base_url: Optional[str] = None
+    max_tokens: Optional[int] = None
+    context_window: Optional[int] = None
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+    # Step labels this model is preferred for; empty means any step
+    steps: List[str] = []
+    max_in_flight: Optional[int] = None
+
+
+class RoutingPolicy(BaseModel):
+    routes: List[ModelRoute] = []
+    # Once spent, calls prefer the cheapest model that fits
+    budget_usd: Optional[float] = None
+    # How long a model that failed is passed over
+    cooldown_seconds: float = 30.0
+
+
 class LLMConfig(BaseModel):
     provider: LLMProvider
     model: str
     api_key: Optional[str] = None
     base_url: Optional[str] = None
     temperature: float = 0.7
-    max_tokens: int = 4000
\ No newline at end of file
+    max_tokens: int = 4000
+    context_window: Optional[int] = None
+    prompt_caching: bool = True
+    use_cache: bool = True
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+    retry: RetryPolicy = RetryPolicy()
+    routing: Optional[RoutingPolicy] = None
\ No newline at end of file
@@ -0,0 +1,118 @@
+import asyncio
+from typing import Callable, Dict, List, Optional
+from .cache import fresh_responses
+from .models import OptimizationResult, OptimizationRound, ScoredCandidate
+from .telemetry import UsageMeter, metered
+from .workflow import PromptBusterWorkflow, rank_candidates
+
+
+class PromptOptimizer:
+    """Evolves prompts over several generations of improve + score.
+
+    Each generation asks for ``candidates_per_parent`` children of every
+    prompt in the beam, scores the unseen ones concurrently and keeps the
+    top ``beam_width``. Evaluations are memoised by prompt text, so
+    candidates that reappear are never re-scored. Stops after
+    ``generations``, when the best score has not improved by
+    ``min_improvement`` for ``patience`` generations, or once
+    ``token_budget`` tokens are spent on the optimizer's own calls.
+    """
+
+    def __init__(self, workflow: PromptBusterWorkflow, generations: int = 5, beam_width: int = 3,
+                 candidates_per_parent: int = 4, patience: int = 2, min_improvement: float = 0.1,
+                 token_budget: Optional[int] = None,
+                 on_round: Optional[Callable[[OptimizationRound], None]] = None):
+        self.workflow = workflow
+        self.generations = generations
+        self.beam_width = beam_width
+        self.candidates_per_parent = candidates_per_parent
+        self.patience = patience
+        self.min_improvement = min_improvement
+        self.token_budget = token_budget
+        self.on_round = on_round
+        self.evaluations: Dict[str, ScoredCandidate] = {}
+    
+    async def _score(self, prompts: List[str], evaluation_guide: str) -> List[ScoredCandidate]:
+        unseen = [prompt for prompt in dict.fromkeys(prompts) if prompt not in self.evaluations]
+        if unseen:
+            for scored in await self.workflow.score_candidates(unseen, evaluation_guide):
+                self.evaluations[scored.prompt] = scored
+        return [self.evaluations[prompt] for prompt in prompts]
+    
+    async def _children(self, parent: ScoredCandidate) -> List[str]:
+        # A parent that survives a generation sends the same requests again; cached
+        # replies would only return children that are already scored
+        with fresh_responses():
+            return await self.workflow.generate_candidate_alternatives(
+                parent.prompt,
+                parent.critique,
+                self.candidates_per_parent
+            )
+    
+    def _over_budget(self, meter: UsageMeter) -> bool:
+        return self.token_budget is not None and meter.tokens >= self.token_budget
+    
+    async def run(self, seed_prompts: Optional[List[str]] = None,
+                  evaluation_guide: Optional[str] = None) -> OptimizationResult:
+        session = self.workflow.session
+        evaluation_guide = evaluation_guide or session.evaluation_guide
+        if not evaluation_guide:
+            raise ValueError("An evaluation guide is required to score candidates")
+        if seed_prompts is None:
+            seed_prompts = [session.generated_prompt] + session.alternative_prompts
+        seed_prompts = [prompt for prompt in seed_prompts if prompt]
+        if not seed_prompts:
+            raise ValueError("At least one seed prompt is required")
+        
+        for scored in session.scored_alternatives:
+            if scored.score is not None:
+                self.evaluations.setdefault(scored.prompt, scored)
+        
+        result = OptimizationResult()
+        # Only this run's calls count towards the budget, not others sharing the provider
+        with metered() as meter:
+            beam = rank_candidates(await self._score(seed_prompts, evaluation_guide))[:self.beam_width]
+            best_score = beam[0].score
+            stale = 0
+            result.stopped_reason = "completed all generations"
+            
+            for generation in range(1, self.generations + 1):
+                if self._over_budget(meter):
+                    result.stopped_reason = "token budget reached"
+                    break
+                
+                families = await asyncio.gather(*[self._children(parent) for parent in beam])
+                children = [child for family in families for child in family]
+                scored_before = len(self.evaluations)
+                scored_children = await self._score(children, evaluation_guide)
+                
+                by_prompt = {candidate.prompt: candidate for candidate in beam + scored_children}
+                beam = rank_candidates(list(by_prompt.values()))[:self.beam_width]
+                
+                round_result = OptimizationRound(
+                    generation=generation,
+                    best_score=beam[0].score,
+                    candidates_scored=len(self.evaluations) - scored_before,
+                    beam=beam
+                )
+                result.rounds.append(round_result)
+                if self.on_round:
+                    self.on_round(round_result)
+                
+                improved = beam[0].score is not None and (
+                    best_score is None or beam[0].score >= best_score + self.min_improvement
+                )
+                if improved:
+                    best_score = beam[0].score
+                    stale = 0
+                else:
+                    stale += 1
+                    if stale >= self.patience:
+                        result.stopped_reason = f"no improvement for {stale} generations"
+                        break
+        
+        result.best = beam[0]
+        result.estimated_tokens = meter.tokens
+        self.workflow.set_scored_alternatives(beam)
+        self.workflow.set_alternative_prompts([candidate.prompt for candidate in beam])
+        return result
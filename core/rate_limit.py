@@ -0,0 +1,291 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from .llm_providers import BaseLLMProvider, ProviderWrapper, add_queue_wait, current_call, note_retry
+from .models import LLMConfig
+from .tokens import expected_output_tokens, get_token_counter
+
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+_request_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "promptbuster_request_priority", default=PRIORITY_INTERACTIVE
+)
+
+
+@contextmanager
+def request_priority(priority: int):
+    """Run provider calls made inside the block at the given priority (lower runs first)"""
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+def current_priority() -> int:
+    return _request_priority.get()
+
+
+def error_status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Read retry-after-ms / retry-after from the error's HTTP response, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    return error_status_code(error) == 429
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+    
+    def consume(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """RPM/TPM token buckets with a priority queue of waiting requests.
+
+    Only the highest-priority waiter is ever admitted, so interactive calls
+    jump ahead of queued batch work. On a 429 the limiter pauses until the
+    server's retry-after and cuts its refill rate (AIMD); successes restore
+    the rate gradually, so throughput settles just under the account limit.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None,
+                 min_rate_fraction: float = 0.1, decrease_factor: float = 0.7, increase_fraction: float = 0.02):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.min_rate_fraction = min_rate_fraction
+        self.decrease_factor = decrease_factor
+        self.increase_fraction = increase_fraction
+        self.rate_fraction = 1.0
+        self.blocked_until = 0.0
+        self.consecutive_limits = 0
+        self._waiters: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+    
+    def _buckets(self):
+        return [bucket for bucket in (self.requests, self.tokens) if bucket is not None]
+    
+    def _apply_rate_fraction(self):
+        for bucket in self._buckets():
+            bucket.rate = bucket.capacity / 60.0 * self.rate_fraction
+    
+    async def acquire(self, tokens: int, priority: int = PRIORITY_INTERACTIVE):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), float(tokens), future))
+        self._pump()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if not future.done():
+                future.cancel()
+            self._pump()
+            raise
+    
+    def _pump(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        while self._waiters:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            
+            now = time.monotonic()
+            wait = self.blocked_until - now
+            if self.requests is not None:
+                wait = max(wait, self.requests.wait_time(1, now))
+            if self.tokens is not None:
+                wait = max(wait, self.tokens.wait_time(tokens, now))
+            
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._pump)
+                return
+            
+            heapq.heappop(self._waiters)
+            if self.requests is not None:
+                self.requests.consume(1, now)
+            if self.tokens is not None:
+                self.tokens.consume(tokens, now)
+            future.set_result(None)
+    
+    @property
+    def saturated(self) -> bool:
+        """True while paused after a 429 or while requests are queued for capacity"""
+        return self.blocked_until > time.monotonic() or any(not waiter[3].done() for waiter in self._waiters)
+    
+    def on_success(self):
+        self.consecutive_limits = 0
+        if self.rate_fraction < 1.0:
+            self.rate_fraction = min(1.0, self.rate_fraction + self.increase_fraction)
+            self._apply_rate_fraction()
+    
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        self.consecutive_limits += 1
+        if retry_after is None:
+            retry_after = min(60.0, 2.0 ** (self.consecutive_limits - 1))
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        self.rate_fraction = max(self.min_rate_fraction, self.rate_fraction * self.decrease_factor)
+        self._apply_rate_fraction()
+        # Drain the buckets so the queue restarts slowly after the pause
+        for bucket in self._buckets():
+            bucket.tokens = min(bucket.tokens, 0.0)
+
+
+LimiterKey = Tuple[str, Optional[str], str, Optional[int], Optional[int]]
+
+# A limiter's waiters and timer belong to one event loop, so each loop gets its own limiters
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[LimiterKey, RateLimiter]]" = \
+    weakref.WeakKeyDictionary()
+_limiters_outside_loop: Dict[LimiterKey, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(config: LLMConfig) -> RateLimiter:
+    """Limiter shared by every provider on the running event loop for the same account, model and limits"""
+    key = (config.provider.value, config.base_url, config.model, config.requests_per_minute,
+           config.tokens_per_minute)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    with _limiters_lock:
+        limiters = _limiters_outside_loop if loop is None else _limiters.setdefault(loop, {})
+        limiter = limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(config.requests_per_minute, config.tokens_per_minute)
+            limiters[key] = limiter
+    return limiter
+
+
+class RateLimitedProvider(ProviderWrapper):
+    """Admits calls through a RateLimiter and retries 429 responses after backing off.
+
+    Without an explicit limiter, calls share the one for this config on the
+    running event loop.
+    """
+
+    def __init__(self, inner: BaseLLMProvider, limiter: Optional[RateLimiter] = None,
+                 max_rate_limit_retries: int = 5):
+        super().__init__(inner)
+        self._limiter = limiter
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.counter = get_token_counter(inner.config)
+    
+    @property
+    def limiter(self) -> RateLimiter:
+        return self._limiter or get_rate_limiter(self.config)
+    
+    def _estimate(self, prompt: str, system_prompt: Optional[str], max_tokens: Optional[int]) -> int:
+        # Charge the step's typical output rather than the max_tokens ceiling
+        call = current_call.get()
+        output = expected_output_tokens(call.step if call else None, self.resolve_max_tokens(max_tokens))
+        return self.counter.count(prompt) + self.counter.count(system_prompt) + output
+    
+    async def _acquire(self, tokens: int):
+        waiting = time.perf_counter()
+        await self.limiter.acquire(tokens, current_priority())
+        add_queue_wait(time.perf_counter() - waiting)
+    
+    async def admit(self, prompt: str, system_prompt: Optional[str] = None, max_tokens: Optional[int] = None):
+        """Wait for capacity for one more request made by an inner layer, such as a retry or a hedge"""
+        await self._acquire(self._estimate(prompt, system_prompt, max_tokens))
+    
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        tokens = self._estimate(prompt, system_prompt, max_tokens)
+        attempt = 0
+        while True:
+            await self._acquire(tokens)
+            try:
+                response = await self.inner.generate(prompt, system_prompt, max_tokens)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self.max_rate_limit_retries:
+                    raise
+                self.limiter.on_rate_limited(retry_after_seconds(e))
+                note_retry()
+                attempt += 1
+                continue
+            self.limiter.on_success()
+            return response
+    
+    async def stream(self, prompt: str, system_prompt: Optional[str] = None,
+                     max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        tokens = self._estimate(prompt, system_prompt, max_tokens)
+        attempt = 0
+        while True:
+            await self._acquire(tokens)
+            started = False
+            try:
+                async for chunk in self.inner.stream(prompt, system_prompt, max_tokens):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                # Only retry if nothing has been handed to the caller yet
+                if started or not is_rate_limit_error(e) or attempt >= self.max_rate_limit_retries:
+                    raise
+                self.limiter.on_rate_limited(retry_after_seconds(e))
+                note_retry()
+                attempt += 1
+                continue
+            self.limiter.on_success()
+            return
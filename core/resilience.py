@@ -0,0 +1,180 @@
+import asyncio
+import random
+import sys
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Optional
+import httpx
+from .llm_providers import SDK_MODULES, BaseLLMProvider, ProviderWrapper, note_hedge, note_retry
+from .models import RetryPolicy
+from .rate_limit import error_status_code, retry_after_seconds
+
+
+# 429 is left to RateLimitedProvider, which slows the shared limiter down before retrying
+RETRYABLE_STATUS_CODES = {408, 409, 425, 500, 502, 503, 504, 529}
+
+RETRYABLE_EXCEPTIONS = (
+    asyncio.TimeoutError,
+    httpx.TransportError,
+)
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    if isinstance(error, RETRYABLE_EXCEPTIONS):
+        return True
+    # Provider SDKs load lazily, and one that was never imported can't have raised
+    for name in SDK_MODULES.values():
+        module = sys.modules.get(name)
+        if module is not None and isinstance(error, module.APIConnectionError):
+            return True
+    return error_status_code(error) in RETRYABLE_STATUS_CODES
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 100):
+        self.samples: Deque[float] = deque(maxlen=window)
+    
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+    
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(fraction * len(ordered)))
+        return ordered[index]
+
+
+class ResilientProvider(ProviderWrapper):
+    """Applies a RetryPolicy: per-attempt timeouts, an overall deadline,
+    exponential backoff with full jitter on retryable errors, and optional
+    hedged requests for generate().
+
+    ``admit`` is awaited before every request after the first (a retry or a
+    hedge), so a rate limiter in an outer layer can admit each of them too.
+    """
+
+    def __init__(self, inner: BaseLLMProvider, policy: RetryPolicy,
+                 admit: Optional[Callable[[str, Optional[str], Optional[int]], Awaitable[None]]] = None):
+        super().__init__(inner)
+        self.policy = policy
+        self.admit = admit
+        self.latency = LatencyTracker()
+    
+    async def _admit(self, prompt: str, system_prompt: Optional[str], max_tokens: Optional[int]):
+        if self.admit is not None:
+            await self.admit(prompt, system_prompt, max_tokens)
+    
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        delay = min(self.policy.backoff_max, self.policy.backoff_base * 2 ** attempt)
+        delay = random.uniform(0, delay)
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+    
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.policy.hedge:
+            return None
+        if self.policy.hedge_delay is not None:
+            return self.policy.hedge_delay
+        if len(self.latency.samples) < self.policy.hedge_min_samples:
+            return None
+        return self.latency.percentile(0.95)
+    
+    async def _with_retries(self, attempt_call: Callable[[float], Awaitable[str]],
+                            admit_retry: Callable[[], Awaitable[None]]) -> str:
+        deadline = time.monotonic() + self.policy.deadline if self.policy.deadline else None
+        attempt = 0
+        while True:
+            timeout = self.policy.timeout
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    raise asyncio.TimeoutError("Provider call deadline exceeded")
+            try:
+                return await attempt_call(timeout)
+            except Exception as e:
+                if attempt >= self.policy.max_retries or not is_retryable_error(e):
+                    raise
+                delay = self._backoff(attempt, e)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise
+                attempt += 1
+                note_retry()
+                await asyncio.sleep(delay)
+                await admit_retry()
+    
+    async def _timed_generate(self, prompt: str, system_prompt: Optional[str], max_tokens: Optional[int],
+                              timeout: float) -> str:
+        started = time.monotonic()
+        response = await asyncio.wait_for(self.inner.generate(prompt, system_prompt, max_tokens), timeout)
+        self.latency.record(time.monotonic() - started)
+        return response
+    
+    async def _backup_generate(self, prompt: str, system_prompt: Optional[str], max_tokens: Optional[int],
+                               timeout: float) -> str:
+        # The primary keeps running while the hedge waits to be admitted
+        await self._admit(prompt, system_prompt, max_tokens)
+        return await self._timed_generate(prompt, system_prompt, max_tokens, timeout)
+    
+    async def _hedged_generate(self, prompt: str, system_prompt: Optional[str], max_tokens: Optional[int],
+                               timeout: float) -> str:
+        delay = self._hedge_delay()
+        if delay is None or delay >= timeout:
+            return await self._timed_generate(prompt, system_prompt, max_tokens, timeout)
+        
+        primary = asyncio.ensure_future(self._timed_generate(prompt, system_prompt, max_tokens, timeout))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        
+        # The first attempt is slower than p95: race a second one and keep the winner
+        note_hedge()
+        backup = asyncio.ensure_future(self._backup_generate(prompt, system_prompt, max_tokens, timeout - delay))
+        pending = {primary, backup}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        return await self._with_retries(
+            lambda timeout: self._hedged_generate(prompt, system_prompt, max_tokens, timeout),
+            lambda: self._admit(prompt, system_prompt, max_tokens)
+        )
+    
+    async def stream(self, prompt: str, system_prompt: Optional[str] = None,
+                     max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        # Retries (and the timeout) only cover the wait for the first chunk;
+        # once output reaches the caller a failure is surfaced as-is.
+        attempt = 0
+        while True:
+            chunks = self.inner.stream(prompt, system_prompt, max_tokens)
+            try:
+                first = await asyncio.wait_for(chunks.__anext__(), self.policy.timeout)
+            except StopAsyncIteration:
+                return
+            except Exception as e:
+                await chunks.aclose()
+                if attempt >= self.policy.max_retries or not is_retryable_error(e):
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+                attempt += 1
+                note_retry()
+                await self._admit(prompt, system_prompt, max_tokens)
+                continue
+            break
+        
+        yield first
+        async for chunk in chunks:
+            yield chunk
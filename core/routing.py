@@ -0,0 +1,190 @@
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple, TYPE_CHECKING
+import httpx
+from .llm_providers import BaseLLMProvider, create_provider
+from .models import LLMConfig, ModelRoute, RoutingPolicy
+from .rate_limit import RateLimiter, get_rate_limiter, is_rate_limit_error
+from .resilience import LatencyTracker, is_retryable_error
+from .telemetry import current_step, model_price
+from .tokens import context_window, expected_output_tokens, get_token_counter
+
+if TYPE_CHECKING:
+    from .cache import ResponseCache
+
+
+def route_config(primary: LLMConfig, route: ModelRoute) -> LLMConfig:
+    """The primary configuration with a route's model, provider and limits"""
+    same_provider = route.provider is None or route.provider == primary.provider
+    return primary.model_copy(update={
+        "provider": route.provider or primary.provider,
+        "model": route.model,
+        # Account settings only carry over to the same provider
+        "api_key": route.api_key or (primary.api_key if same_provider else None),
+        "base_url": route.base_url or (primary.base_url if same_provider else None),
+        "max_tokens": route.max_tokens or primary.max_tokens,
+        "context_window": route.context_window,
+        "requests_per_minute": route.requests_per_minute,
+        "tokens_per_minute": route.tokens_per_minute,
+        "routing": None
+    })
+
+
+class _Target:
+    def __init__(self, provider: BaseLLMProvider, steps: List[str], max_in_flight: Optional[int]):
+        self.provider = provider
+        self.steps = steps
+        self.max_in_flight = max_in_flight
+        self.counter = get_token_counter(provider.config)
+        self.window = context_window(provider.config)
+        self.price = model_price(provider.config)
+        self.latency: Dict[str, LatencyTracker] = {}
+        self.in_flight = 0
+        self.down_until = 0.0
+    
+    @property
+    def limiter(self) -> RateLimiter:
+        return get_rate_limiter(self.provider.config)
+    
+    def available(self, now: float) -> bool:
+        if now < self.down_until or self.limiter.saturated:
+            return False
+        return self.max_in_flight is None or self.in_flight < self.max_in_flight
+    
+    def cost(self, input_tokens: int, output_tokens: int) -> float:
+        if self.price is None:
+            return float("inf")
+        input_price, output_price = self.price
+        return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+    
+    def expected_latency(self, step: str) -> float:
+        tracker = self.latency.get(step)
+        # Unmeasured models look fastest, so each gets tried for a step
+        return (tracker.percentile(0.5) if tracker else None) or 0.0
+
+
+class RoutedProvider(BaseLLMProvider):
+    """Sends each call to one of several models, chosen per call.
+
+    Candidates are ranked by availability (not failing, rate limited or at
+    ``max_in_flight``), then by affinity for the current step (the label
+    the workflow bound for telemetry). Routes that list the step keep their
+    configured order; other models are ordered by observed median latency
+    for that step. Models whose context window can't hold the request are
+    only used when none can. Once ``budget_usd`` is spent, estimated cost
+    ranks ahead of affinity. A failed call falls back to the next candidate.
+    A model that timed out, was rate limited or reported an outage is passed
+    over for ``cooldown_seconds``; errors caused by the request don't count.
+    """
+    
+    def __init__(self, targets: List[_Target], policy: RoutingPolicy):
+        primary = targets[0].provider
+        super().__init__(primary.config, primary.http_client)
+        self.owns_http_client = primary.owns_http_client
+        self.targets = targets
+        self.policy = policy
+        self.spent_usd = 0.0
+    
+    @property
+    def endpoint(self) -> Optional[str]:
+        return self.targets[0].provider.endpoint
+    
+    def plan(self, prompt: str, system_prompt: Optional[str] = None, max_tokens: Optional[int] = None,
+             step: Optional[str] = None) -> List[Tuple[_Target, int]]:
+        """Candidate models for a call, best first, with the input tokens each would use"""
+        step = step if step is not None else current_step()
+        now = time.monotonic()
+        over_budget = self.policy.budget_usd is not None and self.spent_usd >= self.policy.budget_usd
+        fitting, oversized = [], []
+        for index, target in enumerate(self.targets):
+            input_tokens = target.counter.count(prompt) + target.counter.count(system_prompt)
+            output_tokens = target.provider.resolve_max_tokens(max_tokens)
+            expected_output = expected_output_tokens(step, output_tokens)
+            affinity = 0 if step in target.steps else (1 if not target.steps else 2)
+            rank = (
+                not target.available(now),
+                target.cost(input_tokens, expected_output) if over_budget else 0.0,
+                affinity,
+                # A route chosen for this step isn't traded for a faster, less suited one
+                target.expected_latency(step) if affinity else 0.0,
+                index
+            )
+            bucket = fitting if input_tokens + output_tokens <= target.window else oversized
+            bucket.append((rank, target, input_tokens))
+        return [(target, input_tokens) for _, target, input_tokens in sorted(fitting) + sorted(oversized)]
+    
+    def config_for(self, step: str) -> LLMConfig:
+        """Configuration of the model a call for step would go to now, before the request is sized"""
+        return self.plan("", step=step)[0][0].provider.config
+    
+    def _succeeded(self, target: _Target, step: str, seconds: float, input_tokens: int, output: str):
+        target.latency.setdefault(step, LatencyTracker()).record(seconds)
+        cost = target.cost(input_tokens, target.counter.count(output))
+        if cost != float("inf"):
+            self.spent_usd += cost
+    
+    def _failed(self, target: _Target, error: Exception):
+        if is_retryable_error(error) or is_rate_limit_error(error):
+            target.down_until = time.monotonic() + self.policy.cooldown_seconds
+    
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        step = current_step()
+        error: Optional[Exception] = None
+        for target, input_tokens in self.plan(prompt, system_prompt, max_tokens):
+            target.in_flight += 1
+            started = time.perf_counter()
+            try:
+                response = await target.provider.generate(prompt, system_prompt, max_tokens)
+            except Exception as e:
+                self._failed(target, e)
+                error = e
+                continue
+            finally:
+                target.in_flight -= 1
+            self._succeeded(target, step, time.perf_counter() - started, input_tokens, response)
+            return response
+        raise error
+    
+    async def stream(self, prompt: str, system_prompt: Optional[str] = None,
+                     max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        step = current_step()
+        error: Optional[Exception] = None
+        for target, input_tokens in self.plan(prompt, system_prompt, max_tokens):
+            target.in_flight += 1
+            started = time.perf_counter()
+            parts: List[str] = []
+            try:
+                async for chunk in target.provider.stream(prompt, system_prompt, max_tokens):
+                    parts.append(chunk)
+                    yield chunk
+            except Exception as e:
+                self._failed(target, e)
+                if parts:
+                    # Part of the answer is already out; another model can't continue it
+                    raise
+                error = e
+                continue
+            finally:
+                target.in_flight -= 1
+            self._succeeded(target, step, time.perf_counter() - started, input_tokens, "".join(parts))
+            return
+        raise error
+    
+    async def warm_up(self) -> None:
+        for target in self.targets:
+            await target.provider.warm_up()
+    
+    async def aclose(self) -> None:
+        for target in self.targets:
+            await target.provider.aclose()
+
+
+def create_router(config: LLMConfig, http_client: Optional[httpx.AsyncClient] = None,
+                  cache: Optional["ResponseCache"] = None) -> RoutedProvider:
+    """Route between the primary model, usable for any step, and ``config.routing.routes``"""
+    policy = config.routing or RoutingPolicy()
+    targets = [_Target(create_provider(config.model_copy(update={"routing": None}), http_client, cache), [], None)]
+    for route in policy.routes:
+        provider = create_provider(route_config(config, route), http_client, cache)
+        targets.append(_Target(provider, route.steps, route.max_in_flight))
+    return RoutedProvider(targets, policy)
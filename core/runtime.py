@@ -0,0 +1,74 @@
+import asyncio
+import concurrent.futures
+import importlib.util
+import threading
+from typing import Any, Coroutine, Optional
+import httpx
+
+
+class AsyncRuntime:
+    """Long-lived event loop running on a background thread.
+
+    The GUI submits coroutines with ``submit`` and gets back a
+    ``concurrent.futures.Future``. The runtime also owns the pooled HTTP
+    client shared by every provider so connections stay warm across steps.
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 120.0):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="promptbuster-runtime", daemon=True)
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+    
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+    
+    def start(self) -> "AsyncRuntime":
+        if not self._thread.is_alive():
+            self._thread.start()
+        return self
+    
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive() and not self.loop.is_closed()
+    
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        with self._lock:
+            if self._http_client is None:
+                self._http_client = httpx.AsyncClient(
+                    http2=importlib.util.find_spec("h2") is not None,
+                    limits=self._limits,
+                    timeout=httpx.Timeout(60.0, connect=10.0)
+                )
+            return self._http_client
+    
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        if not self.running:
+            coro.close()
+            raise RuntimeError("Async runtime is not running")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    
+    async def _aclose(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+    
+    def shutdown(self, timeout: float = 5.0):
+        if not self.running:
+            return
+        try:
+            self.submit(self._aclose()).result(timeout)
+        except (concurrent.futures.TimeoutError, RuntimeError):
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self.loop.close()
@@ -0,0 +1,105 @@
+import asyncio
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Optional, Set
+from .models import PromptSession, WorkflowStep
+
+if TYPE_CHECKING:
+    from .workflow import PromptBusterWorkflow
+
+
+# Inputs each step reads from the session, expressed as the steps that produce them.
+# Steps 1, 3 and 4 only need the role/examples and can run side by side.
+STEP_DEPENDENCIES: Dict[WorkflowStep, Set[WorkflowStep]] = {
+    WorkflowStep.INITIAL_PROMPT: set(),
+    WorkflowStep.EXAMPLES_INPUT: set(),
+    WorkflowStep.PROMPT_GENERATION: {WorkflowStep.EXAMPLES_INPUT},
+    WorkflowStep.EVALUATION_GUIDE: set(),
+    WorkflowStep.PROMPT_EVALUATION: {WorkflowStep.PROMPT_GENERATION, WorkflowStep.EVALUATION_GUIDE},
+    WorkflowStep.IMPROVED_ALTERNATIVES: {WorkflowStep.PROMPT_EVALUATION},
+    WorkflowStep.FINAL_SELECTION: {WorkflowStep.IMPROVED_ALTERNATIVES},
+}
+
+StepCallback = Callable[[WorkflowStep, Any], None]
+
+
+class StepScheduler:
+    """Runs workflow steps as a DAG, starting every step whose inputs are ready"""
+
+    def __init__(self, workflow: "PromptBusterWorkflow", on_step_complete: Optional[StepCallback] = None):
+        self.workflow = workflow
+        self.on_step_complete = on_step_complete
+    
+    async def run(self, steps: Optional[Iterable[WorkflowStep]] = None) -> PromptSession:
+        pending = set(steps) if steps is not None else set(WorkflowStep)
+        # Steps outside the requested set are assumed to be already in the session
+        done = set(WorkflowStep) - pending
+        running: Dict[asyncio.Task, WorkflowStep] = {}
+        
+        try:
+            while pending or running:
+                ready = [step for step in pending if STEP_DEPENDENCIES[step] <= done]
+                for step in ready:
+                    pending.discard(step)
+                    running[asyncio.ensure_future(self._run_step(step))] = step
+                
+                if not running:
+                    raise RuntimeError(f"Unsatisfiable step dependencies: {sorted(s.value for s in pending)}")
+                
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    step = running.pop(task)
+                    result = task.result()
+                    done.add(step)
+                    self.workflow.set_current_step(step)
+                    if self.on_step_complete:
+                        self.on_step_complete(step, result)
+        finally:
+            for task in running:
+                task.cancel()
+        
+        return self.workflow.session
+    
+    async def _run_step(self, step: WorkflowStep) -> Any:
+        workflow = self.workflow
+        session = workflow.session
+        
+        if step == WorkflowStep.INITIAL_PROMPT:
+            result = await workflow.generate_initial_prompt_guide(session.role)
+            workflow.set_prompt_guide(result)
+        elif step == WorkflowStep.EXAMPLES_INPUT:
+            if not session.examples:
+                raise ValueError("At least one example is required")
+            result = session.examples
+        elif step == WorkflowStep.PROMPT_GENERATION:
+            result = await workflow.generate_prompt_from_examples(session.role, session.examples)
+            workflow.set_generated_prompt(result)
+        elif step == WorkflowStep.EVALUATION_GUIDE:
+            result = await workflow.generate_evaluation_guide(session.role)
+            workflow.set_evaluation_guide(result)
+        elif step == WorkflowStep.PROMPT_EVALUATION:
+            result = await workflow.evaluate_prompt(session.generated_prompt, session.evaluation_guide)
+            workflow.set_evaluation_result(result)
+        elif step == WorkflowStep.IMPROVED_ALTERNATIVES:
+            if workflow.candidate_count:
+                result = await workflow.generate_candidate_alternatives(
+                    session.generated_prompt,
+                    session.evaluation_result,
+                    workflow.candidate_count
+                )
+            else:
+                result = await workflow.generate_improved_alternatives(
+                    session.generated_prompt,
+                    session.evaluation_result
+                )
+            workflow.set_alternative_prompts(result)
+        elif step == WorkflowStep.FINAL_SELECTION:
+            if workflow.auto_score and session.alternative_prompts:
+                scored = await workflow.score_candidates(session.alternative_prompts, session.evaluation_guide)
+                workflow.set_scored_alternatives(scored)
+                result = scored[0].prompt
+            else:
+                result = session.alternative_prompts[0] if session.alternative_prompts else session.generated_prompt
+            workflow.set_final_prompt(result)
+        else:
+            raise ValueError(f"Unsupported step: {step}")
+        
+        return result
@@ -0,0 +1,95 @@
+import difflib
+import re
+from typing import List, Set
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def shingles(tokens: List[str], size: int = 3) -> Set[tuple]:
+    if len(tokens) < size:
+        return {tuple(tokens)} if tokens else set()
+    return {tuple(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def jaccard(a: Set, b: Set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def text_similarity(a: str, b: str) -> float:
+    """Word-trigram Jaccard similarity between two texts (0..1)"""
+    return jaccard(shingles(tokenize(a)), shingles(tokenize(b)))
+
+
+def deduplicate(texts: List[str], threshold: float = 0.85) -> List[str]:
+    """Drop texts that are near-duplicates of an earlier one, keeping order"""
+    kept: List[str] = []
+    kept_shingles: List[Set[tuple]] = []
+    for text in texts:
+        text_shingles = shingles(tokenize(text))
+        if not text_shingles:
+            continue
+        if any(jaccard(text_shingles, other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(text)
+        kept_shingles.append(text_shingles)
+    return kept
+
+
+def exact_match(prediction: str, reference: str) -> float:
+    """1.0 when the texts match after lowercasing and collapsing whitespace"""
+    return float(" ".join(prediction.lower().split()) == " ".join(reference.lower().split()))
+
+
+def token_f1(prediction: str, reference: str) -> float:
+    pred_tokens = tokenize(prediction)
+    ref_tokens = tokenize(reference)
+    if not pred_tokens or not ref_tokens:
+        return float(pred_tokens == ref_tokens)
+    
+    ref_counts: dict = {}
+    for token in ref_tokens:
+        ref_counts[token] = ref_counts.get(token, 0) + 1
+    overlap = 0
+    for token in pred_tokens:
+        if ref_counts.get(token, 0) > 0:
+            overlap += 1
+            ref_counts[token] -= 1
+    if overlap == 0:
+        return 0.0
+    precision = overlap / len(pred_tokens)
+    recall = overlap / len(ref_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge_l(prediction: str, reference: str) -> float:
+    """ROUGE-L F-measure over word tokens (longest common subsequence)"""
+    pred_tokens = tokenize(prediction)
+    ref_tokens = tokenize(reference)
+    if not pred_tokens or not ref_tokens:
+        return float(pred_tokens == ref_tokens)
+    
+    previous = [0] * (len(ref_tokens) + 1)
+    for pred_token in pred_tokens:
+        current = [0]
+        for j, ref_token in enumerate(ref_tokens, start=1):
+            if pred_token == ref_token:
+                current.append(previous[j - 1] + 1)
+            else:
+                current.append(max(previous[j], current[j - 1]))
+        previous = current
+    lcs = previous[-1]
+    if lcs == 0:
+        return 0.0
+    precision = lcs / len(pred_tokens)
+    recall = lcs / len(ref_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+
+def char_similarity(prediction: str, reference: str) -> float:
+    return difflib.SequenceMatcher(None, prediction, reference).ratio()
@@ -0,0 +1,331 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+from .llm_providers import BaseLLMProvider, ProviderWrapper, current_call
+from .models import CallRecord, LLMConfig, LLMProvider, StepMetrics
+from .resilience import LatencyTracker
+from .tokens import get_token_counter
+
+# USD per million (input, output) tokens, matched by longest model prefix
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4": (30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "o1": (15.00, 60.00),
+    "o3-mini": (1.10, 4.40),
+    "o3": (2.00, 8.00),
+    "o4-mini": (1.10, 4.40),
+    "claude-opus-4": (15.00, 75.00),
+    "claude-sonnet-4": (3.00, 15.00),
+    "claude-3-opus": (15.00, 75.00),
+    "claude-3-7-sonnet": (3.00, 15.00),
+    "claude-3-5-sonnet": (3.00, 15.00),
+    "claude-3-5-haiku": (0.80, 4.00),
+    "claude-3-haiku": (0.25, 1.25),
+}
+
+# Fraction of the input price charged for prompt-cache reads
+CACHED_INPUT_RATES = {
+    LLMProvider.OPENAI: 0.5,
+    LLMProvider.ANTHROPIC: 0.1,
+}
+
+# The workflow step, and the session collector, that calls in this context belong to
+_binding: ContextVar[Tuple[str, Optional["TelemetryCollector"]]] = ContextVar("telemetry_binding", default=("", None))
+
+
+def bind(step: str, collector: Optional["TelemetryCollector"] = None):
+    """Attribute calls made from this context to ``step`` (and to ``collector`` as well as the registry)"""
+    _binding.set((step, collector))
+
+
+def current_step() -> str:
+    return _binding.get()[0]
+
+
+class UsageMeter:
+    """Running token total of the calls made inside a ``metered()`` block"""
+    
+    def __init__(self):
+        self.tokens = 0
+
+
+_meters: ContextVar[Tuple[UsageMeter, ...]] = ContextVar("telemetry_meters", default=())
+
+
+@contextmanager
+def metered():
+    """Count the input + output tokens of calls made from this context, including tasks it starts.
+
+    Calls are counted as TelemetryProvider records them, so cached responses
+    cost nothing and calls made elsewhere on the same provider aren't counted.
+    """
+    meter = UsageMeter()
+    token = _meters.set(_meters.get() + (meter,))
+    try:
+        yield meter
+    finally:
+        _meters.reset(token)
+
+
+def model_price(config: LLMConfig) -> Optional[Tuple[float, float]]:
+    if config.provider == LLMProvider.LOCAL:
+        return (0.0, 0.0)
+    model = config.model.lower()
+    matches = [prefix for prefix in MODEL_PRICES if model.startswith(prefix)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+def call_cost(config: LLMConfig, call: CallRecord) -> float:
+    price = model_price(config)
+    if price is None:
+        return 0.0
+    input_price, output_price = price
+    cached_rate = CACHED_INPUT_RATES.get(config.provider, 1.0)
+    uncached = max(0, call.input_tokens - call.cached_input_tokens)
+    return (uncached * input_price + call.cached_input_tokens * input_price * cached_rate
+            + call.output_tokens * output_price) / 1_000_000
+
+
+class _StepStats:
+    def __init__(self, step: str, model: str):
+        self.metrics = StepMetrics(step=step, model=model)
+        self.latency = LatencyTracker(window=500)
+        self.ttft = LatencyTracker(window=500)
+
+
+class TelemetryCollector:
+    """Aggregates call records per step and model; safe to read from another thread"""
+    
+    def __init__(self, max_records: int = 1000):
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], _StepStats] = {}
+        self.records: Deque[CallRecord] = deque(maxlen=max_records)
+    
+    def record(self, call: CallRecord):
+        with self._lock:
+            self.records.append(call)
+            stats = self._stats.get((call.step, call.model))
+            if stats is None:
+                stats = self._stats[(call.step, call.model)] = _StepStats(call.step, call.model)
+            metrics = stats.metrics
+            metrics.calls += 1
+            metrics.errors += call.error is not None
+            metrics.cache_hits += call.cache_hit
+            metrics.retries += call.retries
+            metrics.truncated += call.truncated
+            metrics.input_tokens += call.input_tokens
+            metrics.output_tokens += call.output_tokens
+            metrics.cost_usd += call.cost_usd
+            metrics.total_seconds += call.total_seconds
+            metrics.queue_wait_seconds += call.queue_wait_seconds
+            stats.latency.record(call.total_seconds)
+            if call.ttft_seconds is not None:
+                stats.ttft.record(call.ttft_seconds)
+    
+    def summary(self) -> List[StepMetrics]:
+        """Per step and model, most expensive in time first"""
+        with self._lock:
+            summary = [
+                stats.metrics.model_copy(update={
+                    "p50_seconds": stats.latency.percentile(0.5),
+                    "p95_seconds": stats.latency.percentile(0.95),
+                    "ttft_p50_seconds": stats.ttft.percentile(0.5)
+                })
+                for stats in self._stats.values()
+            ]
+        return sorted(summary, key=lambda metrics: -metrics.total_seconds)
+    
+    def totals(self) -> StepMetrics:
+        total = StepMetrics(step="total", model="")
+        for metrics in self.summary():
+            for field in ("calls", "errors", "cache_hits", "retries", "truncated", "input_tokens", "output_tokens",
+                          "cost_usd", "total_seconds", "queue_wait_seconds"):
+                setattr(total, field, getattr(total, field) + getattr(metrics, field))
+        return total
+    
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.records.clear()
+    
+    def export_json(self, path: Path):
+        data = {
+            "generated_at": time.time(),
+            "totals": self.totals().model_dump(),
+            "steps": [metrics.model_dump() for metrics in self.summary()],
+            "calls": [call.model_dump() for call in list(self.records)]
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+    
+    def prometheus_text(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        summary = self.summary()
+        lines: List[str] = []
+        
+        def family(name: str, kind: str, help_text: str, samples):
+            lines.append(f"# HELP promptbuster_{name} {help_text}")
+            lines.append(f"# TYPE promptbuster_{name} {kind}")
+            for labels, value in samples:
+                rendered = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+                lines.append(f"promptbuster_{name}{{{rendered}}} {value}")
+        
+        def labels(metrics: StepMetrics, **extra) -> dict:
+            return {"step": metrics.step, "model": metrics.model, **extra}
+        
+        family("llm_calls_total", "counter", "LLM calls made",
+               [(labels(m), m.calls) for m in summary])
+        family("llm_errors_total", "counter", "LLM calls that failed",
+               [(labels(m), m.errors) for m in summary])
+        family("llm_cache_hits_total", "counter", "LLM calls served from the response cache",
+               [(labels(m), m.cache_hits) for m in summary])
+        family("llm_retries_total", "counter", "Retried provider attempts",
+               [(labels(m), m.retries) for m in summary])
+        family("llm_truncated_total", "counter", "LLM outputs cut off at max_tokens",
+               [(labels(m), m.truncated) for m in summary])
+        family("llm_tokens_total", "counter", "Tokens used",
+               [(labels(m, direction="input"), m.input_tokens) for m in summary]
+               + [(labels(m, direction="output"), m.output_tokens) for m in summary])
+        family("llm_cost_usd_total", "counter", "Estimated spend in US dollars",
+               [(labels(m), f"{m.cost_usd:.6f}") for m in summary])
+        family("llm_queue_wait_seconds_total", "counter", "Time spent waiting for the rate limiter",
+               [(labels(m), f"{m.queue_wait_seconds:.6f}") for m in summary])
+        
+        samples = []
+        for m in summary:
+            for quantile, value in (("0.5", m.p50_seconds), ("0.95", m.p95_seconds)):
+                if value is not None:
+                    samples.append((labels(m, quantile=quantile), f"{value:.6f}"))
+        family("llm_call_seconds", "summary", "LLM call duration", samples)
+        for m in summary:
+            rendered = f'step="{_escape(m.step)}",model="{_escape(m.model)}"'
+            lines.append(f"promptbuster_llm_call_seconds_sum{{{rendered}}} {m.total_seconds:.6f}")
+            lines.append(f"promptbuster_llm_call_seconds_count{{{rendered}}} {m.calls}")
+        return "\n".join(lines) + "\n"
+    
+    def export_prometheus(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_summary(summary: List[StepMetrics], totals: Optional[StepMetrics] = None) -> str:
+    """Plain-text table of step metrics"""
+    def ms(seconds: Optional[float]) -> str:
+        return f"{seconds * 1000:.0f}" if seconds is not None else "-"
+    
+    header = f"{'step':<24}{'calls':>6}{'err':>5}{'hits':>6}{'retry':>6}{'p50 ms':>8}{'p95 ms':>8}" \
+             f"{'ttft':>7}{'wait s':>8}{'in tok':>9}{'out tok':>9}{'cost $':>9}"
+    lines = [header]
+    several_models = len({m.model for m in summary}) > 1
+    for m in summary + ([totals] if totals else []):
+        name = f"{m.step} ({m.model})" if several_models and m.model else (m.step or "(unlabelled)")
+        lines.append(
+            f"{name[:23]:<24}{m.calls:>6}{m.errors:>5}{m.cache_hits:>6}{m.retries:>6}{ms(m.p50_seconds):>8}"
+            f"{ms(m.p95_seconds):>8}{ms(m.ttft_p50_seconds):>7}{m.queue_wait_seconds:>8.2f}"
+            f"{m.input_tokens:>9}{m.output_tokens:>9}{m.cost_usd:>9.4f}"
+        )
+    return "\n".join(lines)
+
+
+# Every call in the process, e.g. for the server's /metrics endpoint
+REGISTRY = TelemetryCollector()
+
+
+class TelemetryProvider(ProviderWrapper):
+    """Outermost layer: times every call and records it with its step, usage, retries and cost"""
+    
+    def __init__(self, inner: BaseLLMProvider):
+        super().__init__(inner)
+        self.counter = get_token_counter(inner.config)
+    
+    def _start(self, streamed: bool) -> CallRecord:
+        return CallRecord(
+            step=_binding.get()[0],
+            provider=self.config.provider.value,
+            model=self.config.model,
+            started_at=time.time(),
+            streamed=streamed
+        )
+    
+    def _finish(self, call: CallRecord, started: float, prompt: str, system_prompt: Optional[str],
+                output: Optional[str], error: Optional[BaseException]):
+        call.total_seconds = time.perf_counter() - started
+        if error is not None:
+            call.error = f"{type(error).__name__}: {error}"
+        elif not call.cache_hit and call.input_tokens == 0 and call.output_tokens == 0:
+            call.usage_estimated = True
+            call.input_tokens = self.counter.count(prompt) + self.counter.count(system_prompt)
+            call.output_tokens = self.counter.count(output or "")
+        if call.cache_hit:
+            # Nothing was billed for a cached response
+            call.input_tokens = call.output_tokens = call.cached_input_tokens = 0
+        call.cost_usd = call_cost(self.config, call)
+        for meter in _meters.get():
+            meter.tokens += call.input_tokens + call.output_tokens
+        
+        REGISTRY.record(call)
+        collector = _binding.get()[1]
+        if collector is not None:
+            collector.record(call)
+    
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        call = self._start(streamed=False)
+        started = time.perf_counter()
+        token = current_call.set(call)
+        response, error = None, None
+        try:
+            response = await self.inner.generate(prompt, system_prompt, max_tokens)
+            return response
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            current_call.reset(token)
+            self._finish(call, started, prompt, system_prompt, response, error)
+    
+    async def stream(self, prompt: str, system_prompt: Optional[str] = None,
+                     max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        call = self._start(streamed=True)
+        started = time.perf_counter()
+        chunks = self.inner.stream(prompt, system_prompt, max_tokens)
+        parts: List[str] = []
+        error = None
+        try:
+            while True:
+                # Bound only while the inner layers run, never while the caller holds a chunk
+                token = current_call.set(call)
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    current_call.reset(token)
+                if call.ttft_seconds is None:
+                    call.ttft_seconds = time.perf_counter() - started
+                parts.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            # The caller stopped reading early; that is not a failed call
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            await chunks.aclose()
+            self._finish(call, started, prompt, system_prompt, "".join(parts), error)
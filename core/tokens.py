@@ -0,0 +1,162 @@
+import importlib.util
+from typing import Dict, List, Optional, Tuple
+from .models import LLMConfig, LLMProvider
+
+
+# Longest matching prefix wins; LLMConfig.context_window overrides these
+CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-4.1": 1047576,
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4-32k": 32768,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+    "o1": 200000,
+    "o3": 200000,
+    "o4": 200000,
+    "claude": 200000,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Typical output per workflow step. Requests still ask for LLMConfig.max_tokens;
+# these only estimate what a call will cost against rate limits and budgets
+STEP_OUTPUT_TOKENS: Dict[str, int] = {
+    "initial_prompt": 2000,
+    "prompt_generation": 1500,
+    "evaluation_guide": 2000,
+    "prompt_evaluation": 1200,
+    "improved_alternatives": 2000,
+    "candidate": 800,
+    "scored_evaluation": 800,
+}
+
+MIN_OUTPUT_TOKENS = 256
+# Upper bound on example tokens in one prompt, whatever the window; each one is billed on every call
+MAX_EXAMPLE_TOKENS = 32000
+SAFETY_MARGIN_TOKENS = 64
+TRIM_MARKER = "\n\n[... {omitted} tokens omitted ...]\n\n"
+
+
+def expected_output_tokens(step: Optional[str], max_tokens: int) -> int:
+    return min(max_tokens, STEP_OUTPUT_TOKENS.get(step or "", max_tokens))
+
+
+def estimate_tokens(text: Optional[str], chars_per_token: float = 4.0) -> int:
+    """Fast local estimate: roughly four characters per token for English prose"""
+    return int(len(text) / chars_per_token) + 1 if text else 0
+
+
+class TokenCounter:
+    def __init__(self, chars_per_token: float = 4.0):
+        self.chars_per_token = chars_per_token
+    
+    def count(self, text: Optional[str]) -> int:
+        return estimate_tokens(text, self.chars_per_token)
+
+
+class TiktokenCounter(TokenCounter):
+    def __init__(self, model: str):
+        super().__init__()
+        import tiktoken
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("cl100k_base")
+    
+    def count(self, text: Optional[str]) -> int:
+        return len(self.encoding.encode(text, disallowed_special=())) if text else 0
+
+
+_counters: Dict[Tuple[str, str], TokenCounter] = {}
+
+
+def get_token_counter(config: LLMConfig) -> TokenCounter:
+    """tiktoken for OpenAI models when installed, otherwise the local estimator"""
+    key = (config.provider.value, config.model)
+    counter = _counters.get(key)
+    if counter is None:
+        if config.provider == LLMProvider.OPENAI and importlib.util.find_spec("tiktoken") is not None:
+            counter = TiktokenCounter(config.model)
+        elif config.provider == LLMProvider.ANTHROPIC:
+            # Claude tokenizes slightly denser than OpenAI's encodings
+            counter = TokenCounter(chars_per_token=3.5)
+        else:
+            counter = TokenCounter()
+        _counters[key] = counter
+    return counter
+
+
+def context_window(config: LLMConfig) -> int:
+    if config.context_window:
+        return config.context_window
+    model = config.model.lower()
+    matches = [prefix for prefix in CONTEXT_WINDOWS if model.startswith(prefix)]
+    if not matches:
+        return DEFAULT_CONTEXT_WINDOW
+    return CONTEXT_WINDOWS[max(matches, key=len)]
+
+
+class TokenBudget:
+    """Fits request sections into the model's context window before any call is made"""
+
+    def __init__(self, config: LLMConfig, counter: Optional[TokenCounter] = None):
+        self.config = config
+        self.counter = counter or get_token_counter(config)
+        self.window = context_window(config)
+    
+    def count(self, text: Optional[str]) -> int:
+        return self.counter.count(text)
+    
+    def examples_budget(self, share: float = 0.5) -> int:
+        """Example tokens to put in a prompt: a share of the window left after the output"""
+        room = self.window - self.config.max_tokens - SAFETY_MARGIN_TOKENS
+        return max(MIN_OUTPUT_TOKENS, min(MAX_EXAMPLE_TOKENS, int(room * share)))
+    
+    def output_room(self, prompt: str, system_prompt: Optional[str] = None) -> int:
+        """max_tokens for a request sent as is, reduced only if the window can't hold it"""
+        room = self.window - self.count(prompt) - self.count(system_prompt) - SAFETY_MARGIN_TOKENS
+        return max(min(MIN_OUTPUT_TOKENS, self.config.max_tokens), min(self.config.max_tokens, room))
+    
+    def trim(self, text: str, max_tokens: int) -> str:
+        """Keep the head and tail of text within max_tokens, eliding the middle"""
+        tokens = self.count(text)
+        if tokens <= max_tokens:
+            return text
+        marker = TRIM_MARKER.format(omitted=tokens - max_tokens)
+        keep_chars = max(0, int(len(text) * (max_tokens - self.count(marker)) / tokens))
+        head = keep_chars * 2 // 3
+        tail = keep_chars - head
+        return text[:head] + marker + (text[-tail:] if tail else "")
+    
+    def fit(self, step: str, overhead: str, sections: List[str],
+            system_prompt: Optional[str] = None) -> Tuple[List[str], int]:
+        """Return sections trimmed to fit, and the max_tokens to request.
+
+        ``overhead`` is the request rendered with empty sections. The request
+        asks for ``max_tokens`` unless the window can't hold it next to the
+        input; then the output gives way first, down to the step's typical
+        output, and then the largest sections are trimmed.
+        """
+        output = self.config.max_tokens
+        fixed = self.count(overhead) + self.count(system_prompt) + SAFETY_MARGIN_TOKENS
+        sizes = [self.count(section) for section in sections]
+        
+        available = self.window - fixed - output
+        if sum(sizes) > available:
+            floor = min(output, max(MIN_OUTPUT_TOKENS, expected_output_tokens(step, output)))
+            output = max(floor, min(output, self.window - fixed - sum(sizes)))
+            available = self.window - fixed - output
+        if sum(sizes) <= available:
+            return list(sections), output
+        
+        # Water-fill: small sections keep their full size, large ones share the rest
+        available = max(0, available)
+        limits = list(sizes)
+        remaining = available
+        order = sorted(range(len(sections)), key=lambda i: sizes[i])
+        for position, i in enumerate(order):
+            share = remaining // (len(order) - position)
+            limits[i] = min(sizes[i], share)
+            remaining -= limits[i]
+        
+        return [self.trim(section, limit) for section, limit in zip(sections, limits)], output
@@ -1,52 +1,156 @@
-from typing import List
-from .models import PromptSession, Example, LLMConfig
+import asyncio
+import json
+import re
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Iterable, List, NamedTuple, Optional, Tuple
+import httpx
+from .models import PromptSession, Example, FidelityReport, LLMConfig, ScoredCandidate, WorkflowStep
 from .llm_providers import create_provider, BaseLLMProvider
+from .cache import fresh_responses
+from .scheduler import StepScheduler, StepCallback
+from .similarity import deduplicate
+from .harness import FidelityHarness
+from .routing import RoutedProvider
+from .examples import prepare_examples
+from .tokens import TokenBudget
+from . import telemetry
+from .telemetry import TelemetryCollector
+
+if TYPE_CHECKING:
+    from .cache import ResponseCache
+
+
+# Cycled across fan-out samples so parallel candidates explore different rewrites
+CANDIDATE_FOCUSES = [
+    "clarity and structure",
+    "a stronger role and context",
+    "an explicit output format",
+    "better, more varied examples",
+    "constraints and edge cases",
+    "concision",
+    "step-by-step reasoning instructions",
+    "tone and audience fit",
+    "self-checking and verification",
+    "robustness to ambiguous inputs",
+]
+
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+_PROMPT_OBJECT_RE = re.compile(r'\{\s*"prompt"\s*:')
+_SCORE_RE = re.compile(r"SCORE:\s*\**\s*(\d+(?:\.\d+)?)(?:\s*/\s*(\d+(?:\.\d+)?))?", re.IGNORECASE)
+
+MAX_SCORE = 10.0
+
+# Budget keys for requests that are not one of the WorkflowStep values
+SCORED_EVALUATION = "scored_evaluation"
+CANDIDATE = "candidate"
+
+
+class LLMRequest(NamedTuple):
+    """Positional arguments for BaseLLMProvider.generate()/stream()"""
+    prompt: str
+    system_prompt: Optional[str]
+    max_tokens: int
+
+
+def rank_candidates(scored: List[ScoredCandidate]) -> List[ScoredCandidate]:
+    """Sort best first; unscored candidates go last, keeping their order"""
+    return sorted(scored, key=lambda candidate: -candidate.score if candidate.score is not None else float("inf"))
 
 
 class PromptBusterWorkflow:
-    def __init__(self, llm_config: LLMConfig):
-        self.llm_provider = create_provider(llm_config)
+    def __init__(self, llm_config: LLMConfig, http_client: Optional[httpx.AsyncClient] = None,
+                 cache: Optional["ResponseCache"] = None, llm_provider: Optional[BaseLLMProvider] = None):
+        # Pass llm_provider to share one provider (and its connection pool) across workflows
+        self.llm_provider = llm_provider or create_provider(llm_config, http_client, cache)
+        self.budget = TokenBudget(self.llm_provider.config)
         self.session = PromptSession()
+        # When set, step 6 fans out this many independent candidate calls
+        self.candidate_count: Optional[int] = None
+        # When True, step 7 scores every alternative and selects the best one
+        self.auto_score = False
+        # Latency, token usage and cost of this workflow's calls, per step
+        self.telemetry = TelemetryCollector()
+        # Called with (field, value) after each session update, e.g. to autosave it
+        self.session_listeners: List[Callable[[str, Any], None]] = []
     
-    async def generate_initial_prompt_guide(self, role: str) -> str:
-        prompt = f"Generate a detailed prompt engineering guide. The audience is {role}."
-        return await self.llm_provider.generate(prompt)
+    async def warm_up(self):
+        await self.llm_provider.warm_up()
     
-    async def generate_prompt_from_examples(self, role: str, examples: List[Example]) -> str:
+    async def aclose(self):
+        await self.llm_provider.aclose()
+    
+    def budget_for(self, step: str) -> TokenBudget:
+        """Budget of the model that calls for step go to, when steps are routed between models"""
+        if isinstance(self.llm_provider, RoutedProvider):
+            return TokenBudget(self.llm_provider.config_for(step))
+        return self.budget
+    
+    def _fit(self, step: str, build: Callable[..., Tuple[Optional[str], str]], *sections: str) -> LLMRequest:
+        """Render a request with its variable sections trimmed to the context budget.
+
+        ``build`` returns (system_prompt, prompt). Text that stays the same
+        across repeated calls belongs in the system prompt so providers can
+        reuse it as a cached prefix.
+        """
+        # Label the provider call this request is built for with its step and session
+        telemetry.bind(step, self.telemetry)
+        overhead_system, overhead_prompt = build(*([""] * len(sections)))
+        fitted, max_tokens = self.budget_for(step).fit(step, overhead_prompt, list(sections), overhead_system)
+        system_prompt, prompt = build(*fitted)
+        return LLMRequest(prompt, system_prompt, max_tokens)
+    
+    def _initial_prompt_guide_request(self, role: str) -> LLMRequest:
+        return self._fit(
+            WorkflowStep.INITIAL_PROMPT.value,
+            lambda: (None, f"Generate a detailed prompt engineering guide. The audience is {role}.")
+        )
+    
+    def _prompt_from_examples_request(self, role: str, examples: List[Example]) -> LLMRequest:
         examples_text = "\n\n".join([
             f"Input: {ex.input_text}\nOutput: {ex.expected_output}"
             for ex in examples
         ])
         
-        prompt = f"""I have these 5 examples of how I want my prompt to work for {role}:
+        return self._fit(
+            WorkflowStep.PROMPT_GENERATION.value,
+            lambda examples_text: (None, f"""I have these {len(examples)} examples of how I want my prompt to work for {role}:
 
 {examples_text}
 
-Generate a prompt that could have generated the examples' outputs, and include a better set of examples."""
-        
-        return await self.llm_provider.generate(prompt)
+Generate a prompt that could have generated the examples' outputs, and include a better set of examples."""),
+            examples_text
+        )
     
-    async def generate_evaluation_guide(self, role: str) -> str:
-        prompt = f"Generate a detailed prompt evaluation guide. The audience is {role}."
-        return await self.llm_provider.generate(prompt)
+    def _evaluation_guide_request(self, role: str) -> LLMRequest:
+        return self._fit(
+            WorkflowStep.EVALUATION_GUIDE.value,
+            lambda: (None, f"Generate a detailed prompt evaluation guide. The audience is {role}.")
+        )
     
-    async def evaluate_prompt(self, prompt_to_evaluate: str, evaluation_guide: str) -> str:
-        evaluation_prompt = f"""Using this evaluation guide:
+    def _evaluation_request(self, prompt_to_evaluate: str, evaluation_guide: str,
+                            step: str = WorkflowStep.PROMPT_EVALUATION.value, suffix: str = "") -> LLMRequest:
+        # The guide is identical for every prompt scored against it, so it leads as the system prefix
+        return self._fit(
+            step,
+            lambda evaluation_guide, prompt_to_evaluate: (
+                f"""Using this evaluation guide:
 
-{evaluation_guide}
-
-Evaluate the following prompt:
+{evaluation_guide}""" + suffix,
+                f"""Evaluate the following prompt:
 
 {prompt_to_evaluate}"""
-        
-        return await self.llm_provider.generate(evaluation_prompt)
+            ),
+            evaluation_guide,
+            prompt_to_evaluate
+        )
     
-    async def generate_improved_alternatives(self, original_prompt: str, evaluation_result: str) -> List[str]:
-        improvement_prompt = f"""Based on this evaluation:
-
-{evaluation_result}
+    def _improvement_request(self, original_prompt: str, evaluation_result: str) -> LLMRequest:
+        return self._fit(
+            WorkflowStep.IMPROVED_ALTERNATIVES.value,
+            lambda evaluation_result, original_prompt: (
+                f"""Based on this evaluation:
 
-Generate 3 improved alternative prompts for the original prompt:
+{evaluation_result}""",
+                f"""Generate 3 improved alternative prompts for the original prompt:
 
 {original_prompt}
 
@@ -54,9 +158,174 @@ Format your response as:
 1. [First alternative]
 2. [Second alternative]  
 3. [Third alternative]"""
+            ),
+            evaluation_result,
+            original_prompt
+        )
+    
+    def _scored_evaluation_request(self, prompt_to_evaluate: str, evaluation_guide: str) -> LLMRequest:
+        return self._evaluation_request(
+            prompt_to_evaluate,
+            evaluation_guide,
+            step=SCORED_EVALUATION,
+            suffix=f"""
+
+After your critique, end with a final line exactly in the form:
+SCORE: <number from 0 to {MAX_SCORE:g}>"""
+        )
+    
+    def _candidate_request(self, original_prompt: str, evaluation_result: str,
+                           index: int, total: int) -> LLMRequest:
+        # Everything but the candidate number and focus is shared by the fan-out
+        focus = CANDIDATE_FOCUSES[index % len(CANDIDATE_FOCUSES)]
+        return self._fit(
+            CANDIDATE,
+            lambda evaluation_result, original_prompt: (
+                f"""Based on this evaluation:
+
+{evaluation_result}
+
+Write ONE improved alternative to the original prompt:
+
+{original_prompt}
+
+Respond with a JSON object only, in the form {{"prompt": "<the improved prompt>"}}""",
+                f"This is candidate {index + 1} of {total}. Focus especially on {focus}."
+            ),
+            evaluation_result,
+            original_prompt
+        )
+    
+    async def generate_initial_prompt_guide(self, role: str) -> str:
+        return await self.llm_provider.generate(*self._initial_prompt_guide_request(role))
+    
+    def stream_initial_prompt_guide(self, role: str) -> AsyncIterator[str]:
+        return self.llm_provider.stream(*self._initial_prompt_guide_request(role))
+    
+    async def generate_prompt_from_examples(self, role: str, examples: List[Example]) -> str:
+        return await self.llm_provider.generate(*self._prompt_from_examples_request(role, examples))
+    
+    def stream_prompt_from_examples(self, role: str, examples: List[Example]) -> AsyncIterator[str]:
+        return self.llm_provider.stream(*self._prompt_from_examples_request(role, examples))
+    
+    async def generate_evaluation_guide(self, role: str) -> str:
+        return await self.llm_provider.generate(*self._evaluation_guide_request(role))
+    
+    def stream_evaluation_guide(self, role: str) -> AsyncIterator[str]:
+        return self.llm_provider.stream(*self._evaluation_guide_request(role))
+    
+    async def evaluate_prompt(self, prompt_to_evaluate: str, evaluation_guide: str) -> str:
+        return await self.llm_provider.generate(*self._evaluation_request(prompt_to_evaluate, evaluation_guide))
+    
+    def stream_prompt_evaluation(self, prompt_to_evaluate: str, evaluation_guide: str) -> AsyncIterator[str]:
+        return self.llm_provider.stream(*self._evaluation_request(prompt_to_evaluate, evaluation_guide))
+    
+    async def generate_improved_alternatives(self, original_prompt: str, evaluation_result: str) -> List[str]:
+        response = await self.llm_provider.generate(*self._improvement_request(original_prompt, evaluation_result))
+        return self.parse_alternatives(response)
+    
+    def stream_improved_alternatives(self, original_prompt: str, evaluation_result: str) -> AsyncIterator[str]:
+        """Stream the raw numbered response; pass the joined text to parse_alternatives"""
+        return self.llm_provider.stream(*self._improvement_request(original_prompt, evaluation_result))
+    
+    async def generate_candidate_alternatives(self, original_prompt: str, evaluation_result: str,
+                                              n: int = 10, similarity_threshold: float = 0.85) -> List[str]:
+        """Fan out n concurrent single-candidate calls and return the distinct candidates"""
+        responses = await asyncio.gather(
+            *[
+                self.llm_provider.generate(*self._candidate_request(original_prompt, evaluation_result, i, n))
+                for i in range(n)
+            ],
+            return_exceptions=True
+        )
         
-        response = await self.llm_provider.generate(improvement_prompt)
+        candidates = [
+            candidate for candidate in (
+                self.parse_candidate(response) for response in responses if isinstance(response, str)
+            ) if candidate
+        ]
+        if not candidates:
+            errors = [response for response in responses if isinstance(response, BaseException)]
+            if errors:
+                raise errors[0]
+        return deduplicate(candidates, similarity_threshold)
+    
+    async def evaluate_candidate(self, prompt_to_evaluate: str, evaluation_guide: str) -> ScoredCandidate:
+        """Score a candidate, asking once more if the critique ends without a SCORE line.
+
+        A critique cut off at max_tokens loses its score; one that still has
+        none after the retry stays unscored and ranks last.
+        """
+        request = self._scored_evaluation_request(prompt_to_evaluate, evaluation_guide)
+        critique = await self.llm_provider.generate(*request)
+        score = self.parse_score(critique)
+        if score is None:
+            with fresh_responses():
+                critique = await self.llm_provider.generate(*request)
+            score = self.parse_score(critique)
+        return ScoredCandidate(prompt=prompt_to_evaluate, score=score, critique=critique)
+    
+    async def score_candidates(self, candidates: List[str], evaluation_guide: str) -> List[ScoredCandidate]:
+        """Evaluate every candidate concurrently and return them best first"""
+        results = await asyncio.gather(
+            *[self.evaluate_candidate(candidate, evaluation_guide) for candidate in candidates],
+            return_exceptions=True
+        )
         
+        scored = []
+        for candidate, result in zip(candidates, results):
+            if isinstance(result, BaseException):
+                result = ScoredCandidate(prompt=candidate, critique=f"Evaluation failed: {result}")
+            scored.append(result)
+        return rank_candidates(scored)
+    
+    async def measure_fidelity(self, candidates: List[str],
+                               examples: Optional[List[Example]] = None) -> List[FidelityReport]:
+        """Run each candidate on the examples and score outputs against the expected ones.
+
+        Defaults to the held-out examples when a split exists, so candidates
+        are not judged on the examples they were written from.
+        """
+        if examples is None:
+            examples = self.session.holdout_examples or self.session.examples
+        if not examples:
+            raise ValueError("At least one example is required")
+        telemetry.bind("fidelity", self.telemetry)
+        return await FidelityHarness(self.llm_provider, self.budget_for("fidelity")).evaluate(candidates, examples)
+    
+    @staticmethod
+    def parse_score(critique: str) -> Optional[float]:
+        matches = _SCORE_RE.findall(critique)
+        if not matches:
+            return None
+        value, scale = matches[-1]
+        score = float(value)
+        if scale and float(scale) > 0:
+            score = score / float(scale) * MAX_SCORE
+        return max(0.0, min(MAX_SCORE, score))
+    
+    @staticmethod
+    def parse_candidate(response: str) -> str:
+        """Extract the prompt from a {"prompt": ...} reply, falling back to the raw text.
+
+        Returns "" for an object that never closes, i.e. a reply cut off at
+        max_tokens, rather than passing the fragment on as a candidate.
+        """
+        match = _JSON_OBJECT_RE.search(response)
+        if match:
+            try:
+                # strict=False accepts raw newlines inside the prompt string
+                data = json.loads(match.group(0), strict=False)
+            except json.JSONDecodeError:
+                data = None
+            if isinstance(data, dict) and isinstance(data.get("prompt"), str):
+                return data["prompt"].strip()
+        if _PROMPT_OBJECT_RE.search(response):
+            return ""
+        return response.strip().strip("`").strip()
+    
+    @staticmethod
+    def parse_alternatives(response: str) -> List[str]:
         alternatives = []
         lines = response.split('\n')
         current_alternative = ""
@@ -75,23 +344,64 @@ Format your response as:
         
         return alternatives[:3]
     
+    async def run_all(self, role: Optional[str] = None, examples: Optional[List[Example]] = None,
+                      steps: Optional[Iterable[WorkflowStep]] = None,
+                      on_step_complete: Optional[StepCallback] = None) -> PromptSession:
+        """Run the workflow concurrently along its dependency graph"""
+        if role is not None:
+            self.set_role(role)
+        if examples is not None:
+            self.set_examples(examples)
+        return await StepScheduler(self, on_step_complete).run(steps)
+    
+    def _update(self, field: str, value: Any):
+        setattr(self.session, field, value)
+        for listener in self.session_listeners:
+            listener(field, value)
+    
+    def restore_session(self, session: PromptSession):
+        """Replace the whole session, e.g. with one recovered from autosave"""
+        self.session = session
+    
+    def set_current_step(self, step: WorkflowStep):
+        self._update("current_step", step)
+    
     def set_role(self, role: str):
-        self.session.role = role
+        self._update("role", role)
+    
+    def set_prompt_guide(self, guide: str):
+        self._update("prompt_guide", guide)
+    
+    def load_examples(self, examples: List[Example], token_budget: int = 3000,
+                      holdout_fraction: float = 0.2, max_examples: Optional[int] = None):
+        """Select a diverse in-budget subset for prompting and hold out the rest for evaluation"""
+        selected, holdout = prepare_examples(examples, token_budget, holdout_fraction, max_examples)
+        self._update("examples", selected)
+        self._update("holdout_examples", holdout)
+    
+    def set_examples(self, examples: Iterable[Example]):
+        self._update("examples", list(examples))
     
     def add_example(self, input_text: str, expected_output: str):
-        self.session.examples.append(Example(input_text=input_text, expected_output=expected_output))
+        self._update("examples", self.session.examples + [Example(input_text=input_text, expected_output=expected_output)])
     
     def set_generated_prompt(self, prompt: str):
-        self.session.generated_prompt = prompt
+        self._update("generated_prompt", prompt)
     
     def set_evaluation_guide(self, guide: str):
-        self.session.evaluation_guide = guide
+        self._update("evaluation_guide", guide)
     
     def set_evaluation_result(self, result: str):
-        self.session.evaluation_result = result
+        self._update("evaluation_result", result)
     
     def set_alternative_prompts(self, alternatives: List[str]):
-        self.session.alternative_prompts = alternatives
+        self._update("alternative_prompts", alternatives)
+    
+    def set_scored_alternatives(self, scored: List[ScoredCandidate]):
+        self._update("scored_alternatives", scored)
+    
+    def set_fidelity_reports(self, reports: List[FidelityReport]):
+        self._update("fidelity_reports", reports)
     
     def set_final_prompt(self, prompt: str):
-        self.session.final_prompt = prompt
\ No newline at end of file
+        self._update("final_prompt", prompt)
\ No newline at end of file
@@ -1,6 +1,8 @@
 import customtkinter as ctk
+import threading
+from collections import deque
 from tkinter import messagebox
-from typing import Callable, Optional
+from typing import Callable, Deque, List, Optional
 from core.models import LLMConfig, LLMProvider
 
 
@@ -56,11 +58,27 @@ class ConfigurationPanel(ctk.CTkFrame):
         ctk.CTkLabel(self, text="Max Tokens:").grid(row=11, column=0, sticky="w", pady=5)
         self.max_tokens_var = ctk.StringVar(value="4000")
         self.max_tokens_entry = ctk.CTkEntry(self, textvariable=self.max_tokens_var)
-        self.max_tokens_entry.grid(row=12, column=0, sticky="ew", pady=(0, 20))
+        self.max_tokens_entry.grid(row=12, column=0, sticky="ew", pady=(0, 10))
+        
+        # Rate limits (optional)
+        ctk.CTkLabel(self, text="Requests/min (optional):").grid(row=13, column=0, sticky="w", pady=5)
+        self.rpm_var = ctk.StringVar()
+        self.rpm_entry = ctk.CTkEntry(self, textvariable=self.rpm_var)
+        self.rpm_entry.grid(row=14, column=0, sticky="ew", pady=(0, 10))
+        
+        ctk.CTkLabel(self, text="Tokens/min (optional):").grid(row=15, column=0, sticky="w", pady=5)
+        self.tpm_var = ctk.StringVar()
+        self.tpm_entry = ctk.CTkEntry(self, textvariable=self.tpm_var)
+        self.tpm_entry.grid(row=16, column=0, sticky="ew", pady=(0, 10))
+        
+        # Response cache
+        self.use_cache_var = ctk.BooleanVar(value=True)
+        self.use_cache_checkbox = ctk.CTkCheckBox(self, text="Use response cache", variable=self.use_cache_var)
+        self.use_cache_checkbox.grid(row=17, column=0, sticky="w", pady=(0, 20))
         
         # Apply button
         self.apply_button = ctk.CTkButton(self, text="Apply Configuration", command=self.apply_config)
-        self.apply_button.grid(row=13, column=0, sticky="ew", pady=10)
+        self.apply_button.grid(row=18, column=0, sticky="ew", pady=10)
         
         self.on_provider_changed("openai")
     
@@ -86,7 +104,10 @@ class ConfigurationPanel(ctk.CTkFrame):
                 api_key=self.api_key_var.get() if self.api_key_var.get() else None,
                 base_url=self.base_url_var.get() if self.base_url_var.get() else None,
                 temperature=float(self.temperature_var.get()),
-                max_tokens=int(self.max_tokens_var.get())
+                max_tokens=int(self.max_tokens_var.get()),
+                use_cache=self.use_cache_var.get(),
+                requests_per_minute=int(self.rpm_var.get()) if self.rpm_var.get().strip() else None,
+                tokens_per_minute=int(self.tpm_var.get()) if self.tpm_var.get().strip() else None
             )
             
             self.on_config_changed(config)
@@ -96,8 +117,18 @@ class ConfigurationPanel(ctk.CTkFrame):
 
 
 class ScrollableTextArea(ctk.CTkFrame):
-    def __init__(self, parent, height: int = 200, placeholder: str = ""):
+    def __init__(self, parent, height: int = 200, placeholder: str = "", flush_interval_ms: int = 50,
+                 chunk_chars: int = 32_000):
         super().__init__(parent)
+        self.flush_interval_ms = flush_interval_ms
+        self.chunk_chars = chunk_chars
+        self._pending: List[str] = []
+        self._pending_lock = threading.Lock()
+        self._streaming = False
+        # Text larger than a chunk is inserted one chunk per after() tick so Tk stays responsive
+        self._backlog: Deque[str] = deque()
+        self._backlog_follow = False
+        self._drain_id: Optional[str] = None
         self.setup_ui(height, placeholder)
     
     def setup_ui(self, height: int, placeholder: str):
@@ -111,15 +142,199 @@ class ScrollableTextArea(ctk.CTkFrame):
             self.textbox.insert("1.0", placeholder)
     
     def get_text(self) -> str:
-        return self.textbox.get("1.0", "end-1c")
+        """The full text, including any still waiting to be inserted"""
+        return self.textbox.get("1.0", "end-1c") + "".join(self._backlog)
     
     def set_text(self, text: str):
-        self.textbox.delete("1.0", "end")
-        self.textbox.insert("1.0", text)
+        self.clear()
+        self._insert(text, follow=False)
+    
+    def append_text(self, text: str):
+        self._insert(text, follow=True)
+    
+    def _insert(self, text: str, follow: bool):
+        if not self._backlog and len(text) <= self.chunk_chars:
+            self.textbox.insert("end", text)
+            if follow:
+                self.textbox.see("end")
+            return
+        
+        self._backlog.extend(text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars))
+        self._backlog_follow = self._backlog_follow or follow
+        if self._drain_id is None:
+            self._drain_backlog()
+    
+    def _drain_backlog(self):
+        self._drain_id = None
+        if self._backlog:
+            self.textbox.insert("end", self._backlog.popleft())
+            if self._backlog_follow:
+                self.textbox.see("end")
+        if self._backlog:
+            self._drain_id = self.after(1, self._drain_backlog)
+        else:
+            self._backlog_follow = False
+    
+    def _cancel_backlog(self):
+        if self._drain_id is not None:
+            self.after_cancel(self._drain_id)
+            self._drain_id = None
+        self._backlog.clear()
+        self._backlog_follow = False
+    
+    def start_streaming(self):
+        """Clear the area and start flushing queued chunks on each after() tick"""
+        with self._pending_lock:
+            self._pending = []
+        self.clear()
+        self._streaming = True
+        self.after(self.flush_interval_ms, self._flush_pending)
+    
+    def queue_text(self, text: str):
+        """Thread-safe: buffer a chunk to be appended on the next flush"""
+        with self._pending_lock:
+            self._pending.append(text)
+    
+    def stop_streaming(self):
+        self._streaming = False
+        self._flush_pending()
+    
+    def _flush_pending(self):
+        with self._pending_lock:
+            chunks, self._pending = self._pending, []
+        if chunks:
+            self.append_text("".join(chunks))
+        if self._streaming:
+            self.after(self.flush_interval_ms, self._flush_pending)
     
     def clear(self):
+        self._cancel_backlog()
         self.textbox.delete("1.0", "end")
     
     def set_enabled(self, enabled: bool):
         state = "normal" if enabled else "disabled"
-        self.textbox.configure(state=state)
\ No newline at end of file
+        self.textbox.configure(state=state)
+
+
+class VirtualList(ctk.CTkFrame):
+    """A scrolling list of text items that only has widgets for the rows in view.
+
+    Each row shows an item's title and the start of its text, so thousands
+    of long candidates cost as much to display as a screenful. Selecting a
+    row calls ``on_select`` with the item's index.
+    """
+    
+    def __init__(self, parent, height: int = 200, row_height: int = 52, preview_chars: int = 160,
+                 on_select: Optional[Callable[[int], None]] = None, placeholder: str = ""):
+        super().__init__(parent)
+        self.row_height = row_height
+        self.preview_chars = preview_chars
+        self.on_select = on_select
+        self.items: List[str] = []
+        self.titles: List[str] = []
+        self.first = 0
+        self.selected: Optional[int] = None
+        self.rows: List[ctk.CTkButton] = []
+        self.setup_ui(height, placeholder)
+    
+    def setup_ui(self, height: int, placeholder: str):
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        
+        self.body = ctk.CTkFrame(self, fg_color="transparent", height=height)
+        self.body.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+        self.body.grid_columnconfigure(0, weight=1)
+        # The rows must not resize the list; the list decides how many rows fit
+        self.body.grid_propagate(False)
+        self.body.bind("<Configure>", lambda event: self._resize(event.height))
+        self._bind_wheel(self.body)
+        
+        self.placeholder_label = ctk.CTkLabel(self.body, text=placeholder, anchor="w")
+        
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns", pady=5)
+        
+        self._resize(height)
+    
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel)
+        widget.bind("<Button-4>", self._on_wheel)
+        widget.bind("<Button-5>", self._on_wheel)
+    
+    def _resize(self, height: int):
+        count = max(1, height // self.row_height)
+        while len(self.rows) < count:
+            slot = len(self.rows)
+            row = ctk.CTkButton(self.body, text="", anchor="w", height=self.row_height - 4,
+                                fg_color="transparent", text_color=("gray10", "gray90"),
+                                command=lambda slot=slot: self.select(self.first + slot))
+            self._bind_wheel(row)
+            self.rows.append(row)
+        while len(self.rows) > count:
+            self.rows.pop().destroy()
+        self.render()
+    
+    def set_items(self, items: List[str], titles: Optional[List[str]] = None):
+        self.items = items
+        self.titles = titles or [f"{i + 1}." for i in range(len(items))]
+        self.first = 0
+        self.selected = None
+        self.render()
+    
+    def clear(self):
+        self.set_items([])
+    
+    def select(self, index: int):
+        if not 0 <= index < len(self.items):
+            return
+        self.selected = index
+        # Bring the row into view
+        if index < self.first:
+            self.first = index
+        elif index >= self.first + len(self.rows):
+            self.first = index - len(self.rows) + 1
+        self.render()
+        if self.on_select:
+            self.on_select(index)
+    
+    def scroll_to(self, first: int):
+        self.first = first
+        self.render()
+    
+    def _label(self, index: int) -> str:
+        # Only rows in view are ever summarised
+        text = self.items[index][:self.preview_chars * 2]
+        preview = " ".join(text.split())[:self.preview_chars]
+        return f"{self.titles[index]}\n{preview}"
+    
+    def render(self):
+        total = len(self.items)
+        self.first = max(0, min(self.first, total - len(self.rows)))
+        for slot, row in enumerate(self.rows):
+            index = self.first + slot
+            if index < total:
+                row.configure(text=self._label(index),
+                              fg_color=("gray75", "gray30") if index == self.selected else "transparent")
+                row.grid(row=slot, column=0, sticky="ew", pady=2)
+            else:
+                row.grid_remove()
+        
+        if total:
+            self.placeholder_label.grid_remove()
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + len(self.rows)) / total))
+        else:
+            self.placeholder_label.grid(row=0, column=0, sticky="w")
+            self.scrollbar.set(0.0, 1.0)
+    
+    def _on_scrollbar(self, action: str, amount, unit: str = "units"):
+        if action == "moveto":
+            self.scroll_to(round(float(amount) * len(self.items)))
+        elif action == "scroll":
+            step = len(self.rows) if unit == "pages" else 1
+            self.scroll_to(self.first + int(amount) * step)
+    
+    def _on_wheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll_to(self.first - 1)
+        else:
+            self.scroll_to(self.first + 1)
\ No newline at end of file
@@ -1,11 +1,15 @@
 import customtkinter as ctk
-from tkinter import messagebox
-import asyncio
 import threading
+from tkinter import messagebox
 from .workflow_tabs import WorkflowTabs
 from .components import ConfigurationPanel
-from core.models import LLMConfig, LLMProvider
+from core.models import LLMConfig, LLMProvider, PromptSession
+from core.llm_providers import preload_sdk
 from core.workflow import PromptBusterWorkflow
+from core.runtime import AsyncRuntime
+from core.cache import ResponseCache
+from config.settings import SettingsManager
+from config.autosave import SessionJournal
 
 
 class MainWindow(ctk.CTk):
@@ -16,7 +20,17 @@ class MainWindow(ctk.CTk):
         self.geometry("1200x800")
         
         self.workflow = None
+        self.settings = SettingsManager()
+        self.response_cache = ResponseCache(self.settings.cache_dir)
+        self.runtime = AsyncRuntime().start()
+        self.journal = SessionJournal(self.settings.autosave_dir)
+        # Recovered at startup and handed to the first workflow once one is configured
+        self.restored_session = None
         self.setup_ui()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.after(0, self.restore_autosave)
+        # Once the window is up, load the SDK the user is about to apply
+        self.after(100, self.warm_up)
     
     def setup_ui(self):
         self.grid_columnconfigure(1, weight=1)
@@ -26,8 +40,9 @@ class MainWindow(ctk.CTk):
         self.config_panel = ConfigurationPanel(self, self.on_config_changed)
         self.config_panel.grid(row=0, column=0, sticky="nsew", padx=(10, 5), pady=10)
         
-        # Main workflow area (right side)
-        self.workflow_tabs = WorkflowTabs(self)
+        # Main workflow area (right side); a saved session becomes the autosave's new baseline
+        self.workflow_tabs = WorkflowTabs(self, self.runtime, self.settings.session_store,
+                                          on_session_saved=self.journal.start)
         self.workflow_tabs.grid(row=0, column=1, sticky="nsew", padx=(5, 10), pady=10)
         
         # Initially disable workflow until configuration is set
@@ -35,23 +50,48 @@ class MainWindow(ctk.CTk):
     
     def on_config_changed(self, config: LLMConfig):
         try:
-            self.workflow = PromptBusterWorkflow(config)
+            previous = self.workflow
+            if config.routing is None:
+                config = config.model_copy(update={"routing": self.settings.load_routing()})
+            self.workflow = PromptBusterWorkflow(config, self.runtime.http_client, self.response_cache)
             self.workflow_tabs.set_workflow(self.workflow)
             self.workflow_tabs.set_enabled(True)
+            if previous is not None:
+                # Keep the work in progress when only the LLM settings change
+                self.workflow.restore_session(previous.session)
+            elif self.restored_session is not None:
+                self.workflow.restore_session(self.restored_session)
+            self.workflow.session_listeners.append(self.journal.record)
+            if previous is not None:
+                self.runtime.submit(previous.aclose())
+            self.runtime.submit(self.workflow.warm_up())
             messagebox.showinfo("Configuration", "LLM configuration updated successfully!")
         except Exception as e:
             messagebox.showerror("Configuration Error", f"Failed to initialize LLM provider: {str(e)}")
             self.workflow_tabs.set_enabled(False)
     
-    def run_async_task(self, coro):
-        """Run async task in a separate thread to avoid blocking the GUI"""
-        def run_in_thread():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+    def warm_up(self):
+        provider = LLMProvider(self.config_panel.provider_var.get())
+        threading.Thread(target=preload_sdk, args=(provider,), name="promptbuster-warm-up", daemon=True).start()
+    
+    def restore_autosave(self):
+        recovered = self.journal.recover()
+        if recovered is not None and messagebox.askyesno(
+                "Restore Session", "An autosaved session from your last run was found. Restore it?"):
+            self.restored_session = recovered
+            self.workflow_tabs.load_session(recovered)
+        # Declining starts over from an empty session
+        self.journal.start(self.restored_session or PromptSession())
+    
+    def on_close(self):
+        if self.workflow is not None:
             try:
-                result = loop.run_until_complete(coro)
-                return result
-            finally:
-                loop.close()
-        
-        return threading.Thread(target=run_in_thread, daemon=True)
\ No newline at end of file
+                self.runtime.submit(self.workflow.aclose()).result(timeout=2)
+            except Exception:
+                pass
+        # A clean exit leaves nothing to recover; reset only once queued updates are on disk
+        self.journal.flush()
+        self.journal.reset()
+        self.journal.close()
+        self.runtime.shutdown()
+        self.destroy()
\ No newline at end of file
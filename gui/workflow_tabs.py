@@ -1,16 +1,25 @@
 import customtkinter as ctk
-from tkinter import messagebox
-import asyncio
-import threading
-from typing import Optional
+from tkinter import filedialog, messagebox
+from typing import Callable, List, Optional
 from core.workflow import PromptBusterWorkflow
-from core.models import Example
-from .components import ScrollableTextArea
+from core.optimizer import PromptOptimizer
+from core.harness import format_matrix
+from core.telemetry import format_summary
+from core.examples import load_examples
+from core.models import Example, PromptSession, WorkflowStep
+from core.runtime import AsyncRuntime
+from config.session_store import SessionStore
+from .components import ScrollableTextArea, VirtualList
 
 
 class WorkflowTabs(ctk.CTkTabview):
-    def __init__(self, parent):
+    def __init__(self, parent, runtime: AsyncRuntime, session_store: Optional[SessionStore] = None,
+                 on_session_saved: Optional[Callable[[PromptSession], None]] = None):
         super().__init__(parent)
+        self.runtime = runtime
+        self.session_store = session_store
+        # Called once the session is in the store, e.g. to clear the autosave
+        self.on_session_saved = on_session_saved
         self.workflow: Optional[PromptBusterWorkflow] = None
         self.setup_tabs()
     
@@ -42,6 +51,10 @@ class WorkflowTabs(ctk.CTkTabview):
         # Step 7: Final Selection
         self.step7_tab = self.add("7. Final")
         self.setup_step7()
+        
+        # Call latency, token usage and cost for this session
+        self.metrics_tab = self.add("Metrics")
+        self.setup_metrics()
     
     def setup_step1(self):
         frame = self.step1_tab
@@ -66,7 +79,7 @@ class WorkflowTabs(ctk.CTkTabview):
         frame = self.step2_tab
         frame.grid_columnconfigure(0, weight=1)
         
-        ctk.CTkLabel(frame, text="Step 2: Input 5 Examples", 
+        ctk.CTkLabel(frame, text="Step 2: Input Examples", 
                     font=ctk.CTkFont(size=14, weight="bold")).grid(row=0, column=0, pady=10, sticky="w")
         
         # Examples input
@@ -76,6 +89,7 @@ class WorkflowTabs(ctk.CTkTabview):
         
         self.example_inputs = []
         self.example_outputs = []
+        self.imported_examples: List[Example] = []
         
         for i in range(5):
             example_frame = ctk.CTkFrame(self.examples_frame)
@@ -94,6 +108,18 @@ class WorkflowTabs(ctk.CTkTabview):
             output_entry.grid(row=4, column=0, sticky="ew", padx=10, pady=(5, 10))
             self.example_outputs.append(output_entry)
         
+        import_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        import_frame.grid(row=2, column=0, sticky="ew", pady=5)
+        
+        self.import_examples_btn = ctk.CTkButton(import_frame, text="Import Examples (CSV/JSONL)...", command=self.import_examples)
+        self.import_examples_btn.grid(row=0, column=0, padx=(0, 10))
+        
+        self.imported_examples_label = ctk.CTkLabel(import_frame, text="")
+        self.imported_examples_label.grid(row=0, column=1, sticky="w")
+        
+        self.run_all_btn = ctk.CTkButton(frame, text="Run All Steps", command=self.run_all_steps)
+        self.run_all_btn.grid(row=3, column=0, pady=10)
+        
         frame.grid_rowconfigure(1, weight=1)
     
     def setup_step3(self):
@@ -145,16 +171,34 @@ class WorkflowTabs(ctk.CTkTabview):
         frame = self.step6_tab
         frame.grid_columnconfigure(0, weight=1)
         
-        ctk.CTkLabel(frame, text="Step 6: Generate 3 Improved Alternatives", 
+        ctk.CTkLabel(frame, text="Step 6: Generate Improved Alternatives", 
                     font=ctk.CTkFont(size=14, weight="bold")).grid(row=0, column=0, pady=10, sticky="w")
         
+        options_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        options_frame.grid(row=1, column=0, sticky="w", pady=5)
+        
+        self.parallel_candidates_var = ctk.BooleanVar(value=False)
+        self.parallel_candidates_checkbox = ctk.CTkCheckBox(
+            options_frame, text="Generate candidates in parallel", variable=self.parallel_candidates_var
+        )
+        self.parallel_candidates_checkbox.grid(row=0, column=0, sticky="w", padx=(0, 10))
+        
+        ctk.CTkLabel(options_frame, text="Candidates:").grid(row=0, column=1, sticky="w", padx=(0, 5))
+        self.candidate_count_var = ctk.StringVar(value="10")
+        self.candidate_count_entry = ctk.CTkEntry(options_frame, textvariable=self.candidate_count_var, width=60)
+        self.candidate_count_entry.grid(row=0, column=2, sticky="w")
+        
         self.generate_alternatives_btn = ctk.CTkButton(frame, text="Generate Alternatives", command=self.generate_alternatives)
-        self.generate_alternatives_btn.grid(row=1, column=0, pady=10)
+        self.generate_alternatives_btn.grid(row=2, column=0, pady=10)
         
-        self.alternatives_area = ScrollableTextArea(frame, height=400, placeholder="Alternative prompts will appear here...")
-        self.alternatives_area.grid(row=2, column=0, sticky="ew", pady=10)
+        self.alternatives_list = VirtualList(frame, height=200, on_select=self.show_alternative,
+                                             placeholder="Alternative prompts will appear here...")
+        self.alternatives_list.grid(row=3, column=0, sticky="ew", pady=(10, 5))
         
-        frame.grid_rowconfigure(2, weight=1)
+        self.alternatives_area = ScrollableTextArea(frame, height=250, placeholder="Select an alternative to see it in full...")
+        self.alternatives_area.grid(row=4, column=0, sticky="nsew", pady=(5, 10))
+        
+        frame.grid_rowconfigure(4, weight=1)
     
     def setup_step7(self):
         frame = self.step7_tab
@@ -163,25 +207,139 @@ class WorkflowTabs(ctk.CTkTabview):
         ctk.CTkLabel(frame, text="Step 7: Select and Edit Final Prompt", 
                     font=ctk.CTkFont(size=14, weight="bold")).grid(row=0, column=0, pady=10, sticky="w")
         
-        ctk.CTkLabel(frame, text="Edit your final prompt:").grid(row=1, column=0, sticky="w", pady=5)
+        scoring_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        scoring_frame.grid(row=1, column=0, sticky="w", pady=5)
+        
+        self.score_alternatives_btn = ctk.CTkButton(scoring_frame, text="Score All Alternatives", command=self.score_alternatives)
+        self.score_alternatives_btn.grid(row=0, column=0, padx=(0, 10))
+        
+        self.auto_score_var = ctk.BooleanVar(value=False)
+        self.auto_score_checkbox = ctk.CTkCheckBox(scoring_frame, text="Score during Run All", variable=self.auto_score_var)
+        self.auto_score_checkbox.grid(row=0, column=1, padx=(0, 10))
+        
+        ctk.CTkLabel(scoring_frame, text="Use rank:").grid(row=0, column=2, padx=(0, 5))
+        self.rank_var = ctk.StringVar(value="")
+        self.rank_menu = ctk.CTkOptionMenu(scoring_frame, values=[""], variable=self.rank_var, command=self.select_ranked_candidate, width=80)
+        self.rank_menu.grid(row=0, column=3)
+        
+        self.optimize_btn = ctk.CTkButton(scoring_frame, text="Optimize", command=self.optimize_prompts)
+        self.optimize_btn.grid(row=1, column=0, padx=(0, 10), pady=(5, 0))
+        
+        ctk.CTkLabel(scoring_frame, text="Generations:").grid(row=1, column=1, sticky="e", padx=(0, 5), pady=(5, 0))
+        self.generations_var = ctk.StringVar(value="5")
+        self.generations_entry = ctk.CTkEntry(scoring_frame, textvariable=self.generations_var, width=60)
+        self.generations_entry.grid(row=1, column=2, sticky="w", pady=(5, 0))
+        
+        self.test_examples_btn = ctk.CTkButton(scoring_frame, text="Test on Examples", command=self.test_on_examples)
+        self.test_examples_btn.grid(row=2, column=0, padx=(0, 10), pady=(5, 0))
+        
+        self.optimizer_status = ctk.CTkLabel(scoring_frame, text="")
+        self.optimizer_status.grid(row=1, column=3, sticky="w", padx=(10, 0), pady=(5, 0))
+        
+        self.leaderboard_area = ScrollableTextArea(frame, height=150, placeholder="Scored alternatives will appear here, best first...")
+        self.leaderboard_area.grid(row=2, column=0, sticky="ew", pady=5)
+        
+        ctk.CTkLabel(frame, text="Edit your final prompt:").grid(row=3, column=0, sticky="w", pady=5)
         
         self.final_prompt_area = ScrollableTextArea(frame, height=300, placeholder="Edit your final prompt here...")
-        self.final_prompt_area.grid(row=2, column=0, sticky="ew", pady=10)
+        self.final_prompt_area.grid(row=4, column=0, sticky="ew", pady=10)
         
         self.save_final_btn = ctk.CTkButton(frame, text="Save Final Prompt", command=self.save_final_prompt)
-        self.save_final_btn.grid(row=3, column=0, pady=10)
+        self.save_final_btn.grid(row=5, column=0, pady=10)
         
-        frame.grid_rowconfigure(2, weight=1)
+        frame.grid_rowconfigure(4, weight=1)
+    
+    def setup_metrics(self):
+        frame = self.metrics_tab
+        frame.grid_columnconfigure(0, weight=1)
+        
+        ctk.CTkLabel(frame, text="Calls by step: latency, tokens and estimated cost",
+                    font=ctk.CTkFont(size=14, weight="bold")).grid(row=0, column=0, pady=10, sticky="w")
+        
+        self.metrics_area = ScrollableTextArea(frame, height=400, placeholder="Metrics appear once the workflow makes calls...")
+        self.metrics_area.textbox.configure(font=ctk.CTkFont(family="Courier", size=12), wrap="none")
+        self.metrics_area.grid(row=1, column=0, sticky="nsew", pady=5)
+        
+        button_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        button_frame.grid(row=2, column=0, sticky="w", pady=5)
+        ctk.CTkButton(button_frame, text="Export...", command=self.export_metrics).grid(row=0, column=0, padx=(0, 10))
+        ctk.CTkButton(button_frame, text="Reset", command=self.reset_metrics).grid(row=0, column=1)
+        
+        frame.grid_rowconfigure(1, weight=1)
+        self._metrics_shown = ""
+        self.after(1000, self.refresh_metrics)
+    
+    def refresh_metrics(self):
+        if self.workflow is not None and self.workflow.telemetry.records:
+            collector = self.workflow.telemetry
+            text = format_summary(collector.summary(), collector.totals())
+            # Only redraw on change so the table can be selected and scrolled
+            if text != self._metrics_shown:
+                self.metrics_area.set_text(text)
+                self._metrics_shown = text
+        self.after(1000, self.refresh_metrics)
+    
+    def export_metrics(self):
+        if not self.workflow:
+            messagebox.showerror("Error", "No workflow configured")
+            return
+        path = filedialog.asksaveasfilename(
+            title="Export metrics",
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json"), ("Prometheus text", "*.prom")]
+        )
+        if not path:
+            return
+        if path.endswith(".prom"):
+            self.workflow.telemetry.export_prometheus(path)
+        else:
+            self.workflow.telemetry.export_json(path)
+    
+    def reset_metrics(self):
+        if self.workflow:
+            self.workflow.telemetry.reset()
+        self._metrics_shown = ""
+        self.metrics_area.clear()
     
     def set_workflow(self, workflow: PromptBusterWorkflow):
         self.workflow = workflow
     
+    def load_session(self, session: PromptSession):
+        """Fill every step from a restored session"""
+        self.role_entry.delete(0, "end")
+        if session.role:
+            self.role_entry.insert(0, session.role)
+        
+        manual = session.examples[:len(self.example_inputs)]
+        for i, (input_widget, output_widget) in enumerate(zip(self.example_inputs, self.example_outputs)):
+            input_widget.delete("1.0", "end")
+            output_widget.delete("1.0", "end")
+            if i < len(manual):
+                input_widget.insert("1.0", manual[i].input_text)
+                output_widget.insert("1.0", manual[i].expected_output)
+        self.imported_examples = session.examples[len(manual):]
+        if self.imported_examples:
+            self.imported_examples_label.configure(text=f"{len(self.imported_examples)} more restored")
+        
+        self.initial_guide_area.set_text(session.prompt_guide)
+        self.generated_prompt_area.set_text(session.generated_prompt)
+        self.eval_guide_area.set_text(session.evaluation_guide)
+        self.evaluation_result_area.set_text(session.evaluation_result)
+        self.display_alternatives(session.alternative_prompts)
+        if session.scored_alternatives:
+            self.show_leaderboard(session.scored_alternatives, select_best=False)
+        self.final_prompt_area.set_text(session.final_prompt)
+    
     def set_enabled(self, enabled: bool):
         # Enable/disable all interactive elements
         widgets_to_toggle = [
-            self.role_entry, self.generate_guide_btn, self.generate_prompt_btn,
+            self.role_entry, self.generate_guide_btn, self.import_examples_btn, self.run_all_btn,
+            self.generate_prompt_btn,
             self.generate_eval_guide_btn, self.evaluate_prompt_btn,
-            self.generate_alternatives_btn, self.save_final_btn
+            self.generate_alternatives_btn, self.parallel_candidates_checkbox,
+            self.candidate_count_entry, self.score_alternatives_btn, self.auto_score_checkbox,
+            self.rank_menu, self.optimize_btn, self.generations_entry, self.test_examples_btn,
+            self.save_final_btn
         ]
         
         for widget in widgets_to_toggle:
@@ -190,20 +348,162 @@ class WorkflowTabs(ctk.CTkTabview):
         for input_widget in self.example_inputs + self.example_outputs:
             input_widget.configure(state="normal" if enabled else "disabled")
     
-    def run_async_task(self, coro, callback=None):
-        def run_in_thread():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+    def run_async_task(self, coro, callback=None, on_error=None):
+        def report_error(e):
+            if on_error:
+                on_error(e)
+            messagebox.showerror("Error", f"Task failed: {str(e)}")
+        
+        def on_done(future):
             try:
-                result = loop.run_until_complete(coro)
-                if callback:
-                    self.after(0, lambda: callback(result))
+                result = future.result()
             except Exception as e:
-                self.after(0, lambda: messagebox.showerror("Error", f"Task failed: {str(e)}"))
-            finally:
-                loop.close()
+                self.after(0, lambda: report_error(e))
+                return
+            if callback:
+                self.after(0, lambda: callback(result))
+        
+        future = self.runtime.submit(coro)
+        future.add_done_callback(on_done)
+        return future
+    
+    def run_streaming_task(self, stream, area: ScrollableTextArea, callback=None, on_error=None):
+        """Stream chunks into a text area and call callback with the full text"""
+        async def consume():
+            chunks = []
+            async for chunk in stream:
+                chunks.append(chunk)
+                area.queue_text(chunk)
+            return "".join(chunks)
+        
+        def on_complete(result):
+            area.stop_streaming()
+            if callback:
+                callback(result)
+        
+        def on_failure(e):
+            area.stop_streaming()
+            if on_error:
+                on_error(e)
+        
+        area.start_streaming()
+        return self.run_async_task(consume(), on_complete, on_failure)
+    
+    def collect_examples(self) -> List[Example]:
+        examples = []
+        for i in range(len(self.example_inputs)):
+            input_text = self.example_inputs[i].get("1.0", "end-1c").strip()
+            output_text = self.example_outputs[i].get("1.0", "end-1c").strip()
+            
+            if input_text and output_text:
+                examples.append(Example(input_text=input_text, expected_output=output_text))
+        return examples + self.imported_examples
+    
+    def import_examples(self):
+        if not self.workflow:
+            messagebox.showerror("Error", "No workflow configured")
+            return
+        
+        path = filedialog.askopenfilename(
+            title="Import examples",
+            filetypes=[("Examples", "*.csv *.jsonl *.json"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        
+        try:
+            examples, skipped = load_examples(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Could not read examples: {str(e)}")
+            return
+        
+        if not examples:
+            messagebox.showerror("Error", f"No examples with both an input and an expected output were found "
+                                          f"({len(skipped)} rows skipped)")
+            return
+        
+        budget = self.workflow.budget_for(WorkflowStep.PROMPT_GENERATION.value)
+        self.workflow.load_examples(examples, budget.examples_budget())
+        self.imported_examples = list(self.workflow.session.examples)
+        summary = (f"{len(examples)} imported: {len(self.imported_examples)} selected for prompting, "
+                   f"{len(self.workflow.session.holdout_examples)} held out for evaluation")
+        if skipped:
+            shown = ", ".join(str(number) for number in skipped[:10]) + (", ..." if len(skipped) > 10 else "")
+            summary += f"\n{len(skipped)} rows skipped for a missing input or output ({shown})"
+        self.imported_examples_label.configure(text=summary)
+    
+    def read_candidate_count(self) -> Optional[int]:
+        """Fan-out size for step 6, or None for the single-response mode"""
+        if not self.parallel_candidates_var.get():
+            return None
+        count = int(self.candidate_count_var.get())
+        if count < 1:
+            raise ValueError("Candidate count must be positive")
+        return count
+    
+    def display_alternatives(self, alternatives: List[str]):
+        """List the candidates and show the first in full; only rows in view are drawn"""
+        self.alternatives_list.set_items(alternatives, [f"Alternative {i + 1}" for i in range(len(alternatives))])
+        if alternatives:
+            self.alternatives_list.select(0)
+        else:
+            self.alternatives_area.clear()
+    
+    def show_alternative(self, index: int):
+        self.alternatives_area.set_text(self.alternatives_list.items[index])
+    
+    def run_all_steps(self):
+        if not self.workflow:
+            messagebox.showerror("Error", "No workflow configured")
+            return
+        
+        role = self.role_entry.get().strip()
+        if not role:
+            messagebox.showerror("Error", "Please enter a role")
+            return
+        
+        examples = self.collect_examples()
+        if len(examples) < 3:
+            messagebox.showerror("Error", "Please provide at least 3 complete examples")
+            return
+        
+        try:
+            self.workflow.candidate_count = self.read_candidate_count()
+        except ValueError:
+            messagebox.showerror("Error", "Number of candidates must be a positive integer")
+            return
+        self.workflow.auto_score = self.auto_score_var.get()
+        
+        self.run_all_btn.configure(text="Running...", state="disabled")
+        
+        result_areas = {
+            WorkflowStep.INITIAL_PROMPT: self.initial_guide_area,
+            WorkflowStep.PROMPT_GENERATION: self.generated_prompt_area,
+            WorkflowStep.EVALUATION_GUIDE: self.eval_guide_area,
+            WorkflowStep.PROMPT_EVALUATION: self.evaluation_result_area,
+            WorkflowStep.FINAL_SELECTION: self.final_prompt_area,
+        }
+        
+        def show_step_result(step, result):
+            if step in result_areas:
+                result_areas[step].set_text(result)
+            elif step == WorkflowStep.IMPROVED_ALTERNATIVES:
+                self.display_alternatives(result)
+            if step == WorkflowStep.FINAL_SELECTION and self.workflow.session.scored_alternatives:
+                self.show_leaderboard(self.workflow.session.scored_alternatives, select_best=False)
+        
+        def on_step_complete(step, result):
+            # Called on the runtime thread; hand the update to Tk
+            self.after(0, lambda: show_step_result(step, result))
+        
+        def reset_button(*_):
+            self.run_all_btn.configure(text="Run All Steps", state="normal")
         
-        threading.Thread(target=run_in_thread, daemon=True).start()
+        self.run_async_task(
+            self.workflow.run_all(role, examples, on_step_complete=on_step_complete),
+            reset_button,
+            reset_button
+        )
     
     def generate_initial_guide(self):
         if not self.workflow:
@@ -218,26 +518,26 @@ class WorkflowTabs(ctk.CTkTabview):
         self.workflow.set_role(role)
         self.generate_guide_btn.configure(text="Generating...", state="disabled")
         
-        def on_complete(result):
-            self.initial_guide_area.set_text(result)
+        def reset_button(*_):
             self.generate_guide_btn.configure(text="Generate Prompt Guide", state="normal")
         
-        self.run_async_task(self.workflow.generate_initial_prompt_guide(role), on_complete)
+        def on_complete(result):
+            self.workflow.set_prompt_guide(result)
+            reset_button()
+        
+        self.run_streaming_task(
+            self.workflow.stream_initial_prompt_guide(role),
+            self.initial_guide_area,
+            on_complete,
+            reset_button
+        )
     
     def generate_prompt_from_examples(self):
         if not self.workflow:
             messagebox.showerror("Error", "No workflow configured")
             return
         
-        # Collect examples
-        examples = []
-        for i in range(5):
-            input_text = self.example_inputs[i].get("1.0", "end-1c").strip()
-            output_text = self.example_outputs[i].get("1.0", "end-1c").strip()
-            
-            if input_text and output_text:
-                examples.append(Example(input_text=input_text, expected_output=output_text))
-        
+        examples = self.collect_examples()
         if len(examples) < 3:
             messagebox.showerror("Error", "Please provide at least 3 complete examples")
             return
@@ -249,12 +549,19 @@ class WorkflowTabs(ctk.CTkTabview):
         
         self.generate_prompt_btn.configure(text="Generating...", state="disabled")
         
+        def reset_button(*_):
+            self.generate_prompt_btn.configure(text="Generate Prompt from Examples", state="normal")
+        
         def on_complete(result):
-            self.generated_prompt_area.set_text(result)
             self.workflow.set_generated_prompt(result)
-            self.generate_prompt_btn.configure(text="Generate Prompt from Examples", state="normal")
+            reset_button()
         
-        self.run_async_task(self.workflow.generate_prompt_from_examples(role, examples), on_complete)
+        self.run_streaming_task(
+            self.workflow.stream_prompt_from_examples(role, examples),
+            self.generated_prompt_area,
+            on_complete,
+            reset_button
+        )
     
     def generate_evaluation_guide(self):
         if not self.workflow:
@@ -268,12 +575,19 @@ class WorkflowTabs(ctk.CTkTabview):
         
         self.generate_eval_guide_btn.configure(text="Generating...", state="disabled")
         
+        def reset_button(*_):
+            self.generate_eval_guide_btn.configure(text="Generate Evaluation Guide", state="normal")
+        
         def on_complete(result):
-            self.eval_guide_area.set_text(result)
             self.workflow.set_evaluation_guide(result)
-            self.generate_eval_guide_btn.configure(text="Generate Evaluation Guide", state="normal")
+            reset_button()
         
-        self.run_async_task(self.workflow.generate_evaluation_guide(role), on_complete)
+        self.run_streaming_task(
+            self.workflow.stream_evaluation_guide(role),
+            self.eval_guide_area,
+            on_complete,
+            reset_button
+        )
     
     def evaluate_prompt(self):
         if not self.workflow:
@@ -290,17 +604,21 @@ class WorkflowTabs(ctk.CTkTabview):
         
         self.evaluate_prompt_btn.configure(text="Evaluating...", state="disabled")
         
+        def reset_button(*_):
+            self.evaluate_prompt_btn.configure(text="Evaluate Prompt", state="normal")
+        
         def on_complete(result):
-            self.evaluation_result_area.set_text(result)
             self.workflow.set_evaluation_result(result)
-            self.evaluate_prompt_btn.configure(text="Evaluate Prompt", state="normal")
+            reset_button()
         
-        self.run_async_task(
-            self.workflow.evaluate_prompt(
+        self.run_streaming_task(
+            self.workflow.stream_prompt_evaluation(
                 self.workflow.session.generated_prompt,
                 self.workflow.session.evaluation_guide
             ),
-            on_complete
+            self.evaluation_result_area,
+            on_complete,
+            reset_button
         )
     
     def generate_alternatives(self):
@@ -312,27 +630,198 @@ class WorkflowTabs(ctk.CTkTabview):
             messagebox.showerror("Error", "Please complete Step 5 first")
             return
         
+        try:
+            candidate_count = self.read_candidate_count()
+        except ValueError:
+            messagebox.showerror("Error", "Number of candidates must be a positive integer")
+            return
+        
         self.generate_alternatives_btn.configure(text="Generating...", state="disabled")
+        self.alternatives_list.clear()
         
-        def on_complete(alternatives):
-            result_text = "\n\n".join([f"Alternative {i+1}:\n{alt}" for i, alt in enumerate(alternatives)])
-            self.alternatives_area.set_text(result_text)
+        def reset_button(*_):
+            self.generate_alternatives_btn.configure(text="Generate Alternatives", state="normal")
+        
+        def show_alternatives(alternatives):
+            self.display_alternatives(alternatives)
             self.workflow.set_alternative_prompts(alternatives)
             
             # Pre-populate final prompt area with the first alternative
             if alternatives:
                 self.final_prompt_area.set_text(alternatives[0])
             
-            self.generate_alternatives_btn.configure(text="Generate Alternatives", state="normal")
+            reset_button()
+        
+        if candidate_count:
+            self.run_async_task(
+                self.workflow.generate_candidate_alternatives(
+                    self.workflow.session.generated_prompt,
+                    self.workflow.session.evaluation_result,
+                    candidate_count
+                ),
+                show_alternatives,
+                reset_button
+            )
+            return
         
-        self.run_async_task(
-            self.workflow.generate_improved_alternatives(
+        def on_complete(response):
+            show_alternatives(self.workflow.parse_alternatives(response))
+        
+        self.run_streaming_task(
+            self.workflow.stream_improved_alternatives(
                 self.workflow.session.generated_prompt,
                 self.workflow.session.evaluation_result
             ),
-            on_complete
+            self.alternatives_area,
+            on_complete,
+            reset_button
+        )
+    
+    def score_alternatives(self):
+        if not self.workflow:
+            messagebox.showerror("Error", "No workflow configured")
+            return
+        
+        if not self.workflow.session.alternative_prompts:
+            messagebox.showerror("Error", "Please complete Step 6 first")
+            return
+        
+        if not self.workflow.session.evaluation_guide:
+            messagebox.showerror("Error", "Please complete Step 4 first")
+            return
+        
+        self.score_alternatives_btn.configure(text="Scoring...", state="disabled")
+        
+        def reset_button(*_):
+            self.score_alternatives_btn.configure(text="Score All Alternatives", state="normal")
+        
+        def on_complete(scored):
+            self.workflow.set_scored_alternatives(scored)
+            self.show_leaderboard(scored)
+            reset_button()
+        
+        self.run_async_task(
+            self.workflow.score_candidates(
+                self.workflow.session.alternative_prompts,
+                self.workflow.session.evaluation_guide
+            ),
+            on_complete,
+            reset_button
         )
     
+    def optimize_prompts(self):
+        if not self.workflow:
+            messagebox.showerror("Error", "No workflow configured")
+            return
+        
+        if not self.workflow.session.evaluation_guide:
+            messagebox.showerror("Error", "Please complete Step 4 first")
+            return
+        
+        if not (self.workflow.session.generated_prompt or self.workflow.session.alternative_prompts):
+            messagebox.showerror("Error", "Please complete Step 3 first")
+            return
+        
+        try:
+            generations = int(self.generations_var.get())
+            if generations < 1:
+                raise ValueError
+            candidates_per_parent = self.read_candidate_count() or 4
+        except ValueError:
+            messagebox.showerror("Error", "Generations and candidates must be positive integers")
+            return
+        
+        self.optimize_btn.configure(text="Optimizing...", state="disabled")
+        
+        def show_round(round_result):
+            score = f"{round_result.best_score:.1f}" if round_result.best_score is not None else "n/a"
+            self.optimizer_status.configure(text=f"Generation {round_result.generation}: best {score}")
+            self.workflow.set_scored_alternatives(round_result.beam)
+            self.show_leaderboard(round_result.beam, select_best=False)
+            self.record_revision(f"optimizer generation {round_result.generation}")
+        
+        def on_round(round_result):
+            self.after(0, lambda: show_round(round_result))
+        
+        def reset_button(*_):
+            self.optimize_btn.configure(text="Optimize", state="normal")
+        
+        def on_complete(result):
+            self.optimizer_status.configure(text=f"Stopped: {result.stopped_reason}")
+            self.record_revision("optimizer result")
+            self.show_leaderboard(self.workflow.session.scored_alternatives)
+            self.display_alternatives(self.workflow.session.alternative_prompts)
+            reset_button()
+        
+        optimizer = PromptOptimizer(
+            self.workflow,
+            generations=generations,
+            candidates_per_parent=candidates_per_parent,
+            on_round=on_round
+        )
+        self.run_async_task(optimizer.run(), on_complete, reset_button)
+    
+    def test_on_examples(self):
+        if not self.workflow:
+            messagebox.showerror("Error", "No workflow configured")
+            return
+        
+        session = self.workflow.session
+        candidates = [candidate.prompt for candidate in session.scored_alternatives] or session.alternative_prompts
+        if not candidates and session.generated_prompt:
+            candidates = [session.generated_prompt]
+        if not candidates:
+            messagebox.showerror("Error", "Please complete Step 3 or Step 6 first")
+            return
+        
+        # With a held-out split, measure_fidelity() tests on the examples the prompt wasn't written from
+        examples = None if session.holdout_examples else self.collect_examples() or None
+        if not (examples or session.examples):
+            messagebox.showerror("Error", "Please provide examples in Step 2")
+            return
+        
+        self.test_examples_btn.configure(text="Testing...", state="disabled")
+        
+        def reset_button(*_):
+            self.test_examples_btn.configure(text="Test on Examples", state="normal")
+        
+        def on_complete(reports):
+            self.workflow.set_fidelity_reports(reports)
+            legend = "\n".join(f"#{i + 1}: {report.prompt[:80]}" for i, report in enumerate(reports))
+            self.leaderboard_area.set_text(format_matrix(reports) + "\n\n" + legend)
+            reset_button()
+        
+        self.run_async_task(self.workflow.measure_fidelity(candidates, examples), on_complete, reset_button)
+    
+    def show_leaderboard(self, scored, select_best: bool = True):
+        lines = []
+        for rank, candidate in enumerate(scored, start=1):
+            score = f"{candidate.score:.1f}" if candidate.score is not None else "n/a"
+            lines.append(f"#{rank}  score {score}\n{candidate.prompt}")
+        self.leaderboard_area.set_text("\n\n".join(lines))
+        
+        ranks = [str(rank) for rank in range(1, len(scored) + 1)] or [""]
+        self.rank_menu.configure(values=ranks)
+        self.rank_var.set(ranks[0])
+        if select_best and scored:
+            self.final_prompt_area.set_text(scored[0].prompt)
+    
+    def select_ranked_candidate(self, rank: str):
+        if not self.workflow or not rank:
+            return
+        scored = self.workflow.session.scored_alternatives
+        index = int(rank) - 1
+        if 0 <= index < len(scored):
+            self.final_prompt_area.set_text(scored[index].prompt)
+    
+    def record_revision(self, label: str):
+        """Keep the session's current state in its saved history, so optimizer runs leave a lineage"""
+        if self.session_store is None or not self.workflow:
+            return
+        session = self.workflow.session
+        self.session_store.record_revision(session.role or "untitled", session,
+                                           self.workflow.llm_provider.config.model, label)
+    
     def save_final_prompt(self):
         if not self.workflow:
             messagebox.showerror("Error", "No workflow configured")
@@ -344,6 +833,12 @@ class WorkflowTabs(ctk.CTkTabview):
             return
         
         self.workflow.set_final_prompt(final_prompt)
+        if self.session_store is not None:
+            # Saving under the role keeps each save as a revision of the same session
+            session = self.workflow.session
+            self.session_store.save(session.role or "untitled", session, self.workflow.llm_provider.config.model)
+            if self.on_session_saved:
+                self.on_session_saved(session)
         messagebox.showinfo("Success", "Final prompt saved successfully!")
         
         # Optionally save to file or clipboard
@@ -1,13 +1,22 @@
 #!/usr/bin/env python3
 """
 PromptBuster - A tool for systematically improving prompts using LLM feedback.
+
+Run without arguments to launch the GUI, or with a subcommand (e.g.
+``python main.py batch jobs.jsonl -o results.jsonl``) for headless mode.
 """
 
-import customtkinter as ctk
-from gui.main_window import MainWindow
+import sys
 
 
 def main():
+    if len(sys.argv) > 1:
+        from cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+    
+    import customtkinter as ctk
+    from gui.main_window import MainWindow
+    
     ctk.set_appearance_mode("dark")
     ctk.set_default_color_theme("blue")
     
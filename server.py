@@ -0,0 +1,213 @@
+"""
+HTTP service exposing the PromptBuster workflow.
+"""
+
+import asyncio
+import json
+from typing import Any, Optional
+
+from aiohttp import web
+from pydantic import ValidationError
+
+from core.jobs import Job, JobQueue
+from core.cache import ResponseCache
+from core.llm_providers import BaseLLMProvider, create_provider
+from core.models import LLMConfig, RunRequest, StepRequest, WorkflowStep
+from core.telemetry import REGISTRY
+from core.workflow import PromptBusterWorkflow, rank_candidates
+
+PROVIDER_KEY = web.AppKey("provider", BaseLLMProvider)
+CONFIG_KEY = web.AppKey("config", LLMConfig)
+QUEUE_KEY = web.AppKey("queue", JobQueue)
+
+
+async def stream_into(job: Job, stream) -> str:
+    """Forward each streamed chunk as a job event and return the full text"""
+    parts = []
+    async for chunk in stream:
+        parts.append(chunk)
+        job.emit("chunk", chunk)
+    return "".join(parts)
+
+
+async def run_step(workflow: PromptBusterWorkflow, step: WorkflowStep, request: StepRequest, job: Job) -> Any:
+    if step == WorkflowStep.INITIAL_PROMPT:
+        return await stream_into(job, workflow.stream_initial_prompt_guide(request.role))
+    if step == WorkflowStep.PROMPT_GENERATION:
+        return await stream_into(job, workflow.stream_prompt_from_examples(request.role, request.examples))
+    if step == WorkflowStep.EVALUATION_GUIDE:
+        return await stream_into(job, workflow.stream_evaluation_guide(request.role))
+    if step == WorkflowStep.PROMPT_EVALUATION:
+        return await stream_into(job, workflow.stream_prompt_evaluation(request.prompt, request.evaluation_guide))
+    if step == WorkflowStep.IMPROVED_ALTERNATIVES:
+        response = await stream_into(job, workflow.stream_improved_alternatives(request.prompt, request.evaluation))
+        return workflow.parse_alternatives(response)
+    if step == WorkflowStep.FINAL_SELECTION:
+        scored = await workflow.score_candidates(request.candidates, request.evaluation_guide)
+        return [candidate.model_dump() for candidate in rank_candidates(scored)]
+    raise ValueError(f"Step {step.value} has no endpoint")
+
+
+def job_response(job: Job, status: int = 202) -> web.Response:
+    return web.json_response({
+        "id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events"
+    }, status=status)
+
+
+async def read_body(request: web.Request, model):
+    try:
+        return model.model_validate(await request.json())
+    except (json.JSONDecodeError, ValidationError) as e:
+        raise web.HTTPBadRequest(text=json.dumps({"error": str(e)}), content_type="application/json")
+
+
+def enqueue(request: web.Request, kind: str, func) -> Job:
+    try:
+        return request.app[QUEUE_KEY].submit(kind, func)
+    except asyncio.QueueFull:
+        raise web.HTTPServiceUnavailable(
+            text=json.dumps({"error": "Job queue is full"}),
+            content_type="application/json",
+            headers={"Retry-After": "1"}
+        )
+
+
+async def respond(request: web.Request, job: Job) -> web.Response:
+    # ?wait=1 holds the connection until the job finishes
+    if request.query.get("wait") in ("1", "true"):
+        status = await job.wait()
+        return web.json_response(status.model_dump(mode="json"))
+    return job_response(job)
+
+
+def new_workflow(app: web.Application) -> PromptBusterWorkflow:
+    # A workflow per job keeps sessions apart while sharing one provider and connection pool
+    return PromptBusterWorkflow(app[CONFIG_KEY], llm_provider=app[PROVIDER_KEY])
+
+
+async def post_step(request: web.Request) -> web.Response:
+    try:
+        step = WorkflowStep(request.match_info["step"])
+    except ValueError:
+        raise web.HTTPNotFound(text=json.dumps({"error": "Unknown step"}), content_type="application/json")
+    if step == WorkflowStep.EXAMPLES_INPUT:
+        raise web.HTTPNotFound(text=json.dumps({"error": "Step takes no LLM call"}), content_type="application/json")
+    body = await read_body(request, StepRequest)
+    workflow = new_workflow(request.app)
+    
+    async def run(job: Job):
+        return await run_step(workflow, step, body, job)
+    
+    return await respond(request, enqueue(request, step.value, run))
+
+
+async def post_run(request: web.Request) -> web.Response:
+    body = await read_body(request, RunRequest)
+    workflow = new_workflow(request.app)
+    workflow.candidate_count = body.candidate_count
+    workflow.auto_score = body.auto_score
+    
+    async def run(job: Job):
+        workflow.set_role(body.role)
+        if body.example_token_budget:
+            workflow.load_examples(body.examples, body.example_token_budget)
+        else:
+            workflow.set_examples(body.examples)
+        
+        def on_step_complete(step: WorkflowStep, result: Any):
+            job.emit("step", {"step": step.value, "result": to_json(result)})
+        
+        session = await workflow.run_all(steps=body.steps, on_step_complete=on_step_complete)
+        return session.model_dump(mode="json")
+    
+    return await respond(request, enqueue(request, "run", run))
+
+
+def to_json(value: Any) -> Any:
+    if isinstance(value, list):
+        return [to_json(item) for item in value]
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return value
+
+
+def find_job(request: web.Request) -> Job:
+    job = request.app[QUEUE_KEY].get(request.match_info["job_id"])
+    if job is None:
+        raise web.HTTPNotFound(text=json.dumps({"error": "Unknown job"}), content_type="application/json")
+    return job
+
+
+async def get_job(request: web.Request) -> web.Response:
+    return web.json_response(find_job(request).snapshot().model_dump(mode="json"))
+
+
+async def list_jobs(request: web.Request) -> web.Response:
+    jobs = request.app[QUEUE_KEY].jobs.values()
+    return web.json_response([
+        {"id": job.id, "kind": job.kind, "status": job.status, "created_at": job.created_at} for job in jobs
+    ])
+
+
+async def cancel_job(request: web.Request) -> web.Response:
+    job = find_job(request)
+    cancelled = request.app[QUEUE_KEY].cancel(job.id)
+    return web.json_response({"id": job.id, "cancelled": cancelled})
+
+
+async def job_events(request: web.Request) -> web.StreamResponse:
+    """Server-sent events: replays the job's events so far, then follows it to the end"""
+    job = find_job(request)
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    await response.prepare(request)
+    async for event in job.follow():
+        payload = json.dumps(event["data"], ensure_ascii=False)
+        await response.write(f"event: {event['event']}\ndata: {payload}\n\n".encode("utf-8"))
+    await response.write_eof()
+    return response
+
+
+async def health(request: web.Request) -> web.Response:
+    queue = request.app[QUEUE_KEY]
+    return web.json_response({"status": "ok", "queued": queue.pending, "running": queue.running})
+
+
+async def metrics(request: web.Request) -> web.Response:
+    """Per-step call counts, latency, tokens and cost in the Prometheus text format"""
+    return web.Response(body=REGISTRY.prometheus_text().encode(),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+def create_app(config: LLMConfig, provider: Optional[BaseLLMProvider] = None,
+               cache: Optional[ResponseCache] = None, workers: int = 4, max_pending: int = 100) -> web.Application:
+    """Build the service; without ``provider`` one is created on startup and closed on shutdown"""
+    app = web.Application()
+    app[CONFIG_KEY] = config
+    app[QUEUE_KEY] = JobQueue(workers, max_pending)
+    
+    async def lifecycle(app: web.Application):
+        app[PROVIDER_KEY] = provider or create_provider(config, cache=cache)
+        app[QUEUE_KEY].start()
+        await app[PROVIDER_KEY].warm_up()
+        yield
+        await app[QUEUE_KEY].stop()
+        if provider is None:
+            await app[PROVIDER_KEY].aclose()
+    
+    app.cleanup_ctx.append(lifecycle)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_post("/steps/{step}", post_step)
+    app.router.add_post("/runs", post_run)
+    app.router.add_get("/jobs", list_jobs)
+    app.router.add_get("/jobs/{job_id}", get_job)
+    app.router.add_delete("/jobs/{job_id}", cancel_job)
+    app.router.add_get("/jobs/{job_id}/events", job_events)
+    return app
@@ -0,0 +1,70 @@
+import asyncio
+import itertools
+from types import SimpleNamespace
+from typing import Callable, List, Optional, Union
+import pytest
+from core.llm_providers import BaseLLMProvider
+from core.models import LLMConfig, LLMProvider
+
+_models = itertools.count()
+
+
+class StatusError(Exception):
+    """An HTTP error shaped like the SDKs': a status code plus a response with headers"""
+    
+    def __init__(self, status_code: int, headers: Optional[dict] = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+Reply = Union[str, BaseException, Callable[[int, str, Optional[str]], str]]
+
+
+class FakeProvider(BaseLLMProvider):
+    """Answers from a script of replies and records every call.
+
+    A reply is a string, an exception to raise, or a function of (call
+    index, prompt, system prompt). The last reply repeats once the script
+    runs out; ``delay`` seconds pass before each reply.
+    """
+    
+    def __init__(self, config: LLMConfig, replies: Optional[List[Reply]] = None, delay: float = 0.0):
+        super().__init__(config)
+        self.replies = replies or ["ok"]
+        self.delay = delay
+        self.calls: List[tuple] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+    
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        index = len(self.calls)
+        self.calls.append((prompt, system_prompt, max_tokens))
+        reply = self.replies[min(index, len(self.replies) - 1)]
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            delay = self.delay(index) if callable(self.delay) else self.delay
+            if delay:
+                await asyncio.sleep(delay)
+        finally:
+            self.in_flight -= 1
+        if isinstance(reply, BaseException):
+            raise reply
+        if callable(reply):
+            return reply(index, prompt, system_prompt)
+        return reply
+
+
+def make_config(**overrides) -> LLMConfig:
+    # Rate limiters are shared per model, so every config gets a model of its own
+    fields = {"provider": LLMProvider.LOCAL, "model": f"test-model-{next(_models)}",
+              "base_url": "http://127.0.0.1:9"}
+    fields.update(overrides)
+    return LLMConfig(**fields)
+
+
+@pytest.fixture
+def config() -> LLMConfig:
+    return make_config()
@@ -0,0 +1,79 @@
+import pytest
+from config.autosave import SessionJournal
+from core.models import PromptSession
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = SessionJournal(tmp_path, compact_every=3)
+    yield journal
+    journal.close()
+
+
+def recover_after_crash(journal: SessionJournal) -> PromptSession:
+    # A fresh journal reads what a crashed process left on disk
+    journal.flush()
+    return SessionJournal(journal.directory).recover()
+
+
+def test_nothing_to_recover_from_an_empty_session(journal):
+    journal.start(PromptSession())
+    assert recover_after_crash(journal) is None
+
+
+def test_updates_survive_a_crash(journal):
+    journal.start(PromptSession())
+    journal.record("role", "support agent")
+    journal.record("generated_prompt", "You answer billing questions")
+    recovered = recover_after_crash(journal)
+    assert recovered.role == "support agent"
+    assert recovered.generated_prompt == "You answer billing questions"
+
+
+def test_compaction_keeps_every_update(journal):
+    journal.start(PromptSession())
+    for index in range(7):
+        journal.record("alternative_prompts", [f"candidate {i}" for i in range(index + 1)])
+    journal.record("role", "support agent")
+    recovered = recover_after_crash(journal)
+    assert len(recovered.alternative_prompts) == 7
+    assert recovered.role == "support agent"
+
+
+def test_a_torn_last_line_is_ignored(journal):
+    journal.start(PromptSession())
+    journal.record("role", "support agent")
+    journal.flush()
+    with open(journal.journal_file, "a", encoding="utf-8") as f:
+        f.write('{"field": "role", "val')
+    assert SessionJournal(journal.directory).recover().role == "support agent"
+
+
+def test_edits_after_a_save_recover_the_whole_session(journal):
+    journal.start(PromptSession())
+    journal.record("role", "support agent")
+    saved = PromptSession(role="support agent", generated_prompt="You answer billing questions")
+    journal.start(saved)
+    journal.record("final_prompt", "Answer billing questions briefly")
+    recovered = recover_after_crash(journal)
+    assert recovered == saved.model_copy(update={"final_prompt": "Answer billing questions briefly"})
+
+
+def test_reset_leaves_nothing_to_recover(journal):
+    journal.start(PromptSession(role="support agent"))
+    journal.reset()
+    assert recover_after_crash(journal) is None
+
+
+def test_start_without_a_session_continues_from_disk(tmp_path):
+    first = SessionJournal(tmp_path).start(PromptSession(role="support agent"))
+    first.record("final_prompt", "Answer briefly")
+    first.close()
+    second = SessionJournal(tmp_path).start()
+    second.record("generated_prompt", "You answer billing questions")
+    try:
+        recovered = recover_after_crash(second)
+    finally:
+        second.close()
+    assert (recovered.role, recovered.final_prompt) == ("support agent", "Answer briefly")
+    assert recovered.generated_prompt == "You answer billing questions"
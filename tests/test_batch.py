@@ -0,0 +1,58 @@
+import asyncio
+import json
+import pytest
+from core.batch import BatchRunner, read_completed_ids, read_jobs
+from core.models import BatchJob, Example
+from .conftest import FakeProvider
+
+ALTERNATIVES = "1. First rewrite\n2. Second rewrite\n3. Third rewrite"
+
+
+def make_jobs(count: int):
+    return [BatchJob(id=f"job-{i}", role=f"role {i}", examples=[Example(input_text="2 + 2", expected_output="4")])
+            for i in range(count)]
+
+
+def run(runner: BatchRunner, jobs, output_path, resume: bool = True) -> dict:
+    # A hang fails the test instead of blocking the suite
+    return asyncio.run(asyncio.wait_for(runner.run(jobs, output_path, resume), timeout=10))
+
+
+def test_results_are_written_and_completed_jobs_skipped_on_rerun(config, tmp_path):
+    output = tmp_path / "results.jsonl"
+    runner = BatchRunner(config, concurrency=3, llm_provider=FakeProvider(config, [ALTERNATIVES]))
+    assert run(runner, make_jobs(5), output) == {"ok": 5, "error": 0, "skipped": 0}
+    assert read_completed_ids(output) == {f"job-{i}" for i in range(5)}
+    assert run(runner, make_jobs(7), output) == {"ok": 2, "error": 0, "skipped": 5}
+    assert run(runner, make_jobs(2), output, resume=False) == {"ok": 2, "error": 0, "skipped": 0}
+    assert len(output.read_text(encoding="utf-8").splitlines()) == 2
+
+
+def test_failed_jobs_are_recorded_and_rerun(config, tmp_path):
+    output = tmp_path / "results.jsonl"
+    jobs = make_jobs(2) + [BatchJob(id="no-examples", role="testers")]
+    runner = BatchRunner(config, concurrency=2, llm_provider=FakeProvider(config, [ALTERNATIVES]))
+    assert run(runner, jobs, output) == {"ok": 2, "error": 1, "skipped": 0}
+    assert "no-examples" not in read_completed_ids(output)
+
+
+def test_a_failing_sink_stops_the_run(config, tmp_path):
+    def on_result(result):
+        raise OSError("disk full")
+    
+    runner = BatchRunner(config, concurrency=2, llm_provider=FakeProvider(config, [ALTERNATIVES]), on_result=on_result)
+    # Used to hang: with every worker dead, the producer waited on a full queue forever
+    with pytest.raises(OSError, match="disk full"):
+        run(runner, make_jobs(20), tmp_path / "results.jsonl")
+
+
+def test_reading_jobs_and_partial_results(tmp_path):
+    jobs_path = tmp_path / "jobs.jsonl"
+    jobs_path.write_text('{"role": "authors"}\n\n{"id": 7, "role": "editors"}\n', encoding="utf-8")
+    assert [(job.id, job.role) for job in read_jobs(jobs_path)] == [("1", "authors"), ("7", "editors")]
+    
+    results = tmp_path / "results.jsonl"
+    results.write_text(json.dumps({"id": "1", "status": "ok"}) + "\n" + json.dumps({"id": "2", "status": "error"})
+                       + '\n{"id": "3", "sta', encoding="utf-8")
+    assert read_completed_ids(results) == {"1"}
+    assert read_completed_ids(tmp_path / "missing.jsonl") == set()
@@ -0,0 +1,75 @@
+import json
+import threading
+import pytest
+from core.batch_pool import ProcessBatchRunner, _share
+from core.models import BatchJob, Example, ModelRoute, RetryPolicy, RoutingPolicy
+from .conftest import make_config
+
+
+def jobs(count: int, error: bool = False):
+    for i in range(count):
+        yield BatchJob(id=f"job-{i}", role="testers", examples=[Example(input_text="q", expected_output="a")])
+    if error:
+        raise RuntimeError("malformed job")
+
+
+def run_with_timeout(runner: ProcessBatchRunner, *args, timeout: float = 60.0):
+    """Run in a thread so a hang fails the test instead of the whole suite"""
+    outcome = {}
+    
+    def target():
+        try:
+            outcome["summary"] = runner.run(*args)
+        except BaseException as e:
+            outcome["error"] = e
+    
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "ProcessBatchRunner.run() did not return"
+    return outcome
+
+
+@pytest.fixture
+def unreachable():
+    # Nothing listens on port 9, so every job fails fast without a server
+    return make_config(retry=RetryPolicy(max_retries=0, timeout=5))
+
+
+def test_limits_are_split_between_processes():
+    assert _share(None, 4) is None
+    assert _share(100, 4) == 25
+    assert _share(3, 4) == 1
+
+
+def test_worker_config_splits_rate_limits_and_budget():
+    config = make_config(requests_per_minute=60, tokens_per_minute=90000, routing=RoutingPolicy(
+        routes=[ModelRoute(model="small", requests_per_minute=30)], budget_usd=3.0))
+    worker = ProcessBatchRunner(config, processes=3).worker_config()
+    assert worker.requests_per_minute == 20
+    assert worker.tokens_per_minute == 30000
+    assert worker.routing.routes[0].requests_per_minute == 10
+    assert worker.routing.budget_usd == pytest.approx(1.0)
+
+
+def test_every_job_gets_a_result_line(tmp_path, unreachable):
+    output = tmp_path / "results.jsonl"
+    outcome = run_with_timeout(ProcessBatchRunner(unreachable, processes=2, concurrency=2), jobs(4), output, False)
+    assert outcome["summary"] == {"ok": 0, "error": 4, "skipped": 0}
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(line["id"] for line in lines) == [f"job-{i}" for i in range(4)]
+
+
+def test_resume_skips_completed_jobs(tmp_path, unreachable):
+    output = tmp_path / "results.jsonl"
+    output.write_text(json.dumps({"id": "job-0", "status": "ok"}) + "\n")
+    outcome = run_with_timeout(ProcessBatchRunner(unreachable, processes=1), jobs(2), output, True)
+    assert outcome["summary"] == {"ok": 0, "error": 1, "skipped": 1}
+
+
+def test_failing_job_iterator_ends_the_run_and_is_raised(tmp_path, unreachable):
+    output = tmp_path / "results.jsonl"
+    outcome = run_with_timeout(ProcessBatchRunner(unreachable, processes=2), jobs(3, error=True), output, False)
+    assert isinstance(outcome.get("error"), RuntimeError)
+    # Jobs queued before the failure still finish and are recorded
+    assert len(output.read_text().splitlines()) == 3
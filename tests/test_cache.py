@@ -0,0 +1,113 @@
+import asyncio
+from core.cache import CachedProvider, ResponseCache, fresh_responses
+from core.llm_providers import note_truncated
+from core.telemetry import TelemetryCollector, TelemetryProvider, bind
+from .conftest import FakeProvider
+
+
+def cached_provider(config, tmp_path, replies=None, **cache_options):
+    fake = FakeProvider(config, replies or [lambda index, prompt, system_prompt: f"reply {index}"])
+    return CachedProvider(fake, ResponseCache(tmp_path, **cache_options)), fake
+
+
+def generate_all(provider, *requests):
+    async def calls():
+        return [await provider.generate(*request) for request in requests]
+    
+    return asyncio.run(calls())
+
+
+def test_entries_outlive_the_process_memory(tmp_path):
+    cache = ResponseCache(tmp_path, max_memory_entries=1)
+    cache.put("a" * 64, "first")
+    cache.put("b" * 64, "second")
+    assert list(cache._memory) == ["b" * 64]
+    assert cache.get("a" * 64) == "first"
+    assert ResponseCache(tmp_path).get("b" * 64) == "second"
+    assert cache.get("c" * 64) is None
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    ResponseCache(tmp_path).put("a" * 64, "old")
+    assert ResponseCache(tmp_path, ttl_seconds=-1).get("a" * 64) is None
+    assert ResponseCache(tmp_path).get("a" * 64) is None
+
+
+def test_disk_store_is_trimmed_to_its_limit(tmp_path):
+    cache = ResponseCache(tmp_path, max_disk_bytes=500)
+    for index in range(20):
+        cache.put(f"{index:064d}", "x" * 100)
+    assert sum(path.stat().st_size for path in tmp_path.glob("*/*.json")) <= 500
+    cache.clear()
+    assert not list(tmp_path.glob("*/*.json"))
+
+
+def test_keys_depend_on_the_whole_request():
+    key = ResponseCache.make_key({"model": "a"}, "prompt", "system")
+    assert key == ResponseCache.make_key({"model": "a"}, "prompt", "system")
+    assert key != ResponseCache.make_key({"model": "b"}, "prompt", "system")
+    assert key != ResponseCache.make_key({"model": "a"}, "prompt", None)
+
+
+def test_repeated_requests_are_served_from_the_cache(config, tmp_path):
+    provider, fake = cached_provider(config, tmp_path)
+    replies = generate_all(provider, ("hi",), ("hi",), ("hi", None, 50), ("hi", "be brief"))
+    assert replies == ["reply 0", "reply 0", "reply 1", "reply 2"]
+    assert len(fake.calls) == 3
+
+
+def test_bypass_and_disabled_caches_call_the_provider(config, tmp_path):
+    provider, fake = cached_provider(config, tmp_path, enabled=False)
+    assert generate_all(provider, ("hi",), ("hi",)) == ["reply 0", "reply 1"]
+    provider, fake = cached_provider(config, tmp_path / "bypass")
+    provider.bypass = True
+    assert generate_all(provider, ("hi",), ("hi",)) == ["reply 0", "reply 1"]
+
+
+def test_truncated_replies_are_not_cached(config, tmp_path):
+    def reply(index, prompt, system_prompt):
+        note_truncated()
+        return f"cut off {index}"
+    
+    cached, fake = cached_provider(config, tmp_path, [reply])
+    provider = TelemetryProvider(cached)
+    assert generate_all(provider, ("hi",), ("hi",)) == ["cut off 0", "cut off 1"]
+
+
+def test_cache_hits_are_recorded_and_cost_nothing(config, tmp_path):
+    cached, _ = cached_provider(config, tmp_path)
+    provider = TelemetryProvider(cached)
+    collector = TelemetryCollector()
+    
+    async def calls():
+        bind("candidate", collector)
+        return [await provider.generate("hi") for _ in range(2)]
+    
+    asyncio.run(calls())
+    first, second = collector.records
+    assert (first.cache_hit, second.cache_hit) == (False, True)
+    assert second.input_tokens == second.output_tokens == 0
+
+
+def test_streams_are_cached_whole(config, tmp_path):
+    provider, fake = cached_provider(config, tmp_path)
+    
+    async def collect():
+        return [[chunk async for chunk in provider.stream("hi")] for _ in range(2)]
+    
+    assert asyncio.run(collect()) == [["reply 0"], ["reply 0"]]
+    assert len(fake.calls) == 1
+
+
+def test_fresh_responses_go_around_the_cache_only_inside_the_block(config, tmp_path):
+    provider, fake = cached_provider(config, tmp_path)
+    
+    async def calls():
+        replies = [await provider.generate("hi")]
+        with fresh_responses():
+            # Tasks started inside the block inherit it
+            replies += await asyncio.gather(provider.generate("hi"), provider.generate("hi"))
+        replies.append(await provider.generate("hi"))
+        return replies
+    
+    assert asyncio.run(calls()) == ["reply 0", "reply 1", "reply 2", "reply 0"]
@@ -0,0 +1,88 @@
+import json
+import pytest
+from core.examples import (deduplicate_examples, example_tokens, load_examples, prepare_examples, select_diverse,
+                           split_holdout)
+from core.models import Example
+
+
+def numbered_examples(count: int) -> list:
+    topics = ["refunds", "invoices", "shipping", "passwords", "upgrades", "cancellations", "receipts", "coupons"]
+    return [Example(input_text=f"Question {i} about {topics[i % len(topics)]} for account {i * 7}",
+                    expected_output=f"Answer {i} explaining {topics[i % len(topics)]} step by step")
+            for i in range(count)]
+
+
+def test_csv_with_a_byte_order_mark(tmp_path):
+    path = tmp_path / "examples.csv"
+    path.write_bytes("\ufeffinput,output\n2 + 2,4\n3 + 3,\n\"multi\nline\",ok\n".encode("utf-8"))
+    examples, skipped = load_examples(path)
+    assert examples == [Example(input_text="2 + 2", expected_output="4"),
+                        Example(input_text="multi\nline", expected_output="ok")]
+    assert skipped == [3]
+
+
+def test_jsonl_accepts_alternative_keys_and_reports_skipped_lines(tmp_path):
+    path = tmp_path / "examples.jsonl"
+    lines = [{"prompt": " Hi ", "completion": "Hello"}, {"question": "Why?"},
+             {"input_text": "a", "expected_output": "b"}]
+    path.write_text("\n".join(json.dumps(line) for line in lines[:2]) + "\n\n" + json.dumps(lines[2]) + "\n",
+                    encoding="utf-8")
+    examples, skipped = load_examples(path)
+    assert [(ex.input_text, ex.expected_output) for ex in examples] == [("Hi", "Hello"), ("a", "b")]
+    assert skipped == [2]
+
+
+def test_json_records_must_be_objects(tmp_path):
+    path = tmp_path / "examples.json"
+    path.write_text(json.dumps([{"input": "a", "output": "b"}, "just text"]), encoding="utf-8")
+    with pytest.raises(ValueError, match="Item 2"):
+        load_examples(path)
+    path.write_text(json.dumps({"input": "a", "output": "b"}), encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_examples(path)
+    jsonl = tmp_path / "examples.jsonl"
+    jsonl.write_text('{"input": "a", "output": "b"}\n[1, 2]\n', encoding="utf-8")
+    with pytest.raises(ValueError, match="Line 2"):
+        load_examples(jsonl)
+
+
+def test_deduplicate_drops_exact_and_near_duplicates():
+    base = Example(input_text="How do I reset my password on the mobile app today",
+                   expected_output="Open settings, choose security and tap reset password")
+    shouting = Example(input_text=base.input_text.upper(), expected_output=base.expected_output + "!")
+    near = Example(input_text=base.input_text, expected_output=base.expected_output + " again")
+    other = Example(input_text="Where is my invoice", expected_output="Under billing history")
+    assert deduplicate_examples([base, shouting, near, other]) == [base, other]
+
+
+def test_selection_fits_the_token_budget():
+    examples = numbered_examples(40)
+    budget = sum(example_tokens(ex) for ex in examples[:5])
+    selected = select_diverse(examples, budget)
+    assert selected
+    assert sum(example_tokens(ex) for ex in selected) <= budget
+    assert len(select_diverse(examples, 10 ** 6, max_examples=3)) == 3
+    assert select_diverse([], 1000) == []
+
+
+def test_selection_prefers_variety():
+    examples = numbered_examples(16)
+    selected = select_diverse(examples, 10 ** 6, max_examples=8)
+    # Eight topics, so the first eight picks cover all of them
+    assert len({ex.expected_output.split()[3] for ex in selected}) == 8
+
+
+def test_holdout_split_is_deterministic_and_disjoint():
+    examples = numbered_examples(10)
+    pool, holdout = split_holdout(examples, 0.2, seed=1)
+    assert (pool, holdout) == split_holdout(examples, 0.2, seed=1)
+    assert len(holdout) == 2
+    assert sorted(pool + holdout, key=examples.index) == examples
+    assert split_holdout(examples[:1]) == (examples[:1], [])
+
+
+def test_prepare_never_prompts_with_held_out_examples():
+    examples = numbered_examples(20)
+    selected, holdout = prepare_examples(examples + examples[:5], token_budget=10 ** 6)
+    assert len(selected) + len(holdout) == 20
+    assert not set(ex.input_text for ex in selected) & set(ex.input_text for ex in holdout)
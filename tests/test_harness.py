@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from core.harness import FidelityHarness, format_matrix, score_output
+from core.models import Example, FidelityReport
+from core.workflow import PromptBusterWorkflow
+from .conftest import FakeProvider
+
+EXAMPLES = [Example(input_text="the cat sat", expected_output="the cat sat"),
+            Example(input_text="on the mat", expected_output="on the mat")]
+
+
+def follow_the_prompt(index, prompt, system_prompt):
+    # The candidate decides how the example input is answered
+    if system_prompt == "broken":
+        raise RuntimeError("model fell over")
+    return prompt if system_prompt == "echo" else "something else entirely"
+
+
+def evaluate(config, candidates, examples=EXAMPLES, delay=0.0):
+    fake = FakeProvider(config, [follow_the_prompt], delay=delay)
+    return asyncio.run(FidelityHarness(fake).evaluate(candidates, examples)), fake
+
+
+def test_score_output_compares_against_the_expected_output():
+    result = score_output(3, "the cat sat", "the cat sat")
+    assert result.example_index == 3
+    assert (result.exact_match, result.token_f1, result.rouge_l, result.char_similarity) == (1.0, 1.0, 1.0, 1.0)
+    partial = score_output(0, "the cat", "the cat sat")
+    assert 0 < partial.rouge_l < 1 and partial.exact_match == 0.0
+
+
+def test_each_candidate_runs_on_every_example_as_the_system_prompt(config):
+    (echo, other), fake = evaluate(config, ["echo", "other"])
+    assert sorted((prompt, system_prompt) for prompt, system_prompt, _ in fake.calls) == [
+        ("on the mat", "echo"), ("on the mat", "other"), ("the cat sat", "echo"), ("the cat sat", "other")]
+    assert all(max_tokens for _, _, max_tokens in fake.calls)
+    assert (echo.prompt, echo.exact_match, echo.rouge_l) == ("echo", 1.0, 1.0)
+    assert [result.example_index for result in echo.results] == [0, 1]
+    assert other.exact_match == 0.0 and other.rouge_l < echo.rouge_l
+
+
+def test_pairs_run_concurrently(config):
+    _, fake = evaluate(config, ["echo", "other"], delay=0.05)
+    assert fake.max_in_flight == 4
+
+
+def test_failed_calls_are_reported_per_example(config):
+    [report], _ = evaluate(config, ["broken"])
+    assert [result.error for result in report.results] == ["RuntimeError: model fell over"] * 2
+    assert report.rouge_l == 0.0
+
+
+def test_format_matrix(config):
+    assert format_matrix([]) == ""
+    [echo], _ = evaluate(config, ["echo"])
+    broken = FidelityReport(prompt="broken", results=[score_output(0, "x", "y").model_copy(update={"error": "boom"})])
+    lines = format_matrix([echo, broken]).splitlines()
+    assert lines[0] == "rouge_l per example"
+    assert lines[1].split() == ["Candidate", "Ex", "1", "Ex", "2", "Mean", "Exact"]
+    assert lines[2].split() == ["#1", "1.00", "1.00", "1.00", "1.00"]
+    assert lines[3].split() == ["#2", "err", "0.00", "0.00"]
+
+
+def test_measure_fidelity_defaults_to_the_holdout_examples(config):
+    workflow = PromptBusterWorkflow(config, llm_provider=FakeProvider(config, [follow_the_prompt]))
+    workflow.session.examples = EXAMPLES
+    workflow.session.holdout_examples = EXAMPLES[1:]
+    [report] = asyncio.run(workflow.measure_fidelity(["echo"]))
+    assert [result.output for result in report.results] == ["on the mat"]
+    workflow.session.examples = workflow.session.holdout_examples = []
+    with pytest.raises(ValueError):
+        asyncio.run(workflow.measure_fidelity(["echo"]))
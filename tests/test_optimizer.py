@@ -0,0 +1,70 @@
+import asyncio
+import itertools
+import json
+from collections import Counter
+from core import llm_providers
+from core.cache import CachedProvider, ResponseCache
+from core.models import ModelRoute, RoutingPolicy
+from core.optimizer import PromptOptimizer
+from core.workflow import PromptBusterWorkflow
+from .conftest import FakeProvider, make_config
+
+WORDS = ["brevity", "tone", "format", "examples", "edge", "cases", "steps", "audience", "checks", "context",
+         "role", "limits", "clarity", "structure", "detail", "focus"]
+SEED = "Answer the question"
+
+
+def rewrite(sample: int) -> str:
+    # Every sample is a different rewrite, as a model at temperature > 0 would give
+    words = " ".join(WORDS[(sample * 5 + offset) % len(WORDS)] for offset in range(6))
+    return json.dumps({"prompt": f"Rewrite {sample}: stress {words} for sample number {sample}"})
+
+
+def test_surviving_parents_get_new_children_with_the_cache_on(config, tmp_path):
+    samples = itertools.count()
+    
+    def reply(index, prompt, system_prompt):
+        if not prompt.startswith("This is candidate"):
+            # The seed stays best, so it survives every generation and resends the same requests
+            return "Fine.\nSCORE: 9" if SEED in prompt else "Worse.\nSCORE: 5"
+        return rewrite(next(samples))
+    
+    cached = CachedProvider(FakeProvider(config, [reply]), ResponseCache(tmp_path))
+    workflow = PromptBusterWorkflow(config, llm_provider=cached)
+    optimizer = PromptOptimizer(workflow, generations=4, beam_width=1, candidates_per_parent=2, patience=10)
+    result = asyncio.run(optimizer.run([SEED], "Judge the prompt"))
+    
+    assert len(result.rounds) == 4
+    # Cached replies used to hand a surviving parent its old, already scored children
+    assert all(round_result.candidates_scored > 0 for round_result in result.rounds)
+
+
+def test_routing_and_other_calls_are_untouched_while_optimizing(monkeypatch):
+    route = ModelRoute(model="long-context-model", context_window=200000, steps=["candidate", "scored_evaluation"])
+    config = make_config(model="gpt-4-0613", routing=RoutingPolicy(routes=[route]))
+    samples = itertools.count()
+    windows = []
+    
+    def reply(index, prompt, system_prompt):
+        windows.append(workflow.budget_for("candidate").window)
+        return rewrite(next(samples)) if prompt.startswith("This is candidate") else "Fine.\nSCORE: 7"
+    
+    monkeypatch.setattr(llm_providers, "create_base_provider",
+                        lambda config, http_client=None: FakeProvider(config, [reply]))
+    workflow = PromptBusterWorkflow(config)
+    optimizer = PromptOptimizer(workflow, generations=2, beam_width=1, candidates_per_parent=2, patience=10)
+    
+    async def scenario():
+        # A call from elsewhere in the app while the optimizer runs
+        result, _ = await asyncio.gather(optimizer.run([SEED], "Judge the prompt"),
+                                         workflow.evaluate_prompt("Unrelated prompt", "Judge the prompt"))
+        return result
+    
+    result = asyncio.run(scenario())
+    # The candidate budget still comes from the routed 200k-token model, not the primary's 8k window
+    assert set(windows) == {200000}
+    tokens = Counter()
+    for metrics in workflow.telemetry.summary():
+        tokens[metrics.step] += metrics.input_tokens + metrics.output_tokens
+    assert tokens["prompt_evaluation"] > 0
+    assert result.estimated_tokens == sum(tokens.values()) - tokens["prompt_evaluation"]
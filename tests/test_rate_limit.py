@@ -0,0 +1,117 @@
+import asyncio
+import time
+from email.utils import formatdate
+import pytest
+from core import llm_providers
+from core.models import CallRecord
+from core.rate_limit import (PRIORITY_BATCH, PRIORITY_INTERACTIVE, RateLimitedProvider, RateLimiter, TokenBucket,
+                             get_rate_limiter, is_rate_limit_error, retry_after_seconds)
+from .conftest import FakeProvider, StatusError, make_config
+
+
+def test_retry_after_prefers_milliseconds():
+    assert retry_after_seconds(StatusError(429, {"retry-after-ms": "250", "retry-after": "9"})) == 0.25
+    assert retry_after_seconds(StatusError(429, {"retry-after": "3"})) == 3.0
+    assert retry_after_seconds(StatusError(429)) is None
+    assert retry_after_seconds(ValueError()) is None
+
+
+def test_retry_after_accepts_http_dates():
+    delay = retry_after_seconds(StatusError(429, {"retry-after": formatdate(time.time() + 30, usegmt=True)}))
+    assert 25 <= delay <= 31
+
+
+def test_only_429_is_a_rate_limit_error():
+    assert is_rate_limit_error(StatusError(429))
+    assert not is_rate_limit_error(StatusError(503))
+    assert not is_rate_limit_error(ValueError())
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(60)
+    now = bucket.updated
+    assert bucket.wait_time(60, now) == 0.0
+    bucket.consume(60, now)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 0.5) == pytest.approx(0.5)
+    # Requests larger than the bucket wait for a full bucket rather than forever
+    assert bucket.wait_time(1000, now + 60) == 0.0
+
+
+def test_interactive_requests_are_admitted_before_queued_batch_work():
+    async def scenario():
+        limiter = RateLimiter(requests_per_minute=600)
+        limiter.requests.tokens = 0
+        admitted = []
+        
+        async def acquire(name, priority):
+            await limiter.acquire(1, priority)
+            admitted.append(name)
+        
+        batch = [asyncio.ensure_future(acquire(f"batch{i}", PRIORITY_BATCH)) for i in range(3)]
+        await asyncio.sleep(0)
+        interactive = asyncio.ensure_future(acquire("interactive", PRIORITY_INTERACTIVE))
+        await asyncio.gather(*batch, interactive)
+        return admitted
+    
+    assert asyncio.run(scenario())[0] == "interactive"
+
+
+def test_rate_limit_pauses_and_slows_the_limiter_until_successes_restore_it():
+    limiter = RateLimiter(requests_per_minute=60)
+    limiter.on_rate_limited(retry_after=5)
+    assert limiter.saturated
+    assert limiter.rate_fraction == pytest.approx(0.7)
+    assert limiter.requests.rate == pytest.approx(0.7)
+    assert limiter.requests.tokens <= 0
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.rate_fraction == 1.0
+    assert limiter.requests.rate == pytest.approx(1.0)
+
+
+def test_limiters_are_shared_per_model_and_limits(config):
+    assert get_rate_limiter(config) is get_rate_limiter(config.model_copy())
+    assert get_rate_limiter(config) is not get_rate_limiter(make_config())
+    # Raising the configured limits takes effect instead of reusing the old buckets
+    faster = get_rate_limiter(config.model_copy(update={"requests_per_minute": 600}))
+    assert faster is not get_rate_limiter(config)
+    assert faster.requests.capacity == 600
+
+
+def test_each_event_loop_gets_its_own_limiter(config):
+    async def limiter():
+        return get_rate_limiter(config)
+    
+    first, second = asyncio.run(limiter()), asyncio.run(limiter())
+    assert first is not second
+    assert first is not get_rate_limiter(config)
+
+
+def test_rate_limited_provider_uses_the_running_loops_limiter(config):
+    provider = RateLimitedProvider(FakeProvider(config))
+    
+    async def call():
+        assert await provider.generate("hi") == "ok"
+        return provider.limiter is get_rate_limiter(config)
+    
+    assert asyncio.run(call())
+
+
+def test_rate_limited_provider_retries_429_after_backing_off(config):
+    fake = FakeProvider(config, [StatusError(429, {"retry-after-ms": "1"}), StatusError(429, {"retry-after-ms": "1"}),
+                                 "done"])
+    provider = RateLimitedProvider(fake, RateLimiter())
+    assert asyncio.run(provider.generate("hi")) == "done"
+    assert len(fake.calls) == 3
+
+
+def test_rate_limited_provider_charges_the_step_output_estimate(config):
+    provider = RateLimitedProvider(FakeProvider(config), RateLimiter())
+    call = CallRecord(step="candidate")
+    token = llm_providers.current_call.set(call)
+    try:
+        assert provider._estimate("", None, 4000) == 800
+    finally:
+        llm_providers.current_call.reset(token)
+    assert provider._estimate("", None, 4000) == 4000
@@ -0,0 +1,136 @@
+import asyncio
+import time
+import httpx
+import pytest
+from core import llm_providers
+from core.llm_providers import create_provider
+from core.models import RetryPolicy
+from core.rate_limit import PRIORITY_BATCH, get_rate_limiter, request_priority
+from core.resilience import LatencyTracker, ResilientProvider, is_retryable_error
+from .conftest import FakeProvider, StatusError, make_config
+
+FAST = dict(backoff_base=0.001, backoff_max=0.01)
+
+
+def test_retryable_errors():
+    assert is_retryable_error(asyncio.TimeoutError())
+    assert is_retryable_error(httpx.ConnectError("refused"))
+    assert is_retryable_error(StatusError(503))
+    assert is_retryable_error(StatusError(529))
+    assert not is_retryable_error(StatusError(400))
+    assert not is_retryable_error(StatusError(429))
+    assert not is_retryable_error(ValueError())
+
+
+def test_latency_percentiles():
+    tracker = LatencyTracker(window=10)
+    assert tracker.percentile(0.5) is None
+    for seconds in range(1, 21):
+        tracker.record(seconds)
+    assert tracker.percentile(0.0) == 11
+    assert tracker.percentile(0.95) == 20
+
+
+def test_transient_errors_are_retried(config):
+    fake = FakeProvider(config, [StatusError(503), httpx.ConnectError("refused"), "ok"])
+    provider = ResilientProvider(fake, RetryPolicy(max_retries=3, **FAST))
+    assert asyncio.run(provider.generate("hi")) == "ok"
+    assert len(fake.calls) == 3
+
+
+def test_retries_stop_at_max_retries(config):
+    fake = FakeProvider(config, [StatusError(503)])
+    provider = ResilientProvider(fake, RetryPolicy(max_retries=2, **FAST))
+    with pytest.raises(StatusError):
+        asyncio.run(provider.generate("hi"))
+    assert len(fake.calls) == 3
+
+
+def test_request_errors_are_not_retried(config):
+    fake = FakeProvider(config, [StatusError(400), "ok"])
+    provider = ResilientProvider(fake, RetryPolicy(max_retries=3, **FAST))
+    with pytest.raises(StatusError):
+        asyncio.run(provider.generate("hi"))
+    assert len(fake.calls) == 1
+
+
+def test_slow_attempts_time_out_and_are_retried(config):
+    fake = FakeProvider(config, delay=lambda index: 5.0 if index == 0 else 0.0)
+    provider = ResilientProvider(fake, RetryPolicy(timeout=0.05, max_retries=1, **FAST))
+    assert asyncio.run(provider.generate("hi")) == "ok"
+    assert len(fake.calls) == 2
+
+
+def test_deadline_bounds_all_attempts(config):
+    fake = FakeProvider(config, delay=5.0)
+    provider = ResilientProvider(fake, RetryPolicy(timeout=0.05, deadline=0.12, max_retries=10, **FAST))
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(provider.generate("hi"))
+    assert len(fake.calls) <= 3
+
+
+def test_slow_call_is_hedged(config):
+    fake = FakeProvider(config, ["first", "second"], delay=lambda index: 5.0 if index == 0 else 0.0)
+    provider = ResilientProvider(fake, RetryPolicy(hedge=True, hedge_delay=0.05, max_retries=0))
+    assert asyncio.run(provider.generate("hi")) == "second"
+    assert len(fake.calls) == 2
+
+
+def test_stream_retries_before_the_first_chunk(config):
+    fake = FakeProvider(config, [StatusError(502), "streamed"])
+    provider = ResilientProvider(fake, RetryPolicy(max_retries=1, **FAST))
+    
+    async def collect():
+        return [chunk async for chunk in provider.stream("hi")]
+    
+    assert asyncio.run(collect()) == ["streamed"]
+    assert len(fake.calls) == 2
+
+
+def test_persistent_429_is_retried_by_the_limiter_alone(monkeypatch):
+    # ResilientProvider used to retry 429s too, multiplying the attempts per call
+    config = make_config(retry=RetryPolicy(max_retries=3, backoff_base=0.001))
+    fake = FakeProvider(config, [StatusError(429, {"retry-after-ms": "1"})])
+    monkeypatch.setattr(llm_providers, "create_base_provider", lambda config, http_client=None: fake)
+    with pytest.raises(StatusError):
+        asyncio.run(create_provider(config).generate("hi"))
+    assert len(fake.calls) == 6
+
+
+def test_time_spent_waiting_for_the_limiter_is_not_part_of_the_timeout(monkeypatch):
+    config = make_config(requests_per_minute=60, retry=RetryPolicy(timeout=0.3, max_retries=0))
+    fake = FakeProvider(config)
+    monkeypatch.setattr(llm_providers, "create_base_provider", lambda config, http_client=None: fake)
+    
+    async def call():
+        get_rate_limiter(config).requests.tokens = 0
+        with request_priority(PRIORITY_BATCH):
+            return await create_provider(config).generate("hi")
+    
+    started = time.monotonic()
+    assert asyncio.run(call()) == "ok"
+    assert time.monotonic() - started >= 0.5
+
+
+def requests_admitted(monkeypatch, config, fake: FakeProvider) -> float:
+    """Requests one call through the full provider stack takes from the limiter"""
+    monkeypatch.setattr(llm_providers, "create_base_provider", lambda config, http_client=None: fake)
+    
+    async def call():
+        limiter = get_rate_limiter(config)
+        await create_provider(config).generate("hi")
+        return limiter.requests.capacity - limiter.requests.tokens
+    
+    return asyncio.run(call())
+
+
+def test_retries_wait_for_the_limiter(monkeypatch):
+    config = make_config(requests_per_minute=60, retry=RetryPolicy(max_retries=2, **FAST))
+    fake = FakeProvider(config, [StatusError(503), StatusError(503), "ok"])
+    assert requests_admitted(monkeypatch, config, fake) == pytest.approx(3, abs=0.1)
+
+
+def test_hedges_wait_for_the_limiter(monkeypatch):
+    config = make_config(requests_per_minute=60, retry=RetryPolicy(hedge=True, hedge_delay=0.05, max_retries=0))
+    fake = FakeProvider(config, ["first", "second"], delay=lambda index: 5.0 if index == 0 else 0.0)
+    assert requests_admitted(monkeypatch, config, fake) == pytest.approx(2, abs=0.1)
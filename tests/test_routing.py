@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from core import llm_providers, telemetry
+from core.llm_providers import create_provider
+from core.models import LLMProvider, ModelRoute, RetryPolicy, RoutingPolicy
+from core.resilience import LatencyTracker
+from core.routing import RoutedProvider, _Target, route_config
+from core.workflow import PromptBusterWorkflow
+from .conftest import FakeProvider, StatusError, make_config
+
+
+def target(model: str, steps=(), replies=None, max_in_flight=None, **overrides) -> _Target:
+    return _Target(FakeProvider(make_config(model=model, **overrides), replies), list(steps), max_in_flight)
+
+
+def router(*targets: _Target, **policy) -> RoutedProvider:
+    return RoutedProvider(list(targets), RoutingPolicy(**policy))
+
+
+def chosen(provider: RoutedProvider, step: str, prompt: str = "hi") -> str:
+    return provider.plan(prompt, step=step)[0][0].provider.config.model
+
+
+def measured(latency_target: _Target, step: str, seconds: float) -> _Target:
+    latency_target.latency[step] = LatencyTracker()
+    latency_target.latency[step].record(seconds)
+    return latency_target
+
+
+def generate(provider, step: str, prompt: str = "hi") -> str:
+    async def call():
+        telemetry.bind(step)
+        return await provider.generate(prompt)
+    
+    return asyncio.run(call())
+
+
+def test_route_config_only_shares_account_settings_with_the_same_provider():
+    primary = make_config(model="gpt-4o", provider=LLMProvider.OPENAI, api_key="sk-primary", requests_per_minute=500)
+    same = route_config(primary, ModelRoute(model="gpt-4o-mini", requests_per_minute=100))
+    assert (same.model, same.api_key, same.requests_per_minute) == ("gpt-4o-mini", "sk-primary", 100)
+    other = route_config(primary, ModelRoute(model="claude-3-5-haiku", provider=LLMProvider.ANTHROPIC))
+    assert (other.provider, other.api_key, other.base_url) == (LLMProvider.ANTHROPIC, None, None)
+
+
+def test_steps_go_to_the_route_that_lists_them():
+    provider = router(target("primary"), target("scorer", steps=["scored_evaluation"]))
+    assert chosen(provider, "scored_evaluation") == "scorer"
+    assert chosen(provider, "candidate") == "primary"
+    assert provider.config_for("scored_evaluation").model == "scorer"
+
+
+def test_listed_routes_keep_their_order_even_when_another_is_faster():
+    first = measured(target("first", steps=["candidate"]), "candidate", 2.0)
+    second = measured(target("second", steps=["candidate"]), "candidate", 0.1)
+    assert chosen(router(target("primary"), first, second), "candidate") == "first"
+
+
+def test_unlisted_steps_prefer_the_fastest_general_model():
+    primary = measured(target("primary"), "candidate", 2.0)
+    fast = measured(target("fast"), "candidate", 0.1)
+    assert chosen(router(primary, fast), "candidate") == "fast"
+
+
+def test_requests_too_large_for_a_window_go_to_a_model_that_fits():
+    provider = router(target("small", context_window=1000, max_tokens=100),
+                      target("large", context_window=200000, max_tokens=100))
+    assert chosen(provider, "candidate") == "small"
+    assert chosen(provider, "candidate", prompt="word " * 2000) == "large"
+
+
+def test_busy_models_are_passed_over():
+    busy = target("busy", steps=["candidate"], max_in_flight=1)
+    busy.in_flight = 1
+    assert chosen(router(target("primary"), busy), "candidate") == "primary"
+
+
+def test_cheapest_model_first_once_the_budget_is_spent():
+    provider = router(target("gpt-4o", provider=LLMProvider.OPENAI),
+                      target("gpt-4o-mini", provider=LLMProvider.OPENAI), budget_usd=0.01)
+    assert chosen(provider, "candidate") == "gpt-4o"
+    provider.spent_usd = 0.02
+    assert chosen(provider, "candidate") == "gpt-4o-mini"
+
+
+def test_outages_fail_over_and_cool_the_model_down():
+    primary, backup = target("primary", replies=[StatusError(503), "from primary"]), target("backup")
+    provider = router(primary, backup, cooldown_seconds=60)
+    assert generate(provider, "candidate") == "ok"
+    assert generate(provider, "candidate") == "ok"
+    # The primary sat out the second call
+    assert len(primary.provider.calls) == 1
+    assert chosen(provider, "candidate") == "backup"
+
+
+def test_request_errors_fall_through_without_a_cooldown():
+    primary, backup = target("primary", replies=[StatusError(400), "from primary"]), target("backup")
+    provider = router(primary, backup)
+    assert generate(provider, "candidate") == "ok"
+    assert chosen(provider, "candidate") == "primary"
+
+
+def test_the_last_error_is_raised_when_every_model_fails():
+    provider = router(target("primary", replies=[StatusError(503)]), target("backup", replies=[StatusError(502)]))
+    with pytest.raises(StatusError) as raised:
+        generate(provider, "candidate")
+    assert raised.value.status_code == 502
+
+
+def test_routed_workflows_budget_each_step_for_its_model(monkeypatch):
+    monkeypatch.setattr(llm_providers, "create_base_provider",
+                        lambda config, http_client=None: FakeProvider(config))
+    route = ModelRoute(model="long-context", context_window=200000, steps=["candidate"])
+    config = make_config(model="gpt-4-0613", retry=RetryPolicy(max_retries=0), routing=RoutingPolicy(routes=[route]))
+    provider = create_provider(config)
+    assert isinstance(provider, RoutedProvider)
+    assert [t.provider.config.model for t in provider.targets] == ["gpt-4-0613", "long-context"]
+    workflow = PromptBusterWorkflow(config, llm_provider=provider)
+    assert workflow.budget_for("candidate").window == 200000
+    assert workflow.budget_for("prompt_evaluation").window == 8192
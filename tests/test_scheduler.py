@@ -0,0 +1,47 @@
+import asyncio
+import pytest
+from core.models import Example, WorkflowStep
+from core.scheduler import STEP_DEPENDENCIES, StepScheduler
+from core.workflow import PromptBusterWorkflow
+from .conftest import FakeProvider
+
+ALTERNATIVES = "1. First rewrite\n2. Second rewrite\n3. Third rewrite"
+
+
+def make_workflow(config, delay: float = 0.0) -> PromptBusterWorkflow:
+    workflow = PromptBusterWorkflow(config, llm_provider=FakeProvider(config, [ALTERNATIVES], delay=delay))
+    workflow.set_role("testers")
+    workflow.set_examples([Example(input_text="2 + 2", expected_output="4")])
+    return workflow
+
+
+def test_every_step_runs_after_its_dependencies(config):
+    completed = []
+    session = asyncio.run(StepScheduler(make_workflow(config), lambda step, _: completed.append(step)).run())
+    assert set(completed) == set(WorkflowStep)
+    for step in completed:
+        assert all(completed.index(dependency) < completed.index(step) for dependency in STEP_DEPENDENCIES[step])
+    assert session.alternative_prompts == ["First rewrite", "Second rewrite", "Third rewrite"]
+    assert session.final_prompt == "First rewrite"
+
+
+def test_independent_steps_run_concurrently(config):
+    workflow = make_workflow(config, delay=0.05)
+    asyncio.run(StepScheduler(workflow).run())
+    # The initial guide and the evaluation guide don't wait for each other
+    assert workflow.llm_provider.max_in_flight >= 2
+
+
+def test_steps_outside_the_requested_set_count_as_done(config):
+    workflow = make_workflow(config)
+    asyncio.run(StepScheduler(workflow).run([WorkflowStep.IMPROVED_ALTERNATIVES]))
+    assert len(workflow.llm_provider.calls) == 1
+    assert workflow.session.current_step == WorkflowStep.IMPROVED_ALTERNATIVES
+
+
+def test_failed_step_cancels_the_rest(config):
+    workflow = make_workflow(config)
+    workflow.set_examples([])
+    with pytest.raises(ValueError):
+        asyncio.run(StepScheduler(workflow).run())
+    assert not workflow.session.final_prompt
@@ -0,0 +1,146 @@
+import asyncio
+import json
+from typing import List
+import pytest
+from core.jobs import JobQueue
+from .conftest import FakeProvider
+
+aiohttp_test_utils = pytest.importorskip("aiohttp.test_utils")
+server = pytest.importorskip("server")
+
+ALTERNATIVES = "1. First rewrite\n2. Second rewrite\n3. Third rewrite"
+EXAMPLES = [{"input_text": "2 + 2", "expected_output": "4"}]
+
+
+def serve(config, provider, scenario, **options):
+    """Run ``scenario(client)`` against the app on a local test server"""
+    async def main():
+        app = server.create_app(config, provider, **options)
+        async with aiohttp_test_utils.TestClient(aiohttp_test_utils.TestServer(app)) as client:
+            return await scenario(client)
+    
+    return asyncio.run(main())
+
+
+def parse_events(text: str) -> List[dict]:
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append({"event": fields["event"], "data": json.loads(fields["data"])})
+    return events
+
+
+def test_step_waits_for_the_result(config):
+    async def scenario(client):
+        response = await client.post("/steps/evaluation_guide?wait=1", json={"role": "testers"})
+        return response.status, await response.json()
+    
+    status, body = serve(config, FakeProvider(config, ["Judge clarity"]), scenario)
+    assert status == 200
+    assert (body["status"], body["result"]) == ("ok", "Judge clarity")
+
+
+def test_bad_requests(config):
+    async def scenario(client):
+        unknown = await client.post("/steps/nope", json={})
+        no_call = await client.post("/steps/examples_input", json={})
+        bad_body = await client.post("/runs", data="not json")
+        missing = await client.get("/jobs/missing")
+        return unknown.status, no_call.status, bad_body.status, missing.status
+    
+    assert serve(config, FakeProvider(config), scenario) == (404, 404, 400, 404)
+
+
+def test_events_are_replayed_then_followed_to_the_end(config):
+    async def scenario(client):
+        response = await client.post("/steps/initial_prompt", json={"role": "testers"})
+        assert response.status == 202
+        job = await response.json()
+        events = await client.get(job["events_url"])
+        assert events.headers["Content-Type"] == "text/event-stream"
+        live = parse_events(await events.text())
+        # Subscribing after the job ended replays the same events
+        replayed = parse_events(await (await client.get(job["events_url"])).text())
+        status = await (await client.get(job["status_url"])).json()
+        return live, replayed, status
+    
+    live, replayed, status = serve(config, FakeProvider(config, ["A guide"], delay=0.05), scenario)
+    assert [event["event"] for event in live] == ["status", "chunk", "end"]
+    assert live[1]["data"] == "A guide"
+    assert live[2]["data"]["status"] == "ok"
+    assert replayed == live
+    assert status["result"] == "A guide"
+
+
+def test_runs_report_each_step(config):
+    async def scenario(client):
+        response = await client.post("/runs", json={"role": "testers", "examples": EXAMPLES})
+        job = await response.json()
+        return parse_events(await (await client.get(job["events_url"])).text())
+    
+    events = serve(config, FakeProvider(config, [ALTERNATIVES]), scenario)
+    steps = [event["data"]["step"] for event in events if event["event"] == "step"]
+    assert "initial_prompt" in steps and steps[-1] == "final_selection"
+    assert events[-1]["data"]["result"]["final_prompt"] == "First rewrite"
+
+
+def test_full_queue_sheds_load(config):
+    async def scenario(client):
+        statuses = []
+        for _ in range(3):
+            response = await client.post("/steps/evaluation_guide", json={"role": "testers"})
+            statuses.append((response.status, response.headers.get("Retry-After")))
+        return statuses
+    
+    statuses = serve(config, FakeProvider(config, delay=5.0), scenario, workers=1, max_pending=1)
+    assert (503, "1") in statuses
+    assert statuses[0] == (202, None)
+
+
+def test_running_jobs_can_be_cancelled(config):
+    async def scenario(client):
+        job = await (await client.post("/steps/evaluation_guide", json={"role": "testers"})).json()
+        await asyncio.sleep(0.05)
+        cancelled = await (await client.delete(f"/jobs/{job['id']}")).json()
+        status = await (await client.get(f"/jobs/{job['id']}?wait=1")).json()
+        again = await (await client.delete(f"/jobs/{job['id']}")).json()
+        return cancelled["cancelled"], status["status"], again["cancelled"]
+    
+    assert serve(config, FakeProvider(config, delay=5.0), scenario) == (True, "cancelled", False)
+
+
+def test_health_and_metrics(config):
+    async def scenario(client):
+        await client.post("/steps/evaluation_guide?wait=1", json={"role": "testers"})
+        health = await (await client.get("/health")).json()
+        metrics = await client.get("/metrics")
+        return health, metrics.headers["Content-Type"], await metrics.text()
+    
+    health, content_type, text = serve(config, FakeProvider(config), scenario)
+    assert health == {"status": "ok", "queued": 0, "running": 0}
+    assert content_type.startswith("text/plain")
+    assert "# TYPE promptbuster_llm_calls_total counter" in text
+
+
+def test_queued_jobs_cancel_without_running_and_old_jobs_are_evicted():
+    async def scenario():
+        queue = JobQueue(workers=1, max_finished=2)
+        ran = []
+        
+        async def work(job):
+            ran.append(job.id)
+            return job.id
+        
+        jobs = [queue.submit("test", work) for _ in range(4)]
+        assert queue.cancel(jobs[1].id)
+        queue.start()
+        results = [await job.wait() for job in jobs]
+        latest = queue.submit("test", work)
+        kept = list(queue.jobs)
+        await queue.stop()
+        return jobs, ran, results, kept, latest
+    
+    jobs, ran, results, kept, latest = asyncio.run(scenario())
+    assert [result.status for result in results] == ["ok", "cancelled", "ok", "ok"]
+    assert jobs[1].id not in ran
+    assert kept == [jobs[2].id, jobs[3].id, latest.id]
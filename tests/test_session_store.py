@@ -0,0 +1,154 @@
+import asyncio
+import json
+import time
+import pytest
+from config.session_store import SessionStore
+from core.models import ExampleResult, FidelityReport, PromptSession, ScoredCandidate, WorkflowStep
+from core.optimizer import PromptOptimizer
+from core.workflow import PromptBusterWorkflow
+from .conftest import FakeProvider
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SessionStore(tmp_path / "sessions.db")
+    yield store
+    store.close()
+
+
+def scored_session(score: float = 7.0) -> PromptSession:
+    return PromptSession(
+        role="support agent",
+        generated_prompt="You answer billing questions",
+        alternative_prompts=["Answer billing questions politely", "Answer billing questions briefly"],
+        scored_alternatives=[
+            ScoredCandidate(prompt="Answer billing questions politely", score=score, critique="long critique " * 200),
+            ScoredCandidate(prompt="Answer billing questions briefly", critique="no score given"),
+        ],
+        fidelity_reports=[FidelityReport(prompt="Answer billing questions politely", rouge_l=0.5,
+                                         results=[ExampleResult(example_index=0, output="Refund issued")])],
+        current_step=WorkflowStep.FINAL_SELECTION
+    )
+
+
+def blob_count(store: SessionStore) -> int:
+    return store._conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+
+
+def test_save_and_load(store):
+    session_id = store.save("billing", scored_session(), "gpt-4o")
+    assert store.load(session_id) == scored_session()
+    assert store.get_id("billing") == session_id
+    assert store.load_field(session_id, "role") == "support agent"
+    [summary] = store.list()
+    assert (summary.name, summary.model, summary.best_score) == ("billing", "gpt-4o", 7.0)
+    with pytest.raises(ValueError):
+        store.load_field(session_id, "missing")
+
+
+def test_saving_under_the_same_name_replaces_the_session(store):
+    first = store.save("billing", scored_session())
+    second = store.save("billing", scored_session(score=9.0))
+    assert first == second
+    assert store.count() == 1
+    assert store.load(first).scored_alternatives[0].score == 9.0
+
+
+def test_revisions_record_changed_fields(store):
+    session_id = store.save("billing", scored_session())
+    store.save("billing", scored_session())
+    store.save("billing", scored_session(score=8.0))
+    revisions = store.list_revisions(session_id)
+    assert [revision.number for revision in revisions] == [2, 1]
+    assert revisions[0].changed_fields == ["scored_alternatives"]
+    assert store.load_revision(session_id, 1) == scored_session()
+    assert store.load_revision(session_id, 2) == scored_session(score=8.0)
+    diff = store.diff_revisions(session_id, 1, 2)
+    assert '-    "score": 7.0' in diff and '+    "score": 8.0' in diff
+
+
+def test_optimizer_rounds_leave_a_lineage(store, config):
+    def reply(index, prompt, system_prompt):
+        if prompt.startswith("This is candidate"):
+            return json.dumps({"prompt": f"Generation {index} rewrite with {' '.join(['detail'] * index)} focus"})
+        # Later rewrites add more detail and score higher, so every generation improves
+        return f"SCORE: {min(10, prompt.count('detail'))}"
+    
+    workflow = PromptBusterWorkflow(config, llm_provider=FakeProvider(config, [reply]))
+    workflow.set_role("support agent")
+    
+    def on_round(round_result):
+        workflow.set_scored_alternatives(round_result.beam)
+        label = f"optimizer generation {round_result.generation}"
+        store.record_revision("support agent", workflow.session, label=label)
+    
+    optimizer = PromptOptimizer(workflow, generations=3, beam_width=1, candidates_per_parent=1, patience=10,
+                                on_round=on_round)
+    result = asyncio.run(optimizer.run(["Answer the question"], "Judge the prompt"))
+    
+    session_id = store.get_id("support agent")
+    revisions = store.list_revisions(session_id)
+    assert [revision.label for revision in revisions] == [f"optimizer generation {n}" for n in (3, 2, 1)]
+    assert revisions[0].changed_fields == ["scored_alternatives"]
+    for round_result in result.rounds:
+        assert store.load_revision(session_id, round_result.generation).scored_alternatives == round_result.beam
+    # The saved session itself only changes when it is saved
+    assert store.load(session_id).scored_alternatives == result.rounds[0].beam
+
+
+def test_candidates_are_stored_per_item(store):
+    session_id = store.save("billing", scored_session())
+    before = blob_count(store)
+    store.save("billing", scored_session(score=8.0))
+    # Only the new score is stored; prompts and critiques are shared with revision 1
+    assert blob_count(store) == before + 1
+    manifest = json.loads(store._conn.execute(
+        "SELECT manifest FROM revisions WHERE session_id = ? AND number = 2", (session_id,)).fetchone()[0])
+    assert set(manifest["scored_alternatives"][0]) == {"prompt", "score", "critique"}
+
+
+def test_search_returns_the_most_recently_saved_first(store):
+    if not store.full_text:
+        pytest.skip("SQLite built without FTS5")
+    store.save("older", PromptSession(role="billing support"))
+    time.sleep(0.01)
+    store.save("newer", PromptSession(role="billing escalations"))
+    time.sleep(0.01)
+    store.save("older", PromptSession(role="billing support, revised"))
+    assert [summary.name for summary in store.search("billing")] == ["older", "newer"]
+    assert store.search("refunds") == []
+    assert store.search('"billing') != []
+
+
+def test_search_pages_follow_the_full_ordering(store):
+    if not store.full_text:
+        pytest.skip("SQLite built without FTS5")
+    store.save_many((f"session {i}", PromptSession(role=f"billing agent {i}"), "") for i in range(30))
+    everything = store.search("billing", limit=30)
+    assert [summary.name for summary in store.search("billing", limit=10, offset=10)] == \
+        [summary.name for summary in everything[10:20]]
+    assert all("[billing]" in summary.snippet for summary in everything)
+
+
+def test_search_time_does_not_grow_with_the_number_of_matches(store):
+    if not store.full_text:
+        pytest.skip("SQLite built without FTS5")
+    prompt = "You answer billing questions about invoices, refunds and chargebacks. " * 4
+    store.save_many((f"session {i}", PromptSession(role="billing agent", generated_prompt=prompt), "")
+                    for i in range(10000))
+    timings = []
+    for _ in range(3):
+        started = time.perf_counter()
+        assert len(store.search("billing", limit=20)) == 20
+        timings.append(time.perf_counter() - started)
+    # Building a snippet for each of the 10,000 matches took over 100ms
+    assert min(timings) < 0.05
+
+
+def test_deleted_sessions_leave_prunable_blobs(store):
+    session_id = store.save("billing", scored_session())
+    assert store.prune_blobs() == 0
+    assert store.delete(session_id)
+    assert store.load(session_id) is None
+    assert store.prune_blobs() > 0
+    assert blob_count(store) == 0
@@ -0,0 +1,56 @@
+import pytest
+from core.similarity import (char_similarity, deduplicate, exact_match, jaccard, rouge_l, shingles, text_similarity,
+                             token_f1, tokenize)
+
+
+def test_tokenize_lowercases_words():
+    assert tokenize("Hello, World! It's 2024.") == ["hello", "world", "it", "s", "2024"]
+
+
+def test_shingles_of_short_texts():
+    assert shingles([]) == set()
+    assert shingles(["a", "b"]) == {("a", "b")}
+    assert shingles(["a", "b", "c", "d"]) == {("a", "b", "c"), ("b", "c", "d")}
+
+
+def test_jaccard():
+    assert jaccard(set(), set()) == 1.0
+    assert jaccard({1, 2}, {2, 3}) == pytest.approx(1 / 3)
+
+
+def test_text_similarity():
+    text = "You are a careful assistant who answers briefly"
+    assert text_similarity(text, text) == 1.0
+    assert text_similarity(text, "Summarise the quarterly report for executives") == 0.0
+
+
+def test_deduplicate_keeps_the_first_of_near_duplicates():
+    base = "Write a concise summary of the article for a busy executive audience"
+    texts = [base, base + ".", "Translate the text into French", "", base.upper()]
+    assert deduplicate(texts) == [base, "Translate the text into French"]
+
+
+def test_exact_match_ignores_case_and_spacing():
+    assert exact_match("The  answer\nis 4", "the answer is 4") == 1.0
+    assert exact_match("4", "four") == 0.0
+
+
+def test_token_f1():
+    assert token_f1("the cat sat", "the cat sat") == 1.0
+    assert token_f1("the cat", "the cat sat down") == pytest.approx(2 * 1.0 * 0.5 / 1.5)
+    assert token_f1("dog", "cat") == 0.0
+    assert token_f1("", "") == 1.0
+    assert token_f1("", "cat") == 0.0
+
+
+def test_rouge_l_uses_the_longest_common_subsequence():
+    assert rouge_l("a b c d", "a b c d") == 1.0
+    # LCS "a c d" has length 3 against 4 reference and 4 predicted tokens
+    assert rouge_l("a x c d", "a b c d") == pytest.approx(0.75)
+    assert rouge_l("x y", "a b") == 0.0
+    assert rouge_l("", "") == 1.0
+
+
+def test_char_similarity():
+    assert char_similarity("abcd", "abcd") == 1.0
+    assert char_similarity("abcd", "wxyz") == 0.0
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import pytest
+from core.llm_providers import note_retry, report_usage
+from core.models import CallRecord, LLMProvider
+from core.telemetry import (TelemetryCollector, TelemetryProvider, bind, call_cost, format_summary, metered,
+                            model_price)
+from core.workflow import PromptBusterWorkflow
+from .conftest import FakeProvider, StatusError, make_config
+
+
+def recorded(provider: TelemetryProvider, step: str = "candidate", prompt: str = "hi") -> TelemetryCollector:
+    collector = TelemetryCollector()
+    
+    async def call():
+        bind(step, collector)
+        try:
+            await provider.generate(prompt)
+        except Exception:
+            pass
+    
+    asyncio.run(call())
+    return collector
+
+
+def test_prices_match_the_longest_model_prefix():
+    assert model_price(make_config(provider=LLMProvider.OPENAI, model="gpt-4o-mini-2024-07-18")) == (0.15, 0.60)
+    assert model_price(make_config(provider=LLMProvider.OPENAI, model="gpt-4o-2024-08-06")) == (2.50, 10.00)
+    assert model_price(make_config(model="llama3")) == (0.0, 0.0)
+    assert model_price(make_config(provider=LLMProvider.OPENAI, model="mystery")) is None
+
+
+def test_cached_input_is_charged_at_the_providers_rate():
+    config = make_config(provider=LLMProvider.ANTHROPIC, model="claude-3-5-haiku-latest")
+    call = CallRecord(input_tokens=1_000_000, cached_input_tokens=500_000, output_tokens=1_000_000)
+    assert call_cost(config, call) == pytest.approx(0.5 * 0.80 + 0.5 * 0.80 * 0.1 + 4.00)
+    assert call_cost(make_config(provider=LLMProvider.OPENAI, model="mystery"), call) == 0.0
+
+
+def test_reported_usage_is_recorded_with_the_step():
+    def reply(index, prompt, system_prompt):
+        report_usage(120, 30)
+        note_retry()
+        return "ok"
+    
+    config = make_config(provider=LLMProvider.OPENAI, model="gpt-4o")
+    [call] = recorded(TelemetryProvider(FakeProvider(config, [reply]))).records
+    assert (call.step, call.model, call.input_tokens, call.output_tokens) == ("candidate", "gpt-4o", 120, 30)
+    assert (call.retries, call.usage_estimated, call.error) == (1, False, None)
+    assert call.cost_usd == pytest.approx((120 * 2.50 + 30 * 10.00) / 1_000_000)
+
+
+def test_usage_is_estimated_when_the_provider_reports_none(config):
+    [call] = recorded(TelemetryProvider(FakeProvider(config, ["a" * 400])), prompt="b" * 40).records
+    assert call.usage_estimated
+    assert call.input_tokens > 0 and call.output_tokens > call.input_tokens
+
+
+def test_failed_calls_are_recorded_as_errors(config):
+    collector = recorded(TelemetryProvider(FakeProvider(config, [StatusError(503)])))
+    [call] = collector.records
+    assert call.error == "StatusError: HTTP 503"
+    assert collector.totals().errors == 1
+
+
+def test_streams_record_time_to_first_chunk(config):
+    provider = TelemetryProvider(FakeProvider(config, ["streamed"], delay=0.02))
+    collector = TelemetryCollector()
+    
+    async def consume():
+        bind("initial_prompt", collector)
+        return [chunk async for chunk in provider.stream("hi")]
+    
+    assert asyncio.run(consume()) == ["streamed"]
+    [call] = collector.records
+    assert call.streamed and call.ttft_seconds >= 0.02
+
+
+def test_summary_totals_and_exports(config, tmp_path):
+    collector = TelemetryCollector()
+    for step, tokens in (("candidate", 10), ("candidate", 20), ("fidelity", 5)):
+        collector.record(CallRecord(step=step, model="m", input_tokens=tokens, output_tokens=1, total_seconds=0.1))
+    by_step = {metrics.step: metrics for metrics in collector.summary()}
+    assert (by_step["candidate"].calls, by_step["candidate"].input_tokens) == (2, 30)
+    assert collector.totals().input_tokens == 35
+    
+    text = collector.prometheus_text()
+    assert 'promptbuster_llm_calls_total{step="candidate",model="m"} 2' in text
+    assert 'promptbuster_llm_tokens_total{step="fidelity",model="m",direction="input"} 5' in text
+    collector.export_json(tmp_path / "metrics.json")
+    data = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+    assert data["totals"]["calls"] == 3 and len(data["calls"]) == 3
+    assert format_summary(collector.summary(), collector.totals()).splitlines()[-1].startswith("total")
+    collector.reset()
+    assert collector.summary() == []
+
+
+def test_metered_counts_only_calls_made_inside_the_block(config):
+    provider = TelemetryProvider(FakeProvider(config, ["a" * 40]))
+    
+    async def calls():
+        with metered() as outer:
+            await provider.generate("b" * 40)
+            with metered() as inner:
+                await asyncio.gather(provider.generate("b" * 40), provider.generate("b" * 40))
+        await provider.generate("b" * 40)
+        return outer.tokens, inner.tokens
+    
+    outer, inner = asyncio.run(calls())
+    assert inner > 0
+    assert outer == inner * 3 // 2
+
+
+def test_workflow_calls_are_labelled_with_their_step(config):
+    workflow = PromptBusterWorkflow(config, llm_provider=TelemetryProvider(FakeProvider(config)))
+    asyncio.run(workflow.generate_evaluation_guide("testers"))
+    [call] = workflow.telemetry.records
+    assert call.step == "evaluation_guide"
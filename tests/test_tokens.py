@@ -0,0 +1,65 @@
+from core.tokens import (DEFAULT_CONTEXT_WINDOW, MAX_EXAMPLE_TOKENS, TokenBudget, TokenCounter, context_window,
+                         estimate_tokens, expected_output_tokens)
+from .conftest import make_config
+
+
+def budget(**overrides) -> TokenBudget:
+    return TokenBudget(make_config(**overrides), TokenCounter())
+
+
+def test_estimate_is_about_four_characters_per_token():
+    assert estimate_tokens(None) == 0
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a" * 400) == 101
+
+
+def test_context_window_uses_the_longest_matching_prefix():
+    assert context_window(make_config(model="gpt-4o-mini")) == 128000
+    assert context_window(make_config(model="gpt-4-32k-0613")) == 32768
+    assert context_window(make_config(model="gpt-4-0613")) == 8192
+    assert context_window(make_config(model="unknown")) == DEFAULT_CONTEXT_WINDOW
+    assert context_window(make_config(model="gpt-4o", context_window=4096)) == 4096
+
+
+def test_step_output_estimates_never_exceed_max_tokens():
+    assert expected_output_tokens("candidate", 4000) == 800
+    assert expected_output_tokens("candidate", 500) == 500
+    assert expected_output_tokens("fidelity", 4000) == 4000
+    assert expected_output_tokens(None, 4000) == 4000
+
+
+def test_requests_that_fit_ask_for_the_configured_max_tokens():
+    sections, max_tokens = budget(max_tokens=4000, context_window=8192).fit("candidate", "overhead", ["short"])
+    assert sections == ["short"]
+    assert max_tokens == 4000
+
+
+def test_output_gives_way_before_the_input_is_trimmed():
+    token_budget = budget(max_tokens=4000, context_window=8192)
+    section = "a" * 20000
+    sections, max_tokens = token_budget.fit("candidate", "", [section])
+    assert sections == [section]
+    assert 800 <= max_tokens < 4000
+    assert token_budget.count(section) + max_tokens <= 8192
+
+
+def test_large_sections_are_trimmed_once_the_output_is_at_its_floor():
+    token_budget = budget(max_tokens=4000, context_window=8192)
+    small, large = "keep me", "x" * 20000 + "the end" + "y" * 20000
+    (kept, trimmed), max_tokens = token_budget.fit("candidate", "", [small, large])
+    assert max_tokens == 800
+    assert kept == small
+    assert "omitted" in trimmed
+    assert trimmed.startswith("x") and trimmed.endswith("y")
+    assert token_budget.count(kept) + token_budget.count(trimmed) + max_tokens <= 8192
+
+
+def test_output_room_only_shrinks_for_the_window():
+    token_budget = budget(max_tokens=4000, context_window=8192)
+    assert token_budget.output_room("short", "system") == 4000
+    assert token_budget.output_room("a" * 24000) < 4000
+
+
+def test_examples_budget_follows_the_window():
+    assert budget(max_tokens=4000, context_window=8192).examples_budget() == (8192 - 4000 - 64) // 2
+    assert budget(max_tokens=4000, context_window=1000000).examples_budget() == MAX_EXAMPLE_TOKENS